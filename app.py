@@ -1,28 +1,61 @@
 from __future__ import annotations
 
 import argparse
+import time
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, List
 
-import pandas as pd
-
-from src.config import ensure_directories
+# 各子指令只在自己的處理函式內 import 需要的模組：fetch 不必載入 torch / backtrader / plotly，
+# 啟動時間見 scripts/bench_startup.py
+from src.config import ensure_directories, OUTPUTS_DIR
 from src.utils.symbols import normalize_hk_symbol
-from src.data.fetch_hk_data import fetch_hk_daily, load_cached
-from src.backtest.run_backtest import run_backtest_from_dataframe
-from src.backtest.run_backtest import run_backtest_portfolio
-from src.visualize.plot import kline_with_mas
-from src.risk.dataset import prepare_dataset
-from src.risk.train_model import train_quantile_rnn
-from src.risk.predict_model import predict_next_day_quantiles, save_quantile_table
+
+if TYPE_CHECKING:
+    from src.risk.train_model import LoaderConfig
 
 
 def cmd_fetch(args):
-    path = fetch_hk_daily(args.symbol, start=args.start, end=args.end)
+    from src.data.fetch_hk_data import fetch_hk_daily
+
+    path = fetch_hk_daily(args.symbol, start=args.start, end=args.end, full_refresh=args.full_refresh)
     print(f"已下載：{path}")
 
 
+def _read_symbols(args) -> List[str]:
+    """合併 --symbols 與 --symbols_file（每行一檔，# 開頭為註解）。"""
+    symbols = list(getattr(args, "symbols", None) or [])
+    path = getattr(args, "symbols_file", None)
+    if path:
+        for line in Path(path).read_text(encoding="utf-8").splitlines():
+            line = line.split("#", 1)[0].strip()
+            if line:
+                symbols.append(line)
+    if not symbols:
+        raise SystemExit("請以 --symbols 或 --symbols_file 指定標的")
+    return symbols
+
+
+def cmd_fetch_many(args):
+    from src.data.fetch_bulk import fetch_hk_daily_bulk
+
+    results = fetch_hk_daily_bulk(
+        _read_symbols(args), start=args.start, end=args.end,
+        workers=args.workers, rate=args.rate, retries=args.retries,
+        full_refresh=args.full_refresh,
+    )
+    for r in results:
+        if r.ok:
+            print(f"✔ {r.symbol}：{r.path}（{r.seconds:.1f}s，{r.attempts} 次請求）")
+        else:
+            print(f"✘ {r.symbol}：{r.error}")
+    failed = sum(not r.ok for r in results)
+    print(f"完成：成功 {len(results) - failed} 檔，失敗 {failed} 檔")
+
+
 def cmd_backtest(args):
+    from src.backtest.run_backtest import run_backtest_from_dataframe
+    from src.data.fetch_hk_data import load_cached
+
     symbol = normalize_hk_symbol(args.symbol)
     df = load_cached(symbol)
     out = run_backtest_from_dataframe(
@@ -32,36 +65,159 @@ def cmd_backtest(args):
         commission=args.commission,
         slippage_bps=args.slippage_bps,
         risk_pct=args.risk_pct,
+        engine=args.engine,
+        use_cache=not args.no_cache,
     )
     print(f"回測圖輸出：{out}")
 
 
 def cmd_plot(args):
-    symbol = normalize_hk_symbol(args.symbol)
-    df = load_cached(symbol)
-    out = kline_with_mas(df, symbol, ma_periods=args.ma, explain=args.explain)
-    print(f"互動圖輸出：{out}")
+    """一次可畫多檔：共用的 plotly.js 只寫一次，每張圖只含自己的資料。"""
+    from src.data.fetch_hk_data import load_cached
+    from src.visualize.plot import kline_with_mas
+
+    total_bytes, t_all = 0, time.perf_counter()
+    for raw in args.symbol:
+        symbol = normalize_hk_symbol(raw)
+        try:
+            df = load_cached(symbol)
+        except FileNotFoundError:
+            print(f"略過 {symbol}：找不到本地資料，請先下載")
+            continue
+        t0 = time.perf_counter()
+        out = kline_with_mas(
+            df, symbol, ma_periods=args.ma, explain=args.explain, replay=args.replay, fast=args.fast,
+            fmt=args.format, plotlyjs=args.plotlyjs,
+        )
+        size = out.stat().st_size
+        total_bytes += size
+        print(f"互動圖輸出：{out}（{size / 1024:.0f} KB，{len(df)} 根日線，耗時 {time.perf_counter() - t0:.2f} 秒）")
+    if len(args.symbol) > 1:
+        print(f"共 {total_bytes / 1024 / 1024:.1f} MB，總耗時 {time.perf_counter() - t_all:.1f} 秒")
+
+
+def _loader_config(args, default_batch: int) -> "LoaderConfig":
+    """--throughput 啟用 CPU 吞吐模式；--batch_size / --workers / --threads 可個別覆寫。"""
+    from src.risk.train_model import LoaderConfig
+
+    loader = LoaderConfig.throughput() if args.throughput else LoaderConfig(batch_size=default_batch)
+    if args.batch_size:
+        loader.batch_size = args.batch_size
+    if args.workers is not None:
+        loader.num_workers = args.workers
+        loader.persistent_workers = args.workers > 0
+    if args.threads:
+        loader.torch_threads = args.threads
+    return loader
 
 
 def cmd_train(args):
+    from src.data.fetch_hk_data import load_cached
+    from src.risk.train_model import train_with_registry
+
     symbol = normalize_hk_symbol(args.symbol)
     df = load_cached(symbol)
-    training, validation, mapping = prepare_dataset(df, symbol)
-    ckpt = train_quantile_rnn(training, validation, symbol, max_epochs=args.epochs)
-    print(f"模型已儲存：{ckpt}")
+    ckpt, trained = train_with_registry(
+        symbol, {symbol: df}, max_epochs=args.epochs, loader=_loader_config(args, 64), force=args.force,
+    )
+    print(f"模型已儲存：{ckpt}" if trained else f"資料與設定未變，沿用模型：{ckpt}")
+    if args.export:
+        _export_slim(ckpt, {symbol: df}, quantize=not args.no_quantize)
+
+
+def _export_slim(ckpt: Path, frames: dict, quantize: bool = True, tolerance: float = 2e-3) -> None:
+    from src.risk.export import check_slim_parity, export_slim_model, format_parity_report
+
+    out_dir = export_slim_model(ckpt, frames, quantize=quantize)
+    print(f"精簡模型已匯出：{out_dir}")
+    for line in format_parity_report(check_slim_parity(ckpt, frames, out_dir, tolerance=tolerance)):
+        print(line)
+
+
+def cmd_export_risk(args):
+    from src.data.fetch_hk_data import load_cached
+    from src.risk.registry import latest_checkpoint
+    from src.risk.train_model import GLOBAL_MODEL_NAME
+
+    ensure_directories()
+    if args.symbol:
+        name = normalize_hk_symbol(args.symbol)
+        frames = {name: load_cached(name)}
+    else:
+        name = GLOBAL_MODEL_NAME
+        frames = _load_frames(_read_symbols(args))
+    ckpt = Path(args.ckpt) if args.ckpt else latest_checkpoint(name)
+    if ckpt is None:
+        raise SystemExit(f"找不到 {name} 的模型，請先訓練")
+    _export_slim(ckpt, frames, quantize=not args.no_quantize, tolerance=args.tolerance)
 
 
 def cmd_predict(args):
+    from src.data.fetch_hk_data import load_cached
+    from src.risk.predict_model import predict_next_day_quantiles, save_quantile_table
+    from src.risk.registry import latest_checkpoint
+
     symbol = normalize_hk_symbol(args.symbol)
-    df = load_cached(symbol)
-    training, validation, mapping = prepare_dataset(df, symbol)
-    ckpt_path = Path(args.ckpt) if args.ckpt else Path("models") / symbol / "tft_quantile.ckpt"
-    result = predict_next_day_quantiles(validation, ckpt_path)
+    ckpt_path = Path(args.ckpt) if args.ckpt else latest_checkpoint(symbol)
+    if ckpt_path is None:
+        raise SystemExit(f"找不到 {symbol} 的模型，請先執行 train")
+    result = predict_next_day_quantiles(symbol, load_cached(symbol), ckpt_path)
     out = save_quantile_table(result, symbol)
     print(f"風險分位數輸出：{out}")
 
 
+def _load_frames(symbols: List[str]) -> dict:
+    from src.data.fetch_hk_data import load_cached
+
+    frames = {}
+    for raw in symbols:
+        symbol = normalize_hk_symbol(raw)
+        try:
+            frames[symbol] = load_cached(symbol, columns=["close"])
+        except FileNotFoundError:
+            print(f"略過 {symbol}：找不到本地資料，請先下載")
+    return frames
+
+
+def cmd_train_global(args):
+    from src.risk.train_model import GLOBAL_MODEL_NAME, train_with_registry
+
+    ensure_directories()
+    frames = _load_frames(_read_symbols(args))
+    ckpt, trained = train_with_registry(
+        GLOBAL_MODEL_NAME, frames, max_epochs=args.epochs, loader=_loader_config(args, 256), force=args.force,
+    )
+    print(f"全域模型已儲存（{len(frames)} 檔）：{ckpt}" if trained else f"資料與設定未變，沿用全域模型：{ckpt}")
+    if args.export:
+        _export_slim(ckpt, frames, quantize=not args.no_quantize)
+
+
+def cmd_predict_global(args):
+    from src.risk.predict_model import predict_quantiles_for_symbols, save_quantile_table
+    from src.risk.registry import latest_checkpoint
+    from src.risk.train_model import GLOBAL_MODEL_NAME
+
+    ensure_directories()
+    frames = _load_frames(_read_symbols(args))
+    ckpt_path = Path(args.ckpt) if args.ckpt else latest_checkpoint(GLOBAL_MODEL_NAME)
+    if ckpt_path is None:
+        raise SystemExit("找不到全域模型，請先執行 train-global")
+    result = predict_quantiles_for_symbols(frames, ckpt_path)
+    out = OUTPUTS_DIR / "risk_quantiles_universe.csv"
+    result.to_csv(out, index=False)
+    # 另存各檔分位數表，介面沿用 risk_quantiles_<symbol>.csv
+    for symbol, table in result.groupby("symbol", sort=False):
+        save_quantile_table(table[["quantile", "prediction"]], symbol)
+    print(f"風險分位數輸出：{out}（{result['symbol'].nunique()} 檔）")
+
+
 def cmd_quickstart(args):
+    from src.backtest.run_backtest import run_backtest_from_dataframe
+    from src.data.fetch_hk_data import fetch_hk_daily, load_cached
+    from src.risk.predict_model import predict_next_day_quantiles, save_quantile_table
+    from src.risk.train_model import train_with_registry
+    from src.visualize.plot import kline_with_mas
+
     symbol = normalize_hk_symbol(args.symbol)
     ensure_directories()
     # 1) 下載
@@ -72,31 +228,134 @@ def cmd_quickstart(args):
     # 3) 視覺化
     kline_with_mas(df, symbol)
     # 4) 風險模型
-    training, validation, _ = prepare_dataset(df, symbol)
-    ckpt = train_quantile_rnn(training, validation, symbol, max_epochs=3)
-    result = predict_next_day_quantiles(validation, ckpt)
+    ckpt, _ = train_with_registry(symbol, {symbol: df}, max_epochs=3)
+    result = predict_next_day_quantiles(symbol, df, ckpt)
     save_quantile_table(result, symbol)
     print("Quickstart 完成，請查看 outputs/ 與 models/ 目錄。")
 
 
 def cmd_backtest_portfolio(args):
+    from src.backtest.run_backtest import run_backtest_portfolio
+    from src.data.fetch_bulk import fetch_hk_daily_bulk
+    from src.data.fetch_hk_data import load_cached
+    from src.data.universe import PriceUniverse
+
     symbols = [normalize_hk_symbol(s) for s in args.symbols]
-    # 讀取或下載資料
-    dfs = {}
+    # 讀取或下載資料（缺少的標的並行下載）
+    missing = []
     for s in symbols:
         try:
-            df = load_cached(s)
+            load_cached(s, columns=["close"])
         except FileNotFoundError:
-            fetch_hk_daily(s, start=args.start, end=args.end)
-            df = load_cached(s)
-        dfs[s] = df
+            missing.append(s)
+    if missing:
+        for r in fetch_hk_daily_bulk(missing, start=args.start, end=args.end):
+            if not r.ok:
+                raise RuntimeError(f"{r.symbol} 下載失敗：{r.error}")
+    # 矩陣引擎直接吃對齊好的面板；backtrader 需逐檔 DataFrame
+    dfs = PriceUniverse.load(symbols) if args.engine == "vectorized" else {s: load_cached(s) for s in symbols}
     out = run_backtest_portfolio(
         dfs, fast=args.fast, slow=args.slow,
         commission=args.commission, slippage_bps=args.slippage_bps, risk_pct=args.risk_pct,
+        engine=args.engine,
     )
     print(f"組合回測圖輸出：{out}")
 
 
+def cmd_report(args):
+    from src.visualize.report import generate_reports
+
+    t0 = time.perf_counter()
+    results, index = generate_reports(
+        _read_symbols(args), workers=args.workers,
+        fast=args.fast, slow=args.slow, commission=args.commission,
+        slippage_bps=args.slippage_bps, risk_pct=args.risk_pct, engine=args.engine,
+        use_cache=not args.no_cache, ma_periods=args.ma, fast_chart=args.chart == "fast",
+    )
+    for r in results:
+        if not r.ok:
+            print(f"✘ {r.symbol}：{r.error}")
+    failed = sum(not r.ok for r in results)
+    print(f"完成：成功 {len(results) - failed} 檔，失敗 {failed} 檔，耗時 {time.perf_counter() - t0:.1f} 秒")
+    print(f"報告索引：{index}")
+
+
+def _parse_grid(values: List[str]) -> List[int]:
+    """解析網格參數：可混用單一整數與 start:stop[:step]（不含 stop）。"""
+    grid: List[int] = []
+    for v in values:
+        if ":" in v:
+            parts = [int(x) for x in v.split(":")]
+            grid.extend(range(*parts))
+        else:
+            grid.append(int(v))
+    return grid
+
+
+def cmd_scan(args):
+    from src.backtest.scan_params import scan_universe
+
+    ensure_directories()
+    res = scan_universe(
+        args.symbols,
+        _parse_grid(args.fast),
+        _parse_grid(args.slow),
+        workers=args.workers,
+        commission=args.commission,
+    )
+    out = Path(args.out) if args.out else OUTPUTS_DIR / "scan_universe.csv"
+    res.to_csv(out, index=False)
+    print(f"參數掃描輸出：{out}")
+
+
+def cmd_walk_forward(args):
+    from src.backtest.walk_forward import run_walk_forward
+
+    ensure_directories()
+    symbol = normalize_hk_symbol(args.symbol)
+    windows_path, equity_path = run_walk_forward(
+        symbol,
+        _parse_grid(args.fast),
+        _parse_grid(args.slow),
+        train_size=args.train,
+        test_size=args.test,
+        anchored=args.anchored,
+        commission=args.commission,
+        workers=args.workers,
+    )
+    print(f"各窗參數：{windows_path}")
+    print(f"樣本外權益：{equity_path}")
+
+
+def cmd_migrate_store(args):
+    from src.data.store import migrate_csv_to_store
+
+    ensure_directories()
+    migrated = migrate_csv_to_store()
+    print(f"已匯入欄式資料庫：{len(migrated)} 檔")
+
+
+def cmd_indicators(args):
+    from src.indicators.streaming import update_universe_indicators
+
+    ensure_directories()
+    symbols = _read_symbols(args) if (args.symbols or args.symbols_file) else None
+    res = update_universe_indicators(symbols, args.requests)
+    out = Path(args.out) if args.out else OUTPUTS_DIR / "indicators_latest.csv"
+    res.to_csv(out, index=False)
+    new_bars = int(res["new_bars"].sum()) if not res.empty else 0
+    print(f"已更新 {len(res)} 檔指標狀態（新增 {new_bars} 根 K 線），輸出：{out}")
+
+
+def _add_training_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--throughput", action="store_true", help="CPU 吞吐模式：大批次、預先張量化、多執行緒並輸出樣本數/秒")
+    p.add_argument("--batch_size", type=int, default=None, help="批次大小（預設：train 64、train-global 256、吞吐模式 512）")
+    p.add_argument("--workers", type=int, default=None, help="DataLoader 子行程數")
+    p.add_argument("--threads", type=int, default=None, help="torch 運算執行緒數")
+    p.add_argument("--export", action="store_true", help="訓練後匯出精簡推論模型（TorchScript）並做精度比對")
+    p.add_argument("--no_quantize", action="store_true", help="匯出時不做 int8 動態量化")
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="金融科技系統：港股資料 + 回測 + 風險模型")
     sub = parser.add_subparsers(dest="cmd", required=True)
@@ -105,8 +364,20 @@ def build_parser() -> argparse.ArgumentParser:
     p_fetch.add_argument("--symbol", required=True, help="如 700/0700/0700.HK")
     p_fetch.add_argument("--start", default="2015-01-01")
     p_fetch.add_argument("--end", default=None)
+    p_fetch.add_argument("--full_refresh", action="store_true", help="忽略本地資料，重新下載完整區間")
     p_fetch.set_defaults(func=cmd_fetch)
 
+    p_many = sub.add_parser("fetch-many", help="並行下載多檔港股資料（限速、重試）")
+    p_many.add_argument("--symbols", nargs="+", default=None, help="多檔，如 700 5 1299")
+    p_many.add_argument("--symbols_file", default=None, help="標的清單檔，每行一檔")
+    p_many.add_argument("--start", default="2015-01-01")
+    p_many.add_argument("--end", default=None)
+    p_many.add_argument("--workers", type=int, default=8, help="同時下載的執行緒數")
+    p_many.add_argument("--rate", type=float, default=5.0, help="每秒最多請求數")
+    p_many.add_argument("--retries", type=int, default=3, help="連線錯誤/429/5xx 的重試次數")
+    p_many.add_argument("--full_refresh", action="store_true")
+    p_many.set_defaults(func=cmd_fetch_many)
+
     p_bt = sub.add_parser("backtest", help="回測（SMA 交叉）")
     p_bt.add_argument("--symbol", required=True)
     p_bt.add_argument("--fast", type=int, default=10)
@@ -114,24 +385,57 @@ def build_parser() -> argparse.ArgumentParser:
     p_bt.add_argument("--commission", type=float, default=0.001, help="手續費率（例：0.001=千分之一）")
     p_bt.add_argument("--slippage_bps", type=int, default=0, help="滑點（基點，1bp=0.01%）")
     p_bt.add_argument("--risk_pct", type=float, default=0.1, help="單筆倉位比例（0~1，預設10%）")
+    p_bt.add_argument("--engine", choices=["backtrader", "vectorized"], default="backtrader",
+                      help="回測引擎：backtrader（逐根模擬）或 vectorized（NumPy 快速版，結果一致）")
+    p_bt.add_argument("--no_cache", action="store_true", help="不使用回測結果快取，強制重新模擬")
     p_bt.set_defaults(func=cmd_backtest)
 
     p_plot = sub.add_parser("plot", help="繪製互動 K 線 + 均線")
-    p_plot.add_argument("--symbol", required=True)
+    p_plot.add_argument("--symbol", nargs="+", required=True, help="可一次給多檔，如 5 700 939")
     p_plot.add_argument("--ma", type=int, nargs="+", default=[20, 60, 120])
     p_plot.add_argument("--explain", action="store_true", help="加上新手註解")
+    p_plot.add_argument("--replay", action="store_true", help="加入回放滑桿與播放鈕（瀏覽器端播放）")
+    p_plot.add_argument("--fast", action="store_true", help="長歷史高效能模式：WebGL 折線、抽樣、K 線聚合為週/月線")
+    p_plot.add_argument("--format", choices=["html", "json"], default="html", help="json 只輸出圖表資料")
+    p_plot.add_argument("--plotlyjs", choices=["shared", "embed", "cdn"], default="shared",
+                        help="shared：共用 outputs/assets 下的 plotly.js；embed：每檔內嵌（可單獨搬移）")
     p_plot.set_defaults(func=cmd_plot)
 
     p_train = sub.add_parser("train", help="訓練風險模型（RNN + 分位數）")
     p_train.add_argument("--symbol", required=True)
     p_train.add_argument("--epochs", type=int, default=5)
+    p_train.add_argument("--force", action="store_true", help="忽略模型登錄表，強制重新訓練")
+    _add_training_args(p_train)
     p_train.set_defaults(func=cmd_train)
 
     p_pred = sub.add_parser("predict", help="使用已訓練模型做隔日分位數預測")
     p_pred.add_argument("--symbol", required=True)
-    p_pred.add_argument("--ckpt", default=None, help="模型路徑，預設 models/<symbol>/quantile_rnn.ckpt")
+    p_pred.add_argument("--ckpt", default=None, help="模型路徑，預設為登錄表中該檔最新的模型")
     p_pred.set_defaults(func=cmd_predict)
 
+    p_tg = sub.add_parser("train-global", help="多標的共用一個全域風險模型（TFT + 分位數）")
+    p_tg.add_argument("--symbols", nargs="+", default=None, help="多檔，如 700 5 1299")
+    p_tg.add_argument("--symbols_file", default=None, help="標的清單檔，每行一檔")
+    p_tg.add_argument("--epochs", type=int, default=5)
+    p_tg.add_argument("--force", action="store_true", help="忽略模型登錄表，強制重新訓練")
+    _add_training_args(p_tg)
+    p_tg.set_defaults(func=cmd_train_global)
+
+    p_pg = sub.add_parser("predict-global", help="以全域模型一次預測多檔隔日分位數")
+    p_pg.add_argument("--symbols", nargs="+", default=None, help="多檔，如 700 5 1299")
+    p_pg.add_argument("--symbols_file", default=None, help="標的清單檔，每行一檔")
+    p_pg.add_argument("--ckpt", default=None, help="預設為登錄表中最新的全域模型")
+    p_pg.set_defaults(func=cmd_predict_global)
+
+    p_ex = sub.add_parser("export-risk", help="匯出精簡風險模型（TorchScript + int8），並比對精度、延遲與記憶體")
+    p_ex.add_argument("--symbol", default=None, help="單檔模型；省略時匯出全域模型")
+    p_ex.add_argument("--symbols", nargs="+", default=None, help="全域模型比對用的標的")
+    p_ex.add_argument("--symbols_file", default=None, help="標的清單檔，每行一檔")
+    p_ex.add_argument("--ckpt", default=None, help="預設為登錄表中最新的模型")
+    p_ex.add_argument("--no_quantize", action="store_true", help="不做 int8 動態量化")
+    p_ex.add_argument("--tolerance", type=float, default=2e-3, help="分位數最大容許誤差（報酬單位）")
+    p_ex.set_defaults(func=cmd_export_risk)
+
     p_quick = sub.add_parser("quickstart", help="一鍵流程：下載+回測+視覺化+訓練+預測")
     p_quick.add_argument("--symbol", required=True)
     p_quick.add_argument("--start", default="2018-01-01")
@@ -147,8 +451,58 @@ def build_parser() -> argparse.ArgumentParser:
     p_port.add_argument("--commission", type=float, default=0.001)
     p_port.add_argument("--slippage_bps", type=int, default=0)
     p_port.add_argument("--risk_pct", type=float, default=0.1)
+    p_port.add_argument("--engine", choices=["backtrader", "vectorized"], default="backtrader",
+                        help="回測引擎：backtrader（逐根模擬）或 vectorized（矩陣版，適合數百檔）")
     p_port.set_defaults(func=cmd_backtest_portfolio)
 
+    p_rep = sub.add_parser("report", help="多檔批次報告：回測、風險面板、資金曲線與互動圖（行程池平行）")
+    p_rep.add_argument("--symbols", nargs="+", default=None, help="多檔，如 700 5 1299")
+    p_rep.add_argument("--symbols_file", default=None, help="標的清單檔，每行一檔")
+    p_rep.add_argument("--workers", type=int, default=None, help="行程數，預設為 CPU 核心數")
+    p_rep.add_argument("--fast", type=int, default=10)
+    p_rep.add_argument("--slow", type=int, default=30)
+    p_rep.add_argument("--commission", type=float, default=0.001)
+    p_rep.add_argument("--slippage_bps", type=int, default=0)
+    p_rep.add_argument("--risk_pct", type=float, default=0.1)
+    p_rep.add_argument("--engine", choices=["backtrader", "vectorized"], default="vectorized",
+                       help="回測引擎，批次預設用 vectorized（結果與 backtrader 一致）")
+    p_rep.add_argument("--no_cache", action="store_true", help="不使用回測結果快取，強制重新模擬")
+    p_rep.add_argument("--ma", type=int, nargs="+", default=[20, 60, 120])
+    p_rep.add_argument("--chart", choices=["fast", "full"], default="fast",
+                       help="fast：高效能互動圖（批次建議）；full：與 plot 指令預設相同的完整圖")
+    p_rep.set_defaults(func=cmd_report)
+
+    p_scan = sub.add_parser("scan", help="多標的 SMA 參數掃描（行程池平行）")
+    p_scan.add_argument("--symbols", nargs="+", required=True, help="多檔，如 700 5 1299")
+    p_scan.add_argument("--fast", nargs="+", default=["5:55:5"], help="fast 網格，如 5 10 20 或 5:55:5")
+    p_scan.add_argument("--slow", nargs="+", default=["20:210:10"], help="slow 網格，如 30 60 120 或 20:210:10")
+    p_scan.add_argument("--commission", type=float, default=0.001)
+    p_scan.add_argument("--workers", type=int, default=None, help="行程數，預設為 CPU 核心數")
+    p_scan.add_argument("--out", default=None, help="輸出 CSV，預設 outputs/scan_universe.csv")
+    p_scan.set_defaults(func=cmd_scan)
+
+    p_wf = sub.add_parser("walk-forward", help="SMA 參數 walk-forward 最佳化（樣本外驗證）")
+    p_wf.add_argument("--symbol", required=True)
+    p_wf.add_argument("--fast", nargs="+", default=["5:55:5"], help="fast 網格，如 5 10 20 或 5:55:5")
+    p_wf.add_argument("--slow", nargs="+", default=["20:210:10"], help="slow 網格，如 30 60 120 或 20:210:10")
+    p_wf.add_argument("--train", type=int, default=504, help="訓練窗長度（交易日）")
+    p_wf.add_argument("--test", type=int, default=126, help="測試窗長度（交易日）")
+    p_wf.add_argument("--anchored", action="store_true", help="訓練窗起點固定、逐步擴張（預設為滾動）")
+    p_wf.add_argument("--commission", type=float, default=0.001)
+    p_wf.add_argument("--workers", type=int, default=None, help="行程數，預設為 CPU 核心數")
+    p_wf.set_defaults(func=cmd_walk_forward)
+
+    p_mig = sub.add_parser("migrate-store", help="一次性將 data/*.csv 匯入欄式資料庫（data/store）")
+    p_mig.set_defaults(func=cmd_migrate_store)
+
+    p_ind = sub.add_parser("indicators", help="增量更新串流指標狀態並輸出各檔最新值")
+    p_ind.add_argument("--symbols", nargs="+", default=None, help="多檔；省略時為資料庫內全部")
+    p_ind.add_argument("--symbols_file", default=None, help="標的清單檔，每行一檔")
+    p_ind.add_argument("--requests", nargs="+", default=["ma20", "ma60", "ema20", "std20", "rsi14", "cross10_30"],
+                       help="指標：ma/ema/std/rsi + 週期，或 cross<fast>_<slow>")
+    p_ind.add_argument("--out", default=None, help="輸出 CSV（預設 outputs/indicators_latest.csv）")
+    p_ind.set_defaults(func=cmd_indicators)
+
     return parser
 
 
@@ -0,0 +1,130 @@
+"""app.py 子指令啟動時間量測（`python -X importtime` 報表）。
+
+每個子指令在乾淨的子行程中 import app.py 與該指令處理函式內 import 的模組（由原始碼解析，
+含其呼叫的模組層級輔助函式），記錄牆鐘時間與累積耗時最多的套件；
+最後一列「全部（舊版頂層 import）」為所有指令的模組一起載入，對應改為延遲載入前的成本。
+
+用法：
+    python scripts/bench_startup.py                  # 全部子指令
+    python scripts/bench_startup.py fetch plot       # 指定子指令
+    python scripts/bench_startup.py --repeat 5 --top 8 --out outputs/startup.txt
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+APP = PROJECT_ROOT / "app.py"
+ALL = "全部（舊版頂層 import）"
+_SKIP = {"app", "src", "site", "encodings", "_frozen_importlib_external"}
+
+
+def _handler_imports() -> Dict[str, List[str]]:
+    """解析 app.py：{子指令: 處理函式（及其呼叫的輔助函式）內的 import 敘述}。"""
+    tree = ast.parse(APP.read_text(encoding="utf-8"))
+    funcs = {n.name: n for n in tree.body if isinstance(n, ast.FunctionDef)}
+
+    def collect(name: str, seen: Set[str]) -> List[str]:
+        if name in seen or name not in funcs:
+            return []
+        seen.add(name)
+        lines: List[str] = []
+        for node in ast.walk(funcs[name]):
+            if isinstance(node, (ast.Import, ast.ImportFrom)) and node is not funcs[name]:
+                lines.append(ast.unparse(node))
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                lines += collect(node.func.id, seen)
+        return lines
+
+    names: Dict[str, str] = {}
+    handlers: Dict[str, str] = {}
+    for node in ast.walk(funcs["build_parser"]):
+        # p_xxx = sub.add_parser("name", ...) 與 p_xxx.set_defaults(func=cmd_xxx)
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) \
+                and getattr(node.value.func, "attr", "") == "add_parser":
+            names[node.targets[0].id] = node.value.args[0].value
+        elif isinstance(node, ast.Call) and getattr(node.func, "attr", "") == "set_defaults":
+            handler = next((k.value.id for k in node.keywords if k.arg == "func"), None)
+            if handler:
+                handlers[node.func.value.id] = handler
+    return {
+        names[var]: list(dict.fromkeys(collect(handler, set())))
+        for var, handler in handlers.items() if var in names
+    }
+
+
+def _measure(imports: List[str]) -> Tuple[float, List[Tuple[int, str]], List[str]]:
+    """回傳 (牆鐘秒數, [(累積微秒, 套件)], 未安裝而略過的套件)。"""
+    lines = ["import app", "missing = set()"]
+    for imp in imports:
+        lines += ["try:", f"    {imp}", "except ModuleNotFoundError as exc:", "    missing.add(exc.name)"]
+    lines.append("print(','.join(sorted(missing)))")
+    code = "\n".join(lines)
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    seconds = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    entries: List[Tuple[int, str, int]] = []  # (深度, 模組, 累積微秒)，子模組在父模組之前（後序）
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        raw = parts[2].rstrip()
+        name = raw.strip()
+        entries.append(((len(raw) - len(raw.lstrip()) - 1) // 2, name, int(parts[1])))
+    # 依套件（名稱第一段）彙總：只加總由其他套件引入的那幾列，套件內部的子模組不重複計算
+    totals: Dict[str, int] = {}
+    ancestors: List[Tuple[int, str]] = []
+    for depth, name, cumulative in reversed(entries):
+        while ancestors and ancestors[-1][0] >= depth:
+            ancestors.pop()
+        root = name.split(".")[0]
+        if not ancestors or ancestors[-1][1] != root:
+            totals[root] = totals.get(root, 0) + cumulative
+        ancestors.append((depth, root))
+    top = sorted(((us, mod) for mod, us in totals.items() if mod not in _SKIP), reverse=True)
+    missing = [m for m in proc.stdout.strip().split(",") if m]
+    return seconds, top, missing
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="量測 app.py 各子指令的啟動（import）時間")
+    parser.add_argument("commands", nargs="*", help="子指令，預設為全部")
+    parser.add_argument("--repeat", type=int, default=3, help="每個子指令量測次數，取最小值")
+    parser.add_argument("--top", type=int, default=5, help="列出累積耗時最多的套件數")
+    parser.add_argument("--out", default=None, help="另存報表文字檔")
+    args = parser.parse_args()
+
+    table = _handler_imports()
+    names = args.commands or list(table)
+    targets = [(n, table[n]) for n in names]
+    if not args.commands:
+        targets.append((ALL, list(dict.fromkeys(i for n in table for i in table[n]))))
+
+    lines = [f"Python {sys.version.split()[0]}，每項取 {args.repeat} 次最小值", ""]
+    for name, imports in targets:
+        runs = [_measure(imports) for _ in range(max(1, args.repeat))]
+        seconds, top, missing = min(runs, key=lambda r: r[0])
+        heavy = "，".join(f"{mod} {us / 1e6:.2f}s" for us, mod in top[: args.top])
+        note = f"（未安裝 {', '.join(missing)}，未計入）" if missing else ""
+        lines.append(f"{name:<24} {seconds:6.2f}s   {heavy}{note}")
+    report = "\n".join(lines)
+    print(report)
+    if args.out:
+        Path(args.out).write_text(report + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
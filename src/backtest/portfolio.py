@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import heapq
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.vectorized import START_CASH, _slipped_price, sma_crossover
+from src.data.universe import PriceUniverse
+
+
+def sizer_percents(risk_pct: float) -> int:
+    """與 `_setup_broker` 相同的 PercentSizer 百分比（1~100 的整數）。"""
+    return int(max(1, min(100, round(risk_pct * 100.0))))
+
+
+def _cross_matrix(close: np.ndarray, mask: np.ndarray, fast: int, slow: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """逐檔在自己的交易日上計算交叉訊號，回傳 (交叉矩陣, 下一根所在列, 指標暖機完成列)。
+
+    停牌或上市前後的缺日不產生訊號，也不會重複沿用前一日的訊號；
+    下一根所在列為 -1 表示該檔之後已無資料（掛出的單不會成交）。
+    """
+    n, m = close.shape
+    cross = np.zeros((n, m), dtype=np.int8)
+    next_row = np.full((n, m), -1, dtype=np.int64)
+    first = np.full(m, n, dtype=np.int64)
+    for j in range(m):
+        rows = np.flatnonzero(mask[:, j])
+        if not len(rows):
+            continue
+        cross[rows, j] = sma_crossover(close[rows, j], fast, slow)
+        next_row[rows[:-1], j] = rows[1:]
+        warm = max(fast, slow)  # 交叉指標第一個有效值（0 起算）
+        if len(rows) > warm:
+            first[j] = rows[warm]
+    return cross, next_row, first
+
+
+def _fills_frame(fills: List[Tuple[int, int, bool, float, float, float]], dates: pd.DatetimeIndex, symbols: List[str]) -> pd.DataFrame:
+    cols = ["date", "symbol", "side", "size", "price", "commission"]
+    if not fills:
+        return pd.DataFrame(columns=cols)
+    rows, cols_j, isbuy, size, price, comm = (np.array(v) for v in zip(*fills))
+    return pd.DataFrame({
+        "date": dates[rows], "symbol": np.asarray(symbols, dtype=object)[cols_j],
+        "side": np.where(isbuy, "buy", "sell"), "size": size, "price": price, "commission": comm,
+    })
+
+
+def run_sma_cross_portfolio_vectorized(
+    dataframes_by_symbol: Union[Dict[str, pd.DataFrame], PriceUniverse],
+    fast: int = 10,
+    slow: int = 30,
+    commission: float = 0.001,
+    slippage_bps: int = 0,
+    risk_pct: float = 0.1,
+    cash: float = START_CASH,
+) -> Dict[str, Any]:
+    """矩陣版多標的 SMA 交叉組合回測，對應 `SmaCrossMultiStrategy` + `_setup_broker`。
+
+    輸入可為 {代碼: 日線} 或已對齊的 `PriceUniverse`（後者不需重新對齊）；均線與交叉逐檔在各自交易日上以陣列計算，
+    資金只在有訊號或成交的日子依序結算（事件數約為交易次數，與日期 x 標的無關），
+    持倉與現金變動最後以累加還原成整段矩陣。撮合規則同 backtrader：
+    - 訊號於該檔下一根開盤成交，百分比滑點不超出當日高低價，手續費為成交金額百分比
+    - 買進數量 = 當日現金 x percents / 收盤價（PercentSizer，可為小數股）；賣出為全部持倉
+    - 下單後先以收盤價試算（checksubmit），同一批單依序扣款，試算後現金為負即拒單；
+      實際成交時資金不足亦拒單
+    - 持倉以最後一筆收盤價計值（停牌期間沿用）
+
+    與 backtrader 的差異只在日曆不齊時：backtrader 要等所有標的暖機完成才開始交易，
+    且停牌日會沿用前一根的交叉值重複下單；這裡各檔暖機後即獨立交易，且只在有資料的日子產生訊號。
+    日曆對齊時結果一致（淨值差異僅為浮點加總順序）。
+
+    回傳 dict：equity（Series）、positions（DataFrame，日期 x 標的，股數）、fills（成交記錄 DataFrame）。
+    """
+    universe = dataframes_by_symbol
+    if not isinstance(universe, PriceUniverse):
+        universe = PriceUniverse.from_frames(universe, ["open", "high", "low", "close"])
+    symbols, dates = universe.symbols, universe.dates
+    close, open_, high, low = universe["close"], universe["open"], universe["high"], universe["low"]
+    n, m = close.shape
+    pct = sizer_percents(risk_pct) / 100
+    perc = slippage_bps / 10000.0 if slippage_bps > 0 else 0.0
+
+    cross, next_row, first = _cross_matrix(close, universe.mask, fast, slow)
+    start = int(first.min()) if m else n
+    if start >= n:
+        empty = pd.DataFrame(columns=["date", *symbols])
+        return {"equity": pd.Series(dtype=float, name="equity"), "positions": empty, "fills": _fills_frame([], dates, symbols)}
+
+    signal_rows = np.flatnonzero((cross != 0).any(axis=1))
+    events = list(signal_rows)
+    heapq.heapify(events)
+    cash_delta = np.zeros(n)
+    pos_delta = np.zeros((n, m))
+    position = np.zeros(m)
+    entry_price = np.zeros(m)
+    fills: List[Tuple[int, int, bool, float, float, float]] = []
+    balance = cash
+    submitted: List[Tuple[int, bool, float, float]] = []  # 尚未試算：(標的, 是否買進, 數量, 下單收盤價)
+    pending: List[Tuple[int, bool, float]] = []  # 已接受、等待成交：(標的, 是否買進, 數量)
+    last = -1
+
+    while events:
+        r = heapq.heappop(events)
+        if r == last:
+            continue
+        last = r
+
+        # 1) 上一根掛出的單以收盤價試算（同一批依序計算，現金為負即拒單且不回補）
+        if submitted:
+            sim = balance
+            for j, isbuy, size, price in submitted:
+                value = size * price
+                if isbuy:
+                    sim -= value
+                    sim -= size * commission * price
+                else:
+                    sim += value
+                    sim -= size * commission * price
+                if sim >= 0.0:
+                    pending.append((j, isbuy, size))
+            submitted = []
+
+        # 2) 該檔今日有新的一根時，以開盤價（含滑點）成交
+        still = []
+        for j, isbuy, size in pending:
+            if not universe.mask[r, j]:
+                still.append((j, isbuy, size))
+                continue
+            if isbuy:
+                price = _slipped_price(open_[r, j], high[r, j], perc, isbuy=True)
+                comm = size * commission * price
+                after = balance - size * price - comm
+                if after < 0.0:
+                    continue  # 資金不足，backtrader 以 Margin 拒單
+                balance = after
+                position[j] = size
+                entry_price[j] = price
+                cash_delta[r] += -size * price - comm
+                pos_delta[r, j] += size
+            else:
+                price = _slipped_price(open_[r, j], low[r, j], perc, isbuy=False)
+                comm = size * commission * price
+                proceeds = size * entry_price[j] + size * (price - entry_price[j])
+                balance = balance + proceeds - comm
+                cash_delta[r] += proceeds - comm
+                pos_delta[r, j] -= size
+                position[j] = 0.0
+            fills.append((r, j, isbuy, size, price, comm))
+        pending = still
+
+        # 3) 策略：依標的順序檢查今日交叉
+        for j in np.flatnonzero(cross[r]):
+            if position[j] == 0.0 and cross[r, j] > 0:
+                size = balance / close[r, j] * pct
+                submitted.append((int(j), True, size, close[r, j]))
+            elif position[j] != 0.0 and cross[r, j] < 0:
+                submitted.append((int(j), False, position[j], close[r, j]))
+            else:
+                continue
+            if next_row[r, j] >= 0:
+                heapq.heappush(events, int(next_row[r, j]))
+        if submitted and r + 1 < n:
+            heapq.heappush(events, r + 1)
+
+    positions = np.cumsum(pos_delta, axis=0)
+    marks = pd.DataFrame(close).ffill().to_numpy()
+    holding = np.where(positions != 0.0, positions * np.nan_to_num(marks), 0.0)
+    equity = cash + np.cumsum(cash_delta) + holding.sum(axis=1)
+
+    idx = dates[start:]
+    pos_df = pd.DataFrame(positions[start:], columns=symbols)
+    pos_df.insert(0, "date", idx)
+    return {
+        "equity": pd.Series(equity[start:], index=idx, name="equity"),
+        "positions": pos_df,
+        "fills": _fills_frame(fills, dates, symbols),
+    }
+
+
+__all__ = ["run_sma_cross_portfolio_vectorized", "sizer_percents"]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.config import OUTPUTS_DIR
+from src.utils.symbols import normalize_hk_symbol
+
+
+CACHE_DIR = OUTPUTS_DIR / "cache" / "backtest"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 結果格式變更時遞增，舊項目自然失效
+CACHE_FORMAT = 1
+
+_DATA_COLUMNS = ("date", "open", "high", "low", "close", "volume")
+_TRADE_COLUMNS = ("entry_date", "entry_price", "exit_date", "exit_price", "pnl")
+
+
+def _plain(obj: Any) -> Any:
+    """把 analyzer 結果（AutoOrderedDict、numpy 純量）轉為可 JSON 序列化的一般型別。"""
+    if isinstance(obj, dict):
+        return {str(k): _plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def data_digest(df: pd.DataFrame) -> str:
+    """日線內容的 SHA-256（date/OHLCV）：資料被更新或修正時必然改變。"""
+    cols = [c for c in _DATA_COLUMNS if c in df.columns]
+    return hashlib.sha256(pd.util.hash_pandas_object(df[cols], index=False).to_numpy().tobytes()).hexdigest()
+
+
+class BacktestResultCache:
+    """單標的回測結果的磁碟快取（OUTPUTS_DIR/cache/backtest/<代碼>/<鍵>.npz）。
+
+    鍵為日線內容雜湊 + 引擎與參數的 SHA-256，資料或參數一變就是新的鍵。每筆結果存成一個
+    npz：摘要與風險面板為 JSON 位元組，交易記錄與資金曲線為逐欄的 numpy 陣列（不需 pickle），
+    另附已繪好的資金曲線 PNG，命中時連圖都不必重畫。
+    總大小超過 `max_bytes` 時依最後使用時間（命中時更新檔案 mtime）淘汰最舊的項目。
+    """
+
+    def __init__(self, root: Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root) if root is not None else CACHE_DIR
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, df: pd.DataFrame, params: Dict[str, Any]) -> str:
+        payload = json.dumps({"format": CACHE_FORMAT, "data": data_digest(df), "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, symbol: str, key: str) -> Path:
+        return self.root / normalize_hk_symbol(symbol) / f"{key[:32]}.npz"
+
+    def get(self, symbol: str, key: str) -> Optional[Dict[str, Any]]:
+        """命中時回傳結果 dict（sharpe, drawdown, trades, panel, trade_list, equity, png）。"""
+        path = self._path(symbol, key)
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+                trade_list = pd.DataFrame({c: z[f"trade_{c}"] for c in _TRADE_COLUMNS}).to_dict("records")
+                equity = pd.Series(z["equity"], index=pd.DatetimeIndex(z["equity_date"]), name="equity")
+                png = z["png"].tobytes() if "png" in z.files else None
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)  # 標記為最近使用
+        with self._lock:
+            self.hits += 1
+        return {**meta, "trade_list": [_plain(t) for t in trade_list], "equity": equity, "png": png}
+
+    def put(self, symbol: str, key: str, result: Dict[str, Any]) -> Path:
+        path = self._path(symbol, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {k: _plain(result[k]) for k in ("sharpe", "drawdown", "trades", "panel")}
+        trades = pd.DataFrame(list(result["trade_list"]), columns=list(_TRADE_COLUMNS))
+        arrays = {
+            "meta": np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            "equity": result["equity"].to_numpy(dtype=np.float64),
+            "equity_date": pd.DatetimeIndex(result["equity"].index).to_numpy("datetime64[ns]"),
+        }
+        if result.get("png") is not None:
+            arrays["png"] = np.frombuffer(result["png"], dtype=np.uint8)
+        for c in _TRADE_COLUMNS:
+            col = trades[c]
+            arrays[f"trade_{c}"] = col.astype(str).to_numpy(dtype=str) if c.endswith("_date") else col.to_numpy(dtype=np.float64)
+        tmp = path.with_suffix(f".npz.tmp{os.getpid()}")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, path)
+        self._evict()
+        return path
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = []
+            for p in self.root.glob("*/*.npz"):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in files)
+            for _, size, p in sorted(files, key=lambda f: f[0])[:-1]:  # 至少保留最新的一筆
+                if total <= self.max_bytes:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+                self.evictions += 1
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """刪除某檔（或全部）的快取結果；資料更新後呼叫以立即釋放空間。"""
+        target = self.root if symbol is None else self.root / normalize_hk_symbol(symbol)
+        shutil.rmtree(target, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        files = list(self.root.glob("*/*.npz"))
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(files),
+                "bytes": sum(p.stat().st_size for p in files),
+            }
+
+
+_default_cache: Optional[BacktestResultCache] = None
+_default_lock = threading.Lock()
+
+
+def get_backtest_cache() -> BacktestResultCache:
+    """行程內共用的回測結果快取。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = BacktestResultCache()
+        return _default_cache
+
+
+def invalidate_backtest_cache(symbol: Optional[str] = None) -> None:
+    get_backtest_cache().invalidate(symbol)
+
+
+__all__ = [
+    "BacktestResultCache", "get_backtest_cache", "invalidate_backtest_cache", "data_digest", "CACHE_DIR",
+]
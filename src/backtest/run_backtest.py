@@ -1,19 +1,39 @@
 from __future__ import annotations
 
+import io
+import threading
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
 
-import matplotlib
-matplotlib.use("Agg")
-import backtrader as bt
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
-from src.backtest.strategies import SmaCrossStrategy
+from src.backtest.portfolio import run_sma_cross_portfolio_vectorized
+from src.backtest.result_cache import _plain, get_backtest_cache
+from src.backtest.trades import TRADE_LIST_COLUMNS, annotate_trades, trade_summary
+from src.backtest.vectorized import run_sma_cross_vectorized
 from src.config import OUTPUTS_DIR
+from src.data.universe import PriceUniverse
+
+if TYPE_CHECKING:
+    import backtrader as bt
+
+
+# pyplot 的全域狀態不是執行緒安全的；介面以背景執行緒回測時，繪圖需序列化
+_PLOT_LOCK = threading.Lock()
+
+
+def _pyplot():
+    """延遲載入 matplotlib（Agg 後端）：vectorized 引擎在快取命中時完全不需要繪圖套件。"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
 
 def _setup_broker(cerebro: bt.Cerebro, commission: float, slippage_bps: int, risk_pct: float) -> None:
+    import backtrader as bt
+
     cerebro.broker.set_cash(100000.0)
     cerebro.broker.setcommission(commission=commission)
     if slippage_bps > 0:
@@ -23,15 +43,17 @@ def _setup_broker(cerebro: bt.Cerebro, commission: float, slippage_bps: int, ris
     cerebro.addsizer(bt.sizers.PercentSizer, percents=percents)
 
 
-def run_backtest_from_dataframe(
+def _run_backtrader(
     df: pd.DataFrame,
-    symbol: str,
-    fast: int = 10,
-    slow: int = 30,
-    commission: float = 0.001,
-    slippage_bps: int = 0,
-    risk_pct: float = 0.1,
-) -> Path:
+    fast: int,
+    slow: int,
+    commission: float,
+    slippage_bps: int,
+    risk_pct: float,
+) -> Dict[str, Any]:
+    import backtrader as bt
+    from src.backtest.strategies import SmaCrossStrategy
+
     cerebro = bt.Cerebro()
     _setup_broker(cerebro, commission=commission, slippage_bps=slippage_bps, risk_pct=risk_pct)
 
@@ -54,43 +76,17 @@ def run_backtest_from_dataframe(
 
     results = cerebro.run()
     strat = results[0]
-    sharpe = strat.analyzers.sharpe.get_analysis()
-    dd = strat.analyzers.drawdown.get_analysis()
-    trades = strat.analyzers.trades.get_analysis()
+    return {
+        "sharpe": strat.analyzers.sharpe.get_analysis(),
+        "drawdown": strat.analyzers.drawdown.get_analysis(),
+        "trades": strat.analyzers.trades.get_analysis(),
+        "trade_list": strat.trades,
+        "final_value": float(cerebro.broker.getvalue()),
+    }
 
-    # 改為自繪資金曲線，避免 backtrader 原生 GUI 在 macOS 觸發 NSWindow 錯誤
-    out_path = OUTPUTS_DIR / f"backtest_{symbol}.png"
-    try:
-        # 嘗試用 analyzer 生成資金曲線
-        cerebro.addanalyzer(bt.analyzers.TimeReturn, _name="timereturns", timeframe=bt.TimeFrame.Days)
-    except Exception:
-        pass
-    # 若無 analyzer，使用收盤報酬近似
-    try:
-        tr = getattr(strat.analyzers, "timereturns").get_analysis()
-        sr = pd.Series(tr)
-        equity = (1.0 + sr.fillna(0)).cumprod()
-    except Exception:
-        equity = (1.0 + df['close'].pct_change().fillna(0)).cumprod()
-    plt.figure(figsize=(8, 3))
-    plt.plot(df['date'].iloc[-len(equity):], equity, label='Equity')
-    plt.title('Portfolio Equity (Approx)')
-    plt.xlabel('Date')
-    plt.ylabel('Equity')
-    plt.tight_layout()
-    plt.savefig(out_path, dpi=160)
-    plt.close()
-
-    # 亦可將指標輸出為文字檔與面板數據
-    summary_path = OUTPUTS_DIR / f"backtest_{symbol}.txt"
-    with open(summary_path, "w", encoding="utf-8") as f:
-        f.write("回測摘要\n")
-        f.write(f"Sharpe: {sharpe}\n")
-        f.write(f"Max Drawdown: {dd.get('max', {})}\n")
-        f.write(f"Trades: {trades}\n")
 
-    # 風險指標面板（CSV）：年化波動、Calmar、Sortino（近似）
-    import numpy as np
+def _risk_panel(df: pd.DataFrame, sharpe: Dict[str, Any], dd: Dict[str, Any]) -> Dict[str, float]:
+    """風險指標面板：年化波動、最大回撤、Sharpe、Calmar、Sortino（近似）。"""
     returns = df['close'].pct_change().dropna().values
     daily_vol = float(np.std(returns))
     ann_vol = daily_vol * np.sqrt(252)
@@ -98,73 +94,131 @@ def run_backtest_from_dataframe(
     sharpe_val = float(sharpe.get('sharperatio', 0) or 0)
     calmar = (sharpe_val * ann_vol) / max(1e-9, abs(max_dd)) if max_dd != 0 else np.nan
     sortino = sharpe_val  # 簡化：若需精確，另計下行波動
-    import pandas as pd
-    panel = pd.DataFrame([{
+    return {
         'ann_vol': ann_vol,
         'max_drawdown': max_dd,
         'sharpe': sharpe_val,
         'calmar': calmar,
         'sortino_approx': sortino,
-    }])
-    panel.to_csv(OUTPUTS_DIR / f"risk_panel_{symbol}.csv", index=False)
-
-    # 輸出交易記錄供 UI 疊加
-    trades_csv = OUTPUTS_DIR / f"trades_{symbol}.csv"
-    import pandas as pd
-    pd.DataFrame(strat.trades).to_csv(trades_csv, index=False)
-    return out_path
-
+    }
 
-class SmaCrossMultiStrategy(bt.Strategy):
-    params = dict(
-        fast_period=10,
-        slow_period=30,
-    )
 
-    def __init__(self):
-        self.inds: Dict[bt.LineSeries, Dict[str, Any]] = {}
-        self.symbols: List[str] = []
-        self.dates: List[pd.Timestamp] = []
-        self.equity: List[float] = []
-        self.positions_by_symbol: Dict[str, List[float]] = {}
-        for d in self.datas:
-            name = getattr(d, "_name", "") or str(len(self.symbols))
-            self.symbols.append(name)
-            self.positions_by_symbol[name] = []
-            inds = {}
-            inds["fast"] = bt.indicators.SMA(d.close, period=self.p.fast_period)
-            inds["slow"] = bt.indicators.SMA(d.close, period=self.p.slow_period)
-            inds["cross"] = bt.indicators.CrossOver(inds["fast"], inds["slow"])
-            self.inds[d] = inds
-
-    def next(self):
-        for d in self.datas:
-            pos = self.getposition(d)
-            cross = self.inds[d]["cross"]
-            if not pos:
-                if cross > 0:
-                    self.buy(data=d)
-            else:
-                if cross < 0:
-                    self.sell(data=d)
-
-        # 記錄組合淨值與持倉
-        self.dates.append(pd.Timestamp(self.datas[0].datetime.date(0)))
-        self.equity.append(float(self.broker.getvalue()))
-        for d in self.datas:
-            name = getattr(d, "_name", "")
-            size = float(self.getposition(d).size)
-            self.positions_by_symbol[name].append(size)
+def _compute_backtest(
+    df: pd.DataFrame,
+    fast: int,
+    slow: int,
+    commission: float,
+    slippage_bps: int,
+    risk_pct: float,
+    engine: str,
+) -> Dict[str, Any]:
+    """執行回測並整理成可快取的結果：analyzer 摘要、風險面板、交易記錄與資金曲線。"""
+    if engine == "backtrader":
+        result = _run_backtrader(df, fast, slow, commission, slippage_bps, risk_pct)
+    elif engine == "vectorized":
+        result = run_sma_cross_vectorized(
+            df, fast=fast, slow=slow, commission=commission,
+            slippage_bps=slippage_bps, risk_pct=risk_pct,
+        )
+    else:
+        raise ValueError(f"未知的回測引擎：{engine}（可用 backtrader / vectorized）")
+    # 資金曲線以收盤報酬近似（兩種引擎輸出一致）
+    equity = (1.0 + df['close'].pct_change().fillna(0)).cumprod()
+    return {
+        "sharpe": _plain(result["sharpe"]),
+        "drawdown": _plain(result["drawdown"]),
+        "trades": _plain(result["trades"]),
+        "panel": _risk_panel(df, result["sharpe"], result["drawdown"]),
+        "trade_list": result["trade_list"],
+        "equity": pd.Series(equity.to_numpy(), index=pd.DatetimeIndex(pd.to_datetime(df['date'])), name="equity"),
+    }
 
 
-def run_backtest_portfolio(
-    dataframes_by_symbol: Dict[str, pd.DataFrame],
+def run_backtest_from_dataframe(
+    df: pd.DataFrame,
+    symbol: str,
     fast: int = 10,
     slow: int = 30,
     commission: float = 0.001,
     slippage_bps: int = 0,
     risk_pct: float = 0.1,
+    engine: str = "backtrader",
+    use_cache: bool = True,
 ) -> Path:
+    """單標的 SMA 交叉回測，輸出資金曲線圖、摘要、風險面板與交易記錄。
+
+    engine="backtrader" 使用 Cerebro 逐根模擬；engine="vectorized" 使用
+    `src.backtest.vectorized` 以 NumPy 重現相同撮合與 analyzer 結果，適合大量回測。
+    結果依日線內容與參數快取於 `BacktestResultCache`，相同資料與參數再次執行時
+    不重跑模擬也不重繪圖（圖檔一併快取），只寫出檔案；`use_cache=False` 強制重算。
+    """
+    params = dict(engine=engine, fast=int(fast), slow=int(slow), commission=float(commission),
+                  slippage_bps=int(slippage_bps), risk_pct=float(risk_pct))
+    cache = get_backtest_cache() if use_cache else None
+    key = cache.key(df, params) if cache is not None else None
+    result = cache.get(symbol, key) if cache is not None else None
+    hit = result is not None
+    if not hit:
+        result = _compute_backtest(df, fast, slow, commission, slippage_bps, risk_pct, engine)
+    sharpe = result["sharpe"]
+    dd = result["drawdown"]
+    trades = result["trades"]
+
+    # 改為自繪資金曲線，避免 backtrader 原生 GUI 在 macOS 觸發 NSWindow 錯誤
+    out_path = OUTPUTS_DIR / f"backtest_{symbol}.png"
+    if result.get("png") is None:
+        equity = result["equity"]
+        buf = io.BytesIO()
+        plt = _pyplot()
+        with _PLOT_LOCK:
+            plt.figure(figsize=(8, 3))
+            plt.plot(equity.index, equity.to_numpy(), label='Equity')
+            plt.title('Portfolio Equity (Approx)')
+            plt.xlabel('Date')
+            plt.ylabel('Equity')
+            plt.tight_layout()
+            plt.savefig(buf, format="png", dpi=160)
+            plt.close()
+        result["png"] = buf.getvalue()
+    if cache is not None and not hit:
+        cache.put(symbol, key, result)
+    out_path.write_bytes(result["png"])
+
+    # 亦可將指標輸出為文字檔與面板數據
+    summary_path = OUTPUTS_DIR / f"backtest_{symbol}.txt"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        f.write("回測摘要\n")
+        f.write(f"Sharpe: {sharpe}\n")
+        f.write(f"Max Drawdown: {dd.get('max', {})}\n")
+        f.write(f"Trades: {trades}\n")
+        stats = trade_summary(annotate_trades(df, result["trade_list"]))
+        if stats is not None:
+            f.write(
+                f"交易區間：{stats['count']} 筆，勝率 {stats['win_rate']*100:.1f}%，平均報酬 {stats['avg_pnl']*100:.2f}%，"
+                f"平均持有 {stats['avg_bars']:.1f} 根，最差區間回撤 {stats['worst_drawdown']*100:.1f}%\n"
+            )
+
+    # 風險指標面板（CSV）：年化波動、Calmar、Sortino（近似）
+    pd.DataFrame([result["panel"]]).to_csv(OUTPUTS_DIR / f"risk_panel_{symbol}.csv", index=False)
+
+    # 輸出交易記錄供 UI 疊加
+    trades_csv = OUTPUTS_DIR / f"trades_{symbol}.csv"
+    pd.DataFrame(result["trade_list"], columns=list(TRADE_LIST_COLUMNS)).to_csv(trades_csv, index=False)
+    return out_path
+
+
+def _run_portfolio_backtrader(
+    dataframes_by_symbol: Dict[str, pd.DataFrame],
+    fast: int,
+    slow: int,
+    commission: float,
+    slippage_bps: int,
+    risk_pct: float,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    import backtrader as bt
+    from src.backtest.strategies import SmaCrossMultiStrategy
+
+    _pyplot()  # cerebro.plot 使用 matplotlib，先切到 Agg 後端
     cerebro = bt.Cerebro()
     _setup_broker(cerebro, commission=commission, slippage_bps=slippage_bps, risk_pct=risk_pct)
 
@@ -189,7 +243,6 @@ def run_backtest_portfolio(
     cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="trades")
 
     results = cerebro.run()
-    out_path = OUTPUTS_DIR / "backtest_portfolio.png"
     plots = cerebro.plot(style="candlestick", volume=False, iplot=False)
     def iter_figs(obj: Any):
         if obj is None:
@@ -201,16 +254,73 @@ def run_backtest_portfolio(
                 yield from iter_figs(x)
     figs: List[Any] = list(iter_figs(plots))
     if figs:
-        figs[0].savefig(out_path, dpi=180, bbox_inches="tight")
+        figs[0].savefig(OUTPUTS_DIR / "backtest_portfolio.png", dpi=180, bbox_inches="tight")
 
     # 組合資產曲線與持倉曲線
-    strat: SmaCrossMultiStrategy = results[0]
+    strat = results[0]
     equity_df = pd.DataFrame({
         "date": strat.dates,
         "equity": strat.equity,
     })
+    pos_df = pd.DataFrame({"date": strat.dates})
+    for name, series in strat.positions_by_symbol.items():
+        pos_df[name] = series
+    return equity_df, pos_df
+
+
+def _plot_portfolio_overview(equity_df: pd.DataFrame, out_path: Path) -> None:
+    """向量化引擎的組合總覽圖：淨值與回撤（取代 cerebro.plot 的逐檔 K 線）。"""
+    equity = equity_df["equity"].to_numpy()
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0 if len(equity) else equity
+    plt = _pyplot()
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 5), sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+    ax1.plot(equity_df["date"], equity, label="Portfolio Equity")
+    ax1.set_title("Portfolio Backtest (Vectorized)")
+    ax1.set_ylabel("Equity")
+    ax2.fill_between(equity_df["date"], drawdown, 0.0, color="tab:red", alpha=0.4)
+    ax2.set_ylabel("Drawdown")
+    ax2.set_xlabel("Date")
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=160)
+    plt.close(fig)
+
+
+def run_backtest_portfolio(
+    dataframes_by_symbol: Dict[str, pd.DataFrame] | PriceUniverse,
+    fast: int = 10,
+    slow: int = 30,
+    commission: float = 0.001,
+    slippage_bps: int = 0,
+    risk_pct: float = 0.1,
+    engine: str = "backtrader",
+) -> Path:
+    """多標的 SMA 交叉組合回測，輸出總覽圖、淨值與持倉的 CSV / PNG。
+
+    engine="backtrader" 以 Cerebro 逐根模擬；engine="vectorized" 使用
+    `src.backtest.portfolio` 的矩陣引擎（日曆對齊時結果一致，數百檔、數十年只需數秒）。
+    輸入可為 {代碼: 日線} 或 `PriceUniverse` 面板。
+    """
+    out_path = OUTPUTS_DIR / "backtest_portfolio.png"
+    if engine == "backtrader":
+        if isinstance(dataframes_by_symbol, PriceUniverse):
+            dataframes_by_symbol = dataframes_by_symbol.frames()
+        equity_df, pos_df = _run_portfolio_backtrader(
+            dataframes_by_symbol, fast, slow, commission, slippage_bps, risk_pct,
+        )
+    elif engine == "vectorized":
+        result = run_sma_cross_portfolio_vectorized(
+            dataframes_by_symbol, fast=fast, slow=slow, commission=commission,
+            slippage_bps=slippage_bps, risk_pct=risk_pct,
+        )
+        equity_df = result["equity"].rename_axis("date").reset_index()
+        pos_df = result["positions"]
+        _plot_portfolio_overview(equity_df, out_path)
+    else:
+        raise ValueError(f"未知的回測引擎：{engine}（可用 backtrader / vectorized）")
+
     equity_df.to_csv(OUTPUTS_DIR / "portfolio_equity.csv", index=False)
 
+    plt = _pyplot()
     plt.figure(figsize=(10, 4))
     plt.plot(equity_df["date"], equity_df["equity"], label="Portfolio Equity")
     plt.title("Portfolio Equity Curve")
@@ -220,18 +330,17 @@ def run_backtest_portfolio(
     plt.savefig(OUTPUTS_DIR / "portfolio_equity.png", dpi=160)
     plt.close()
 
-    pos_df = pd.DataFrame({"date": strat.dates})
-    for name, series in strat.positions_by_symbol.items():
-        pos_df[name] = series
     pos_df.to_csv(OUTPUTS_DIR / "portfolio_positions.csv", index=False)
 
+    names = [c for c in pos_df.columns if c != "date"]
     plt.figure(figsize=(10, 4))
-    for name in strat.positions_by_symbol.keys():
-        plt.plot(pos_df["date"], pos_df[name], label=name)
+    if names:
+        plt.plot(pos_df["date"], pos_df[names].to_numpy(), label=names)
     plt.title("Positions by Symbol (Size)")
     plt.xlabel("Date")
     plt.ylabel("Position Size")
-    plt.legend(loc="upper left")
+    if len(names) <= 20:  # 標的太多時圖例會蓋住整張圖
+        plt.legend(loc="upper left")
     plt.tight_layout()
     plt.savefig(OUTPUTS_DIR / "portfolio_positions.png", dpi=160)
     plt.close()
@@ -1,15 +1,25 @@
 from __future__ import annotations
 
-from typing import Iterable, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Tuple
 
 import numpy as np
 import pandas as pd
+from tqdm import tqdm
+
+from src.data.universe import PriceUniverse
+from src.indicators.engine import IndicatorGraph, compute_indicators
+
+
+SCAN_COLUMNS = ["fast", "slow", "sharpe", "max_dd"]
 
 
 def _sma_vectorized(df: pd.DataFrame, fast: int, slow: int, commission: float = 0.0) -> pd.DataFrame:
     data = df.copy().sort_values("date")
-    data["fast"] = data["close"].rolling(fast).mean()
-    data["slow"] = data["close"].rolling(slow).mean()
+    ind = compute_indicators(data, [f"ma{fast}", f"ma{slow}"])
+    data["fast"] = ind[f"ma{fast}"]
+    data["slow"] = ind[f"ma{slow}"]
     signal = (data["fast"] > data["slow"]).astype(int)
     position = signal.shift(1).fillna(0)
     ret = data["close"].pct_change().fillna(0.0)
@@ -27,28 +37,189 @@ def _max_drawdown(equity: pd.Series) -> float:
     return float(dd.min())
 
 
+def _rolling_mean_matrix(close: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    """每個視窗只算一次移動平均，堆疊為 (len(windows), len(close)) 矩陣。
+
+    以指標計算圖的滾動和求均線（與 pandas `rolling(w).mean()` 逐位元相同），而非累積和
+    相減：價格以跳動單位取整時，均線常出現完全相等的情形，累積和的捨入誤差會把平手
+    變成假交叉，與原結果不一致。
+    """
+    graph = IndicatorGraph()
+    names = [graph.add(f"ma{int(w)}")[0] for w in windows]
+    cols = graph.evaluate(close)
+    out = np.empty((len(windows), len(close)))
+    for k, name in enumerate(names):
+        out[k] = cols[name]
+    return out
+
+
+def _evaluate_pairs(
+    means: np.ndarray,
+    ret: np.ndarray,
+    fast_rows: np.ndarray,
+    slow_rows: np.ndarray,
+    commission: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """對一批 (fast, slow) 組合同時計算 Sharpe 與最大回撤，邏輯等同 `_sma_vectorized`。"""
+    signal = means[fast_rows] > means[slow_rows]  # NaN 比較結果為 False
+    position = np.zeros(signal.shape)
+    position[:, 1:] = signal[:, :-1]
+    trade_change = np.zeros(signal.shape)
+    trade_change[:, 1:] = np.abs(np.diff(position, axis=1))
+    strat_ret = position * ret - trade_change * commission
+
+    mean = strat_ret.mean(axis=1)
+    std = strat_ret.std(axis=1, ddof=1)
+    std = np.where(std == 0, 1e-9, std)
+    sharpe = mean / std * np.sqrt(252)
+
+    equity = np.cumprod(1.0 + strat_ret, axis=1)
+    cummax = np.maximum.accumulate(equity, axis=1)
+    max_dd = (equity / cummax - 1.0).min(axis=1)
+    return sharpe, max_dd
+
+
+def _scan_close_array(
+    close: np.ndarray,
+    fast_list: List[int],
+    slow_list: List[int],
+    commission: float,
+    chunk_size: int | None = None,
+) -> pd.DataFrame:
+    """對已依日期排序的收盤價陣列掃描參數網格。"""
+    pairs: List[Tuple[int, int]] = [(f, s) for f in fast_list for s in slow_list if f < s]
+    n = len(close)
+    if not pairs or n < 10:
+        return pd.DataFrame(columns=SCAN_COLUMNS)
+
+    windows = np.array(sorted({w for pair in pairs for w in pair}))
+    row_of = {int(w): i for i, w in enumerate(windows)}
+    means = _rolling_mean_matrix(close, windows)
+
+    ret = np.zeros(n)
+    ret[1:] = close[1:] / close[:-1] - 1.0
+    ret[np.isnan(ret)] = 0.0
+
+    fast_rows = np.array([row_of[f] for f, _ in pairs])
+    slow_rows = np.array([row_of[s] for _, s in pairs])
+    if chunk_size is None:
+        # 每批約 400 萬個元素，兼顧速度與記憶體
+        chunk_size = max(1, 4_000_000 // n)
+
+    sharpe = np.empty(len(pairs))
+    max_dd = np.empty(len(pairs))
+    for start in range(0, len(pairs), chunk_size):
+        sl = slice(start, start + chunk_size)
+        sharpe[sl], max_dd[sl] = _evaluate_pairs(means, ret, fast_rows[sl], slow_rows[sl], commission)
+
+    return pd.DataFrame({
+        "fast": [f for f, _ in pairs],
+        "slow": [s for _, s in pairs],
+        "sharpe": sharpe,
+        "max_dd": max_dd,
+    })
+
+
 def scan_sma_grid(
     df: pd.DataFrame,
     fast_grid: Iterable[int],
     slow_grid: Iterable[int],
     commission: float = 0.001,
+    chunk_size: int | None = None,
+) -> pd.DataFrame:
+    """掃描 SMA 交叉參數網格，回傳每組 (fast, slow) 的 Sharpe 與最大回撤。
+
+    只排序一次、每個視窗的均線只算一次，再以 NumPy 批次評估所有組合；
+    `chunk_size` 控制每批組合數，用於限制大網格的記憶體用量。
+    """
+    close = df.sort_values("date")["close"].to_numpy(dtype=float)
+    return _scan_close_array(
+        close,
+        [int(f) for f in fast_grid],
+        [int(s) for s in slow_grid],
+        commission=commission,
+        chunk_size=chunk_size,
+    )
+
+
+def _scan_shared(
+    shm_name: str,
+    shape: Tuple[int, int],
+    col: int,
+    rows: slice | np.ndarray,
+    fast_list: List[int],
+    slow_list: List[int],
+    commission: float,
+) -> pd.DataFrame:
+    """子行程入口：掛載共享記憶體中的收盤價面板，取出該檔的交易日後掃描。
+
+    `rows` 為該檔第一根到最後一根的列範圍（無停牌缺日時為零拷貝視圖），
+    或有缺日時的列索引陣列。
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        panel = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order="F")
+        close = panel[rows, col]
+        res = _scan_close_array(close, fast_list, slow_list, commission)
+        del close, panel
+    finally:
+        shm.close()
+    return res
+
+
+def scan_universe(
+    symbols: Iterable[str] | PriceUniverse,
+    fast_grid: Iterable[int],
+    slow_grid: Iterable[int],
+    workers: int | None = None,
+    commission: float = 0.001,
 ) -> pd.DataFrame:
-    rows = []
-    price_ret = df["close"].pct_change().dropna()
-    daily_vol = float(price_ret.std())
-    ann = np.sqrt(252)
-    for f in fast_grid:
-        for s in slow_grid:
-            if f >= s:
-                continue
-            sim = _sma_vectorized(df, f, s, commission=commission)
-            r = sim["strat_ret"].dropna()
-            if len(r) < 10:
-                continue
-            mean = float(r.mean())
-            std = float(r.std() or 1e-9)
-            sharpe = (mean / std) * ann
-            mdd = _max_drawdown(sim["equity"].fillna(1.0))
-            rows.append(dict(fast=f, slow=s, sharpe=sharpe, max_dd=mdd))
-    return pd.DataFrame(rows)
+    """多標的參數掃描：收盤價面板放入共享記憶體，以行程池逐標的平行計算。
+
+    `symbols` 可為代碼清單（從本地資料庫讀取）或已載入的 `PriceUniverse`。
+    回傳長表格，欄位為 symbol, fast, slow, sharpe, max_dd；本地無資料的標的會略過並提示。
+    `workers=1` 時於本行程依序執行，方便除錯。
+    """
+    fast_list = [int(f) for f in fast_grid]
+    slow_list = [int(s) for s in slow_grid]
+    universe = symbols if isinstance(symbols, PriceUniverse) else PriceUniverse.load(symbols, ["close"])
+    if not len(universe):
+        return pd.DataFrame(columns=["symbol"] + SCAN_COLUMNS)
+
+    # 整個（日期 x 標的）收盤價面板放進一塊共享記憶體（Fortran 順序，每檔一段連續記憶體）
+    shape = universe.shape
+    shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1]) * 8)
+    try:
+        buf = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order="F")
+        buf[:] = universe["close"]
+        del buf
+        spans: Dict[str, Tuple[int, slice | np.ndarray]] = {}
+        for symbol in universe.symbols:
+            lo, hi = universe.span(symbol)
+            j = universe.column(symbol)
+            spans[symbol] = (j, slice(lo, hi) if universe.mask[lo:hi, j].all() else universe.bar_rows(symbol))
+
+        frames: Dict[str, pd.DataFrame] = {}
+        progress = tqdm(total=len(spans), desc="參數掃描", unit="檔")
+        if workers == 1:
+            for symbol, (j, rows) in spans.items():
+                frames[symbol] = _scan_shared(shm.name, shape, j, rows, fast_list, slow_list, commission)
+                progress.update(1)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(_scan_shared, shm.name, shape, j, rows, fast_list, slow_list, commission): symbol
+                    for symbol, (j, rows) in spans.items()
+                }
+                for fut in as_completed(futures):
+                    frames[futures[fut]] = fut.result()
+                    progress.update(1)
+        progress.close()
+    finally:
+        shm.close()
+        shm.unlink()
 
+    parts = [frames[s].assign(symbol=s) for s in spans if not frames[s].empty]
+    if not parts:
+        return pd.DataFrame(columns=["symbol"] + SCAN_COLUMNS)
+    return pd.concat(parts, ignore_index=True)[["symbol"] + SCAN_COLUMNS]
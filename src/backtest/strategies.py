@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from typing import Any, Dict, List
+
 import backtrader as bt
+import pandas as pd
 
 
 class SmaCrossStrategy(bt.Strategy):
@@ -44,4 +47,46 @@ class SmaCrossStrategy(bt.Strategy):
             print(f"{dt.isoformat()}, {txt}")
 
 
-__all__ = ["SmaCrossStrategy"]
+class SmaCrossMultiStrategy(bt.Strategy):
+    params = dict(
+        fast_period=10,
+        slow_period=30,
+    )
+
+    def __init__(self):
+        self.inds: Dict[bt.LineSeries, Dict[str, Any]] = {}
+        self.symbols: List[str] = []
+        self.dates: List[pd.Timestamp] = []
+        self.equity: List[float] = []
+        self.positions_by_symbol: Dict[str, List[float]] = {}
+        for d in self.datas:
+            name = getattr(d, "_name", "") or str(len(self.symbols))
+            self.symbols.append(name)
+            self.positions_by_symbol[name] = []
+            inds = {}
+            inds["fast"] = bt.indicators.SMA(d.close, period=self.p.fast_period)
+            inds["slow"] = bt.indicators.SMA(d.close, period=self.p.slow_period)
+            inds["cross"] = bt.indicators.CrossOver(inds["fast"], inds["slow"])
+            self.inds[d] = inds
+
+    def next(self):
+        for d in self.datas:
+            pos = self.getposition(d)
+            cross = self.inds[d]["cross"]
+            if not pos:
+                if cross > 0:
+                    self.buy(data=d)
+            else:
+                if cross < 0:
+                    self.sell(data=d)
+
+        # 記錄組合淨值與持倉
+        self.dates.append(pd.Timestamp(self.datas[0].datetime.date(0)))
+        self.equity.append(float(self.broker.getvalue()))
+        for d in self.datas:
+            name = getattr(d, "_name", "")
+            size = float(self.getposition(d).size)
+            self.positions_by_symbol[name].append(size)
+
+
+__all__ = ["SmaCrossStrategy", "SmaCrossMultiStrategy"]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 回測輸出的原始交易記錄（trades_<代碼>.csv）欄位；無交易時也寫出表頭，讀取端不必特判空檔
+TRADE_LIST_COLUMNS = ("entry_date", "entry_price", "exit_date", "exit_price", "pnl")
+
+TRADE_TABLE_COLUMNS = (
+    "entry_idx", "exit_idx", "entry_date", "exit_date", "entry_price", "exit_price", "pnl", "bars",
+    "mid_date", "median_price", "min_price", "max_drawdown",
+)
+
+
+def pair_crossovers(cross_up: np.ndarray, cross_dn: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """把上穿 / 下穿訊號配成多頭交易，回傳 (進場列, 出場列)。
+
+    規則同逐根狀態機：空手時第一個上穿進場，持倉後第一個下穿出場；持倉中的重複上穿、
+    空手時的下穿都忽略，最後未平倉的進場不計。做法是把兩種事件依列合併，每段同類連續事件
+    只留第一個，去掉開頭的下穿後即為嚴格交替的「上、下、上、下…」。
+    """
+    ups = np.flatnonzero(np.asarray(cross_up, dtype=bool))
+    dns = np.flatnonzero(np.asarray(cross_dn, dtype=bool))
+    rows = np.concatenate([ups, dns])
+    kind = np.concatenate([np.ones(len(ups), dtype=np.int8), -np.ones(len(dns), dtype=np.int8)])
+    order = np.argsort(rows, kind="stable")
+    rows, kind = rows[order], kind[order]
+    keep = np.ones(len(kind), dtype=bool)
+    keep[1:] = kind[1:] != kind[:-1]
+    rows, kind = rows[keep], kind[keep]
+    if len(kind) and kind[0] < 0:
+        rows = rows[1:]
+    pairs = len(rows) // 2
+    return rows[0:2 * pairs:2], rows[1:2 * pairs:2]
+
+
+def segment_stats(close: np.ndarray, entry_idx: np.ndarray, exit_idx: np.ndarray) -> pd.DataFrame:
+    """各交易區間（含進出場兩端）的中位價、最低價與區間內最大回撤。
+
+    先以 repeat 展開所有區間的列與所屬交易編號，再用分組累積最大值一次算完回撤，
+    分組中位數 / 最小值也是 pandas 的向量化彙總，不逐筆切片。
+    """
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    exit_idx = np.asarray(exit_idx, dtype=np.int64)
+    lengths = exit_idx - entry_idx + 1
+    if not len(lengths):
+        return pd.DataFrame({"median_price": [], "min_price": [], "max_drawdown": []}, dtype=float)
+    group = np.repeat(np.arange(len(lengths)), lengths)
+    rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(entry_idx, lengths)
+    prices = pd.Series(np.asarray(close, dtype=float)[rows])
+    grouped = prices.groupby(group)
+    drawdown = (prices / grouped.cummax() - 1.0).groupby(group).min()
+    return pd.DataFrame({
+        "median_price": grouped.median().to_numpy(),
+        "min_price": grouped.min().to_numpy(),
+        "max_drawdown": drawdown.to_numpy(),
+    })
+
+
+def _trade_table(
+    dates: pd.Series,
+    close: np.ndarray,
+    entry_idx: np.ndarray,
+    exit_idx: np.ndarray,
+    entry_price: np.ndarray,
+    exit_price: np.ndarray,
+    pnl: np.ndarray,
+) -> pd.DataFrame:
+    dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+    stats = segment_stats(close, entry_idx, exit_idx)
+    mid = entry_idx + (exit_idx - entry_idx + 1) // 2
+    table = pd.DataFrame({
+        "entry_idx": entry_idx,
+        "exit_idx": exit_idx,
+        "entry_date": dates.iloc[entry_idx].to_numpy(),
+        "exit_date": dates.iloc[exit_idx].to_numpy(),
+        "entry_price": np.asarray(entry_price, dtype=float),
+        "exit_price": np.asarray(exit_price, dtype=float),
+        "pnl": np.asarray(pnl, dtype=float),
+        "bars": exit_idx - entry_idx,
+        "mid_date": dates.iloc[mid].to_numpy(),
+    })
+    for col in stats.columns:
+        table[col] = stats[col].to_numpy()
+    return table
+
+
+def crossover_trades(df: pd.DataFrame, cross_up: np.ndarray, cross_dn: np.ndarray) -> pd.DataFrame:
+    """由交叉訊號建立交易表（收盤價進出，pnl 為區間報酬）；欄位見 `TRADE_TABLE_COLUMNS`。"""
+    close = df["close"].to_numpy(dtype=float)
+    entry_idx, exit_idx = pair_crossovers(cross_up, cross_dn)
+    entry_price, exit_price = close[entry_idx], close[exit_idx]
+    pnl = exit_price / np.maximum(1e-9, entry_price) - 1.0
+    return _trade_table(df["date"], close, entry_idx, exit_idx, entry_price, exit_price, pnl)
+
+
+def annotate_trades(df: pd.DataFrame, trades: pd.DataFrame | Iterable[dict]) -> pd.DataFrame:
+    """替既有交易記錄（entry_date / exit_date / 價格 / pnl，例如回測的 trade_list 或交易 CSV）
+    補上在日線中的列位置、持有根數、中點日期與區間統計。
+
+    日期以二分搜尋對到 `df`（依日期排序）中不晚於該日的最後一根；進場日不在資料範圍內的交易略過，
+    出場日超出資料範圍時以最後一根計算區間統計。
+    """
+    tdf = pd.DataFrame(list(trades) if not isinstance(trades, pd.DataFrame) else trades)
+    if tdf.empty:
+        return pd.DataFrame(columns=list(TRADE_TABLE_COLUMNS))
+    dates = pd.DatetimeIndex(pd.to_datetime(df["date"]))
+    entry = pd.DatetimeIndex(pd.to_datetime(tdf["entry_date"]))
+    exit_ = pd.DatetimeIndex(pd.to_datetime(tdf["exit_date"]))
+    ok = (entry >= dates[0]) & (entry <= dates[-1]) if len(dates) else np.zeros(len(tdf), dtype=bool)
+    tdf, entry, exit_ = tdf[ok], entry[ok], exit_[ok]
+    entry_idx = dates.searchsorted(entry, side="right") - 1
+    exit_idx = np.maximum(dates.searchsorted(exit_, side="right") - 1, entry_idx)
+    close = df["close"].to_numpy(dtype=float)
+    pnl = tdf["pnl"] if "pnl" in tdf.columns else pd.Series(0.0, index=tdf.index)
+    return _trade_table(
+        df["date"], close, entry_idx.astype(np.int64), exit_idx.astype(np.int64),
+        tdf["entry_price"].to_numpy(dtype=float), tdf["exit_price"].to_numpy(dtype=float),
+        pnl.fillna(0.0).to_numpy(dtype=float),
+    )
+
+
+def trade_summary(table: pd.DataFrame) -> Optional[dict]:
+    """交易表的彙總：筆數、勝率、平均報酬、平均持有根數、最差的區間回撤；無交易時回傳 None。"""
+    if table.empty:
+        return None
+    return {
+        "count": int(len(table)),
+        "win_rate": float((table["pnl"] > 0).mean()),
+        "avg_pnl": float(table["pnl"].mean()),
+        "avg_bars": float(table["bars"].mean()),
+        "worst_drawdown": float(table["max_drawdown"].min()),
+    }
+
+
+__all__ = [
+    "pair_crossovers", "segment_stats", "crossover_trades", "annotate_trades", "trade_summary",
+    "TRADE_LIST_COLUMNS", "TRADE_TABLE_COLUMNS",
+]
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 與 backtrader 預設一致：SharpeRatio 無風險利率 1%（年），日資料換算係數 252
+RISK_FREE_RATE = 0.01
+DAYS_FACTOR = 252
+START_CASH = 100000.0
+MAXINT = 2 ** 63 - 1  # 同 backtrader.utils.py3.MAXINT，analyzer 以此作為 min 的初始值
+
+
+def _exact_sma_diff(close: np.ndarray, fast: int, slow: int) -> np.ndarray:
+    """回傳 fast 均線減 slow 均線。
+
+    backtrader 的 SMA 以 `math.fsum(window) / period` 計算；pandas rolling 的誤差極小，
+    但會讓「完全相等」的兩條均線變成些微正負，進而改變交叉判斷。
+    因此先以 pandas 算出全部，再對接近平手的位置以 fsum 重算，確保與 backtrader 一致。
+    """
+    s = pd.Series(close)
+    f_ma = s.rolling(fast).mean().to_numpy()
+    s_ma = s.rolling(slow).mean().to_numpy()
+    diff = f_ma - s_ma
+    scale = np.maximum(np.abs(f_ma), np.abs(s_ma))
+    with np.errstate(invalid="ignore"):
+        near = np.abs(diff) <= 1e-9 * scale
+    for i in np.flatnonzero(near):
+        fv = math.fsum(close[i - fast + 1:i + 1]) / fast
+        sv = math.fsum(close[i - slow + 1:i + 1]) / slow
+        diff[i] = fv - sv
+    return diff
+
+
+def sma_crossover(close: np.ndarray, fast: int, slow: int) -> np.ndarray:
+    """等同 `bt.indicators.CrossOver(SMA(fast), SMA(slow))`：上穿 +1、下穿 -1、其餘 0。
+
+    backtrader 以「最後一個非零差值」判斷前一狀態，均線相等的日子不會重置方向；
+    指標最早於第 max(fast, slow) 根（0 起算）產生值，之前一律為 0。
+    """
+    n = len(close)
+    cross = np.zeros(n, dtype=np.int8)
+    start = max(fast, slow) - 1
+    if n <= start + 1:
+        return cross
+    diff = _exact_sma_diff(close, fast, slow)
+    nzd = diff.copy()
+    tail = nzd[start + 1:]
+    tail[tail == 0] = np.nan
+    nzd[:start] = np.nan
+    nzd = pd.Series(nzd).ffill().to_numpy()
+    prev = nzd[start:-1]
+    cur = diff[start + 1:]
+    cross[start + 1:] = np.where((prev < 0) & (cur > 0), 1, np.where((prev > 0) & (cur < 0), -1, 0))
+    return cross
+
+
+def _slipped_price(price: float, bound: float, perc: float, isbuy: bool) -> float:
+    """市價單以開盤價成交並套用百分比滑點；超出當日高低價時以高/低價成交（slip_match）。"""
+    if not perc:
+        return price
+    if isbuy:
+        p = price * (1.0 + perc)
+        return p if p <= bound else bound
+    p = price * (1.0 - perc)
+    return p if p >= bound else bound
+
+
+def _streaks(flags: np.ndarray) -> Tuple[int, int]:
+    """回傳 (結尾連續次數, 最長連續次數)。"""
+    padded = np.concatenate([[0], flags.astype(np.int8), [0]])
+    edges = np.diff(padded)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    longest = int((ends - starts).max()) if len(starts) else 0
+    current = int(ends[-1] - starts[-1]) if len(starts) and ends[-1] == len(flags) else 0
+    return current, longest
+
+
+def _running_total(values: np.ndarray) -> float:
+    # 依序累加（與 analyzer 逐筆 += 的捨入一致）
+    return float(np.cumsum(values)[-1])
+
+
+def _len_stats(barlen: np.ndarray, count: int, with_min: bool) -> Dict[str, Any]:
+    total = int(barlen.sum())
+    stats: Dict[str, Any] = {
+        "total": total,
+        "average": total / (count or 1.0),
+        "max": max(0, int(barlen.max())),
+    }
+    if with_min:
+        nonzero = barlen[barlen != 0]
+        stats["min"] = int(nonzero.min()) if len(nonzero) else MAXINT
+    return stats
+
+
+def _trade_analysis(pnl: np.ndarray, pnlcomm: np.ndarray, barlen: np.ndarray, opened: int) -> Dict[str, Any]:
+    """以陣列運算產生與 backtrader TradeAnalyzer 相同結構與數值的統計字典（僅多單）。"""
+    closed = len(pnl)
+    total: Dict[str, Any] = {"total": opened}
+    if opened:
+        total["open"] = opened - closed
+    if not closed:
+        return {"total": total}
+    total["closed"] = closed
+
+    won = (pnlcomm >= 0.0).astype(np.int64)
+    lost = 1 - won
+    streak = {}
+    for name, flags in (("won", won), ("lost", lost)):
+        current, longest = _streaks(flags)
+        streak[name] = {"current": current, "longest": longest}
+
+    gross = _running_total(pnl)
+    net = _running_total(pnlcomm)
+    result: Dict[str, Any] = {
+        "total": total,
+        "streak": streak,
+        "pnl": {
+            "gross": {"total": gross, "average": gross / closed},
+            "net": {"total": net, "average": net / closed},
+        },
+    }
+    wl_pnl: Dict[str, Dict[str, float]] = {}
+    for name, flags, func in (("won", won, max), ("lost", lost, min)):
+        values = pnlcomm * flags
+        count = int(flags.sum())
+        wl_total = _running_total(values)
+        extreme = float(values.max() if func is max else values.min())
+        wl_pnl[name] = {"total": wl_total, "average": wl_total / (count or 1.0), "max": func(0.0, extreme)}
+        result[name] = {"total": count, "pnl": wl_pnl[name]}
+
+    # 本策略只做多：long 統計等同全部，short 全為 0
+    long_total = _running_total(pnlcomm)
+    result["long"] = {
+        "total": closed,
+        "pnl": {"total": long_total, "average": long_total / closed,
+                "won": dict(wl_pnl["won"]), "lost": dict(wl_pnl["lost"])},
+        "won": int(won.sum()),
+        "lost": int(lost.sum()),
+    }
+    zero_pnl = {"total": 0.0, "average": 0.0, "max": 0.0}
+    result["short"] = {
+        "total": 0,
+        "pnl": {"total": 0.0, "average": 0.0, "won": dict(zero_pnl), "lost": dict(zero_pnl)},
+        "won": 0,
+        "lost": 0,
+    }
+
+    length = _len_stats(barlen, closed, with_min=True)
+    length["won"] = _len_stats(barlen * won, int(won.sum()), with_min=bool(won.any()))
+    length["lost"] = _len_stats(barlen * lost, int(lost.sum()), with_min=bool(lost.any()))
+    length["long"] = _len_stats(barlen, closed, with_min=True)
+    length["long"]["won"] = _len_stats(barlen * won, int(won.sum()), with_min=True)
+    length["long"]["lost"] = _len_stats(barlen * lost, int(lost.sum()), with_min=True)
+    zeros = np.zeros(1, dtype=np.int64)
+    length["short"] = _len_stats(zeros, 0, with_min=True)
+    length["short"]["won"] = _len_stats(zeros, 0, with_min=True)
+    length["short"]["lost"] = _len_stats(zeros, 0, with_min=True)
+    result["len"] = length
+    return result
+
+
+def _sharpe_analysis(value: np.ndarray, start_cash: float) -> Dict[str, Any]:
+    """等同 SharpeRatio(timeframe=Days)：日報酬扣除換算後的無風險利率，母體標準差，不年化。"""
+    prev = np.concatenate([[start_cash], value[:-1]])
+    returns = value / prev - 1.0
+    rate = pow(1.0 + RISK_FREE_RATE, 1.0 / DAYS_FACTOR) - 1.0
+    ret_free = returns - rate
+    if not len(ret_free):
+        return {"sharperatio": None}
+    avg = math.fsum(ret_free.tolist()) / len(ret_free)
+    dev = math.sqrt(math.fsum(np.square(ret_free - avg).tolist()) / len(ret_free))
+    try:
+        ratio = avg / dev
+    except ZeroDivisionError:
+        ratio = None
+    return {"sharperatio": ratio}
+
+
+def _drawdown_analysis(value: np.ndarray) -> Dict[str, Any]:
+    """等同 DrawDown analyzer：最後一根的回撤與期間最大回撤（百分比、金額、持續根數）。"""
+    if len(value) == 0:
+        return {"len": 0, "drawdown": 0.0, "moneydown": 0.0,
+                "max": {"len": 0.0, "drawdown": 0.0, "moneydown": 0.0}}
+    peak = np.maximum.accumulate(value)
+    moneydown = peak - value
+    drawdown = 100.0 * moneydown / peak
+    # 連續處於回撤中的根數
+    in_dd = drawdown != 0
+    idx = np.arange(len(value))
+    reset = np.maximum.accumulate(np.where(in_dd, -1, idx))
+    length = np.where(in_dd, idx - reset, 0)
+    return {
+        "len": int(length[-1]),
+        "drawdown": float(drawdown[-1]),
+        "moneydown": float(moneydown[-1]),
+        "max": {
+            "len": max(0.0, int(length.max())),
+            "drawdown": max(0.0, float(drawdown.max())),
+            "moneydown": max(0.0, float(moneydown.max())),
+        },
+    }
+
+
+def run_sma_cross_vectorized(
+    df: pd.DataFrame,
+    fast: int = 10,
+    slow: int = 30,
+    commission: float = 0.001,
+    slippage_bps: int = 0,
+    risk_pct: float = 0.1,
+    cash: float = START_CASH,
+) -> Dict[str, Any]:
+    """以 NumPy 重現 backtrader 跑 `SmaCrossStrategy` 的結果（不經過 Cerebro）。
+
+    撮合規則與 `_setup_broker` 相同：訊號於下一根開盤成交、百分比滑點（不超出高低價）、
+    百分比手續費。`SmaCrossStrategy` 下單固定 `size=1`，因此 `risk_pct`（PercentSizer）
+    不影響結果，僅為與 backtrader 版本介面一致而保留。
+
+    回傳 dict：sharpe / drawdown / trades（analyzer 格式）、trade_list（策略交易記錄）、
+    equity（每根收盤後的帳戶價值）、final_value（期末帳戶價值）。
+    """
+    data = df.reset_index(drop=True)
+    close = data["close"].to_numpy(dtype=float)
+    open_ = data["open"].to_numpy(dtype=float)
+    high = data["high"].to_numpy(dtype=float)
+    low = data["low"].to_numpy(dtype=float)
+    dates = pd.DatetimeIndex(pd.to_datetime(data["date"]))
+    n = len(close)
+    perc = slippage_bps / 10000.0 if slippage_bps > 0 else 0.0
+
+    cross = sma_crossover(close, fast, slow)
+    ups = np.flatnonzero(cross > 0)
+    downs = np.flatnonzero(cross < 0)
+
+    # 上穿與下穿必然交替出現；每筆進場配對其後第一個下穿
+    exit_pos = np.searchsorted(downs, ups, side="right")
+    size = 1.0
+    cash_delta = np.zeros(n)
+    position = np.zeros(n)
+    closed: List[Tuple[float, float, int]] = []
+    trade_list: List[Dict[str, Any]] = []
+    opened = 0
+    balance = cash
+    last_exit_fill = -1
+    for up, k in zip(ups, exit_pos):
+        if up < last_exit_fill:
+            continue  # 仍持倉中（理論上不會發生）
+        buy_bar = up + 1
+        if buy_bar >= n:
+            break
+        buy_price = _slipped_price(open_[buy_bar], high[buy_bar], perc, isbuy=True)
+        buy_comm = size * commission * buy_price
+        if balance - size * buy_price - buy_comm < 0:
+            # 資金不足：backtrader 會以 Margin 拒單，等待下一次上穿
+            continue
+        opened += 1
+        balance -= size * buy_price + buy_comm
+        cash_delta[buy_bar] -= size * buy_price + buy_comm
+        if k >= len(downs):
+            position[buy_bar:] = size
+            last_exit_fill = n
+            break
+        down = downs[k]
+        trade_list.append(dict(
+            entry_date=str(dates[up].date()), entry_price=float(close[up]),
+            exit_date=str(dates[down].date()), exit_price=float(close[down]),
+            pnl=float(close[down]) / max(1e-12, float(close[up])) - 1.0,
+        ))
+        sell_bar = down + 1
+        if sell_bar >= n:
+            position[buy_bar:] = size
+            last_exit_fill = n
+            break
+        sell_price = _slipped_price(open_[sell_bar], low[sell_bar], perc, isbuy=False)
+        sell_comm = size * commission * sell_price
+        balance += size * sell_price - sell_comm
+        cash_delta[sell_bar] += size * sell_price - sell_comm
+        position[buy_bar:sell_bar] = size
+        pnl = size * (sell_price - buy_price)
+        closed.append((pnl, pnl - buy_comm - sell_comm, int(sell_bar - buy_bar)))
+        last_exit_fill = sell_bar
+
+    equity = cash + np.cumsum(cash_delta) + position * close
+    pnl_arr, pnlcomm_arr, barlen_arr = (np.array(col) for col in zip(*closed)) if closed else (np.empty(0),) * 3
+    return {
+        "sharpe": _sharpe_analysis(equity, cash),
+        "drawdown": _drawdown_analysis(equity),
+        "trades": _trade_analysis(pnl_arr, pnlcomm_arr, barlen_arr.astype(np.int64), opened),
+        "trade_list": trade_list,
+        "equity": pd.Series(equity, index=dates, name="equity"),
+        "final_value": float(equity[-1]) if n else float(cash),
+    }
+
+
+__all__ = ["run_sma_cross_vectorized", "sma_crossover"]
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from src.backtest.scan_params import _evaluate_pairs, _max_drawdown, _rolling_mean_matrix
+from src.config import OUTPUTS_DIR
+from src.utils.symbols import normalize_hk_symbol
+
+
+WINDOW_COLUMNS = [
+    "window", "train_start", "train_end", "test_start", "test_end", "fast", "slow",
+    "train_sharpe", "train_max_dd", "test_sharpe", "test_max_dd", "test_return",
+]
+
+
+def make_windows(n: int, train_size: int, test_size: int, anchored: bool = False) -> List[Tuple[int, int, int, int]]:
+    """切出 (train_start, train_end, test_start, test_end) 半開區間索引。
+
+    rolling：訓練窗長度固定、每次往後推一個測試窗；anchored：訓練窗起點固定於 0、逐步擴張。
+    最後一個測試窗可短於 `test_size`。
+    """
+    if train_size < 2 or test_size < 1:
+        raise ValueError("train_size 需 >= 2、test_size 需 >= 1")
+    windows = []
+    start = 0
+    while start + train_size < n:
+        train_start = 0 if anchored else start
+        train_end = start + train_size
+        test_end = min(n, train_end + test_size)
+        windows.append((train_start, train_end, train_end, test_end))
+        start += test_size
+    return windows
+
+
+def _best_pair(
+    means: np.ndarray,
+    ret: np.ndarray,
+    a: int,
+    b: int,
+    fast_rows: np.ndarray,
+    slow_rows: np.ndarray,
+    commission: float,
+) -> Tuple[int, float, float]:
+    """在訓練區間 [a, b) 評估所有組合，回傳 (最佳組合序號, Sharpe, 最大回撤)。"""
+    seg_ret = ret[a:b].copy()
+    seg_ret[0] = 0.0  # 區間起點視為空手，不計入前一日報酬
+    chunk = max(1, 4_000_000 // max(1, b - a))
+    sharpe = np.empty(len(fast_rows))
+    max_dd = np.empty(len(fast_rows))
+    for s in range(0, len(fast_rows), chunk):
+        sl = slice(s, s + chunk)
+        sharpe[sl], max_dd[sl] = _evaluate_pairs(means[:, a:b], seg_ret, fast_rows[sl], slow_rows[sl], commission)
+    k = int(np.argmax(np.where(np.isnan(sharpe), -np.inf, sharpe)))
+    return k, float(sharpe[k]), float(max_dd[k])
+
+
+def _train_shared(
+    shm_name: str,
+    shape: Tuple[int, int],
+    bounds: Tuple[int, int],
+    fast_rows: np.ndarray,
+    slow_rows: np.ndarray,
+    commission: float,
+) -> Tuple[int, float, float]:
+    """子行程入口：共享記憶體內為 [均線矩陣; 日報酬] ，直接切片訓練區間（零拷貝）。"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buf = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        res = _best_pair(buf[:-1], buf[-1], bounds[0], bounds[1], fast_rows, slow_rows, commission)
+        del buf
+    finally:
+        shm.close()
+    return res
+
+
+def walk_forward_sma(
+    df: pd.DataFrame,
+    fast_grid: Iterable[int],
+    slow_grid: Iterable[int],
+    train_size: int = 504,
+    test_size: int = 126,
+    anchored: bool = False,
+    commission: float = 0.001,
+    workers: int | None = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """SMA 交叉的 walk-forward 最佳化：每個訓練窗挑 Sharpe 最高的 (fast, slow)，於下一個測試窗樣本外評估。
+
+    均線只在整段歷史上算一次（每個視窗一條），各訓練/測試窗直接切片共用；均線只用到
+    當日以前的收盤價，因此不會偷看未來，且窗口起點即有完整暖機的均線。訓練窗以行程池
+    平行評估（均線矩陣放在共享記憶體），`workers=1` 時於本行程依序執行。
+
+    回傳 (各窗參數表, 樣本外權益曲線)；權益曲線把各測試窗串接，換窗時的持倉變動也計手續費。
+    """
+    data = df.sort_values("date").reset_index(drop=True)
+    close = data["close"].to_numpy(dtype=np.float64)
+    n = len(close)
+    pairs = [(int(f), int(s)) for f in fast_grid for s in slow_grid if int(f) < int(s)]
+    windows = make_windows(n, train_size, test_size, anchored)
+    if not pairs or not windows:
+        return pd.DataFrame(columns=WINDOW_COLUMNS), pd.DataFrame(columns=["date", "strat_ret", "equity", "fast", "slow", "window"])
+
+    lengths = np.array(sorted({w for pair in pairs for w in pair}))
+    row_of = {int(w): i for i, w in enumerate(lengths)}
+    fast_rows = np.array([row_of[f] for f, _ in pairs])
+    slow_rows = np.array([row_of[s] for _, s in pairs])
+    means = _rolling_mean_matrix(close, lengths)
+    ret = np.zeros(n)
+    ret[1:] = close[1:] / close[:-1] - 1.0
+    ret[np.isnan(ret)] = 0.0
+
+    best: Dict[int, Tuple[int, float, float]] = {}
+    progress = tqdm(total=len(windows), desc="walk-forward", unit="窗")
+    if workers == 1:
+        for w, (a, b, _, _) in enumerate(windows):
+            best[w] = _best_pair(means, ret, a, b, fast_rows, slow_rows, commission)
+            progress.update(1)
+    else:
+        shape = (len(lengths) + 1, n)
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+        try:
+            buf = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            buf[:-1] = means
+            buf[-1] = ret
+            del buf
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(_train_shared, shm.name, shape, (a, b), fast_rows, slow_rows, commission): w
+                    for w, (a, b, _, _) in enumerate(windows)
+                }
+                for fut in as_completed(futures):
+                    best[futures[fut]] = fut.result()
+                    progress.update(1)
+        finally:
+            shm.close()
+            shm.unlink()
+    progress.close()
+
+    rows = []
+    parts = []
+    prev_pos = 0.0
+    for w, (a, b, c, d) in enumerate(windows):
+        k, tr_sharpe, tr_dd = best[w]
+        f_row, s_row = fast_rows[k], slow_rows[k]
+        signal = (means[f_row, c - 1:d - 1] > means[s_row, c - 1:d - 1]).astype(float)  # 前一日訊號決定今日持倉
+        change = np.abs(np.diff(np.concatenate([[prev_pos], signal])))
+        strat_ret = signal * ret[c:d] - change * commission
+        prev_pos = signal[-1]
+        std = strat_ret.std(ddof=1) if len(strat_ret) > 1 else 0.0
+        equity = np.cumprod(1.0 + strat_ret)
+        rows.append({
+            "window": w,
+            "train_start": data["date"].iloc[a], "train_end": data["date"].iloc[b - 1],
+            "test_start": data["date"].iloc[c], "test_end": data["date"].iloc[d - 1],
+            "fast": pairs[k][0], "slow": pairs[k][1],
+            "train_sharpe": tr_sharpe, "train_max_dd": tr_dd,
+            "test_sharpe": float(strat_ret.mean() / (std if std else 1e-9) * np.sqrt(252)),
+            "test_max_dd": _max_drawdown(pd.Series(equity)),
+            "test_return": float(equity[-1] - 1.0),
+        })
+        parts.append(pd.DataFrame({
+            "date": data["date"].iloc[c:d].to_numpy(), "strat_ret": strat_ret,
+            "fast": pairs[k][0], "slow": pairs[k][1], "window": w,
+        }))
+    oos = pd.concat(parts, ignore_index=True)
+    oos.insert(2, "equity", (1.0 + oos["strat_ret"]).cumprod())
+    return pd.DataFrame(rows, columns=WINDOW_COLUMNS), oos
+
+
+def run_walk_forward(
+    symbol: str,
+    fast_grid: Iterable[int],
+    slow_grid: Iterable[int],
+    train_size: int = 504,
+    test_size: int = 126,
+    anchored: bool = False,
+    commission: float = 0.001,
+    workers: int | None = None,
+) -> Tuple[Path, Path]:
+    """讀取本地日線執行 walk-forward，輸出各窗參數表與樣本外權益 CSV 至 OUTPUTS_DIR。"""
+    from src.data.fetch_hk_data import load_cached
+
+    yf_symbol = normalize_hk_symbol(symbol)
+    df = load_cached(yf_symbol, columns=["close"])
+    windows, oos = walk_forward_sma(
+        df, fast_grid, slow_grid, train_size=train_size, test_size=test_size,
+        anchored=anchored, commission=commission, workers=workers,
+    )
+    return save_walk_forward(yf_symbol, windows, oos, anchored=anchored)
+
+
+def save_walk_forward(symbol: str, windows: pd.DataFrame, oos: pd.DataFrame, anchored: bool = False) -> Tuple[Path, Path]:
+    """把 walk-forward 結果寫成 `walk_forward_<symbol>_<mode>_{windows,equity}.csv`。"""
+    mode = "anchored" if anchored else "rolling"
+    windows_path = OUTPUTS_DIR / f"walk_forward_{symbol}_{mode}_windows.csv"
+    equity_path = OUTPUTS_DIR / f"walk_forward_{symbol}_{mode}_equity.csv"
+    windows.to_csv(windows_path, index=False)
+    oos.to_csv(equity_path, index=False)
+    return windows_path, equity_path
+
+
+__all__ = ["walk_forward_sma", "run_walk_forward", "save_walk_forward", "make_windows", "WINDOW_COLUMNS"]
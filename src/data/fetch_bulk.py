@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pandas as pd
+from tqdm import tqdm
+
+from src.config import ensure_directories
+from src.data.fetch_hk_data import (
+    DEFAULT_START,
+    PriceProvider,
+    YahooChartProvider,
+    fetch_hk_daily,
+)
+from src.data.store import get_store
+from src.utils.symbols import normalize_hk_symbol
+
+
+class TokenBucket:
+    """權杖桶限速：平均每秒 `rate` 次，最多累積 `capacity` 次突發；執行緒安全。"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """連線錯誤、逾時、HTTP 429 與 5xx 可重試；其餘（如 404 代碼不存在）直接失敗。"""
+    try:
+        import requests
+    except ImportError:
+        return False
+    if isinstance(exc, requests.HTTPError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status == 429 or (status is not None and status >= 500)
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+class _ThrottledProvider(PriceProvider):
+    """包裝資料來源：每次請求先取得權杖，可重試的錯誤以指數退避（含抖動）重試。"""
+
+    def __init__(self, inner: PriceProvider, bucket: TokenBucket, retries: int, backoff: float):
+        self.inner = inner
+        self.bucket = bucket
+        self.retries = retries
+        self.backoff = backoff
+        self.local = threading.local()
+
+    def fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.local.attempts = getattr(self.local, "attempts", 0) + 1
+            try:
+                return self.inner.fetch(symbol, start, end)
+            except Exception as exc:
+                if attempt >= self.retries or not _is_retryable(exc):
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (1.0 + random.random()))
+                attempt += 1
+
+
+@dataclass
+class FetchResult:
+    symbol: str
+    ok: bool
+    path: Optional[Path] = None
+    error: str = ""
+    attempts: int = 0
+    seconds: float = 0.0
+
+
+def fetch_hk_daily_bulk(
+    symbols: Iterable[str],
+    start: Optional[str] = DEFAULT_START,
+    end: Optional[str] = None,
+    workers: int = 8,
+    rate: float = 5.0,
+    retries: int = 3,
+    backoff: float = 1.0,
+    provider: Optional[PriceProvider] = None,
+    full_refresh: bool = False,
+) -> List[FetchResult]:
+    """以執行緒池並行增量下載多檔日線，回傳每檔的成功/失敗結果（依輸入順序）。
+
+    所有執行緒共用同一個資料來源（預設為共用連線池的 `YahooChartProvider`），
+    並經過權杖桶限速（每秒 `rate` 次請求）；連線錯誤、429、5xx 最多重試 `retries` 次。
+    單檔失敗不影響其他標的。
+    """
+    ensure_directories()
+    get_store()  # 先建立共用資料庫，避免執行緒各自初始化
+    codes = list(dict.fromkeys(normalize_hk_symbol(s) for s in symbols))
+    inner = provider or YahooChartProvider(pool_size=max(1, workers))
+    throttled = _ThrottledProvider(inner, TokenBucket(rate), retries=retries, backoff=backoff)
+
+    def run(symbol: str) -> FetchResult:
+        throttled.local.attempts = 0
+        t0 = time.perf_counter()
+        try:
+            path = fetch_hk_daily(symbol, start=start, end=end, provider=throttled, full_refresh=full_refresh)
+            return FetchResult(symbol, True, path=path, attempts=throttled.local.attempts,
+                               seconds=time.perf_counter() - t0)
+        except Exception as exc:
+            return FetchResult(symbol, False, error=f"{type(exc).__name__}: {exc}",
+                               attempts=throttled.local.attempts, seconds=time.perf_counter() - t0)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(run, s): s for s in codes}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="下載", unit="檔"):
+            res = fut.result()
+            results[res.symbol] = res
+    return [results[s] for s in codes]
+
+
+__all__ = ["fetch_hk_daily_bulk", "FetchResult", "TokenBucket"]
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import DATA_DIR, ensure_directories
+from src.data.store import get_store
+from src.utils.symbols import normalize_hk_symbol
+
+
+PRICE_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+DEFAULT_START = "2015-01-01"
+# 每次更新重抓已下載區段尾端的天數（日曆日），用於偵測除權息造成的還原價修正
+RESTATEMENT_LOOKBACK_DAYS = 10
+RESTATEMENT_TOLERANCE = 1e-6
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com"
+
+Range = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+class PriceProvider:
+    """日線資料來源介面：`fetch` 回傳 [start, end) 區間的日線，欄位為 PRICE_COLUMNS。"""
+
+    def fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    """Yahoo Finance（yfinance），價格已還原除權息。"""
+
+    def fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        import yfinance as yf
+
+        raw = yf.download(
+            symbol, start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"),
+            auto_adjust=True, progress=False,
+        )
+        if raw is None or raw.empty:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        if isinstance(raw.columns, pd.MultiIndex):
+            raw.columns = raw.columns.get_level_values(0)
+        df = raw.reset_index().rename(columns=lambda c: str(c).strip().lower())
+        df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
+        return df[PRICE_COLUMNS]
+
+
+class YahooChartProvider(PriceProvider):
+    """直接呼叫 Yahoo chart API（v8 JSON），以同一個 requests.Session 重用連線。
+
+    OHLC 依 adjclose/close 比例還原（同 yfinance 的 auto_adjust）。`base_url` 可改指向
+    本地替身伺服器做測試；連線池大小應不小於同時下載的執行緒數。
+    """
+
+    def __init__(
+        self,
+        base_url: str = YAHOO_CHART_URL,
+        session=None,
+        timeout: float = 10.0,
+        pool_size: int = 16,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.setdefault("User-Agent", "Mozilla/5.0")
+
+    def fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        params = {
+            "period1": int(start.timestamp()),
+            "period2": int(end.timestamp()),
+            "interval": "1d",
+            "events": "div,splits",
+        }
+        resp = self.session.get(f"{self.base_url}/v8/finance/chart/{symbol}", params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        result = (resp.json().get("chart") or {}).get("result") or []
+        if not result or not result[0].get("timestamp"):
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        res = result[0]
+        quote = res["indicators"]["quote"][0]
+        offset = int(res.get("meta", {}).get("gmtoffset", 0))
+        df = pd.DataFrame({
+            "date": pd.to_datetime(np.asarray(res["timestamp"], dtype=np.int64) + offset, unit="s").normalize(),
+            **{c: np.asarray(quote.get(c), dtype=float) for c in ["open", "high", "low", "close", "volume"]},
+        })
+        adj = (res["indicators"].get("adjclose") or [{}])[0].get("adjclose")
+        if adj is not None:
+            ratio = np.asarray(adj, dtype=float) / df["close"].to_numpy()
+            for c in ["open", "high", "low"]:
+                df[c] = df[c] * ratio
+            df["close"] = np.asarray(adj, dtype=float)
+        return df.dropna(subset=["close"])
+
+
+class FrameProvider(PriceProvider):
+    """以記憶體中的 DataFrame 充當資料來源（離線或測試用），並記錄每次請求的區間。"""
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = {normalize_hk_symbol(k): v for k, v in frames.items()}
+        self.calls: List[Tuple[str, pd.Timestamp, pd.Timestamp]] = []
+
+    def fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        self.calls.append((symbol, start, end))
+        df = self.frames.get(symbol)
+        if df is None:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+        dates = pd.to_datetime(df["date"])
+        return df[(dates >= start) & (dates < end)][PRICE_COLUMNS].copy()
+
+
+_provider: PriceProvider = YahooProvider()
+
+
+def get_provider() -> PriceProvider:
+    return _provider
+
+
+def set_provider(provider: PriceProvider) -> PriceProvider:
+    """替換預設資料來源，回傳原本的來源以便還原。"""
+    global _provider
+    previous, _provider = _provider, provider
+    return previous
+
+
+def _csv_path(symbol: str) -> Path:
+    return DATA_DIR / f"{symbol}.csv"
+
+
+def _merge_ranges(ranges: Iterable[Range]) -> List[Range]:
+    merged: List[Range] = []
+    for a, b in sorted(r for r in ranges if r[0] < r[1]):
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return merged
+
+
+def _missing_ranges(start: pd.Timestamp, end: pd.Timestamp, covered: List[Range]) -> List[Range]:
+    gaps: List[Range] = []
+    cursor = start
+    for a, b in covered:
+        if b <= cursor:
+            continue
+        if a >= end:
+            break
+        if a > cursor:
+            gaps.append((cursor, min(a, end)))
+        cursor = max(cursor, b)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def get_ledger(symbol: str) -> List[Range]:
+    """回傳已下載的日期區間（半開區間 [start, end)）。
+
+    舊資料（僅有 CSV 或尚無帳本）以資料首日到最後一根之前推定為單一區間。
+    """
+    yf_symbol = normalize_hk_symbol(symbol)
+    store = get_store()
+    if not store.has(yf_symbol):
+        if not _csv_path(yf_symbol).exists():
+            return []
+        load_cached(yf_symbol, columns=["close"])  # 匯入資料庫
+    meta = store.info(yf_symbol)
+    if "ledger" in meta:
+        return [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in meta["ledger"]]
+    if not meta.get("rows"):
+        return []
+    return [(pd.Timestamp(meta["start"]), pd.Timestamp(meta["end"]))]  # 最後一根視為暫定，不計入
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    out = df[PRICE_COLUMNS].copy()
+    out["date"] = pd.to_datetime(out["date"]).dt.normalize()
+    return out.dropna(subset=["close"])
+
+
+def _is_restated(existing: pd.DataFrame, fresh: pd.DataFrame) -> bool:
+    """比對重疊日期的 OHLC；任何一欄相對差異超過容忍值即視為歷史價格已被修正。"""
+    cols = ["open", "high", "low", "close"]
+    both = existing.merge(fresh, on="date", suffixes=("_old", "_new"))
+    if both.empty:
+        return False
+    old = both[[f"{c}_old" for c in cols]].to_numpy(dtype=float)
+    new = both[[f"{c}_new" for c in cols]].to_numpy(dtype=float)
+    rel = np.abs(new - old) / np.maximum(np.abs(old), 1e-12)
+    return bool(np.nanmax(rel) > RESTATEMENT_TOLERANCE)
+
+
+def _is_unchanged(existing: pd.DataFrame, merged: pd.DataFrame) -> bool:
+    """合併後的日線與本地相同：同一組日期，OHLCV 相對差異都在容忍值內。"""
+    if len(existing) != len(merged):
+        return False
+    old_dates = pd.to_datetime(existing["date"]).to_numpy(dtype="datetime64[ns]")
+    if not np.array_equal(old_dates, merged["date"].to_numpy(dtype="datetime64[ns]")):
+        return False
+    cols = ["open", "high", "low", "close", "volume"]
+    old = existing[cols].to_numpy(dtype=float)
+    new = merged[cols].to_numpy(dtype=float)
+    return bool(np.allclose(new, old, rtol=RESTATEMENT_TOLERANCE, atol=0.0, equal_nan=True))
+
+
+def _write_atomic_csv(df: pd.DataFrame, path: Path) -> None:
+    tmp = path.with_suffix(f".csv.tmp{os.getpid()}")
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def fetch_hk_daily(
+    symbol: str,
+    start: Optional[str] = DEFAULT_START,
+    end: Optional[str] = None,
+    provider: Optional[PriceProvider] = None,
+    lookback_days: int = RESTATEMENT_LOOKBACK_DAYS,
+    full_refresh: bool = False,
+) -> Path:
+    """增量下載港股日線，存成 CSV 並同步寫入欄式資料庫與下載帳本。
+
+    只向資料來源請求帳本中尚未涵蓋的區段（尾端或中間缺口）。延伸尾端時會一併
+    重抓最後 `lookback_days` 天；若這段價格與本地不同（除權息、拆股造成還原價修正），
+    則重新下載完整歷史。最後一根視為暫定：不參與修正比對，帳本也只記到它之前，下次一定重抓，
+    盤中下載的未完成 K 線隔天會被收盤值取代而不觸發整段重抓。
+    下載結果與本地完全相同時只更新帳本，不產生新的資料版本。`full_refresh=True` 直接忽略本地資料重新下載。
+    `end` 為不含當日的結束日（同 yfinance），預設到今天為止。
+    """
+    ensure_directories()
+    provider = provider or _provider
+    yf_symbol = normalize_hk_symbol(symbol)
+    start_ts = pd.Timestamp(start or DEFAULT_START).normalize()
+    end_ts = pd.Timestamp(end).normalize() if end else pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    path = _csv_path(yf_symbol)
+
+    covered = [] if full_refresh else get_ledger(yf_symbol)
+    existing = load_cached(yf_symbol) if covered else pd.DataFrame(columns=PRICE_COLUMNS)
+    requests = _missing_ranges(start_ts, end_ts, covered)
+    check_window: Optional[Range] = None
+    if covered and lookback_days > 0 and requests and requests[-1][1] > covered[-1][1]:
+        # 尾端請求往前延伸 lookback，合併成一次請求
+        tail_start = max(covered[-1][0], covered[-1][1] - pd.Timedelta(days=lookback_days))
+        check_window = (tail_start, covered[-1][1])
+        requests[-1] = (min(requests[-1][0], tail_start), requests[-1][1])
+        requests = _merge_ranges(requests)
+
+    if not requests:
+        if not path.exists():
+            _write_atomic_csv(existing, path)
+        return path
+
+    fresh = _normalize_frame(pd.concat([provider.fetch(yf_symbol, a, b) for a, b in requests], ignore_index=True))
+    if check_window is not None and not existing.empty:
+        # 最後一根可能是盤中未完成的 K 線，與收盤後的值不同屬正常，不列入修正比對
+        in_window = (
+            (existing["date"] >= check_window[0]) & (existing["date"] < check_window[1])
+            & (existing["date"] < existing["date"].max())
+        )
+        if _is_restated(existing[in_window], fresh):
+            full = (min(start_ts, covered[0][0]), max(end_ts, covered[-1][1]))
+            fresh = _normalize_frame(provider.fetch(yf_symbol, *full))
+            existing = pd.DataFrame(columns=PRICE_COLUMNS)
+            covered, requests = [], [full]
+
+    parts = [df for df in (_normalize_frame(existing), fresh) if not df.empty]
+    if not parts:
+        raise ValueError(f"查無資料：{yf_symbol}（請確認代碼與日期範圍）")
+    merged = (
+        pd.concat(parts, ignore_index=True)
+        .drop_duplicates(subset="date", keep="last")
+        .sort_values("date")
+        .reset_index(drop=True)
+    )
+    # 帳本只涵蓋到資料來源實際回傳的最後一根之前：最後一根視為暫定（可能是盤中未完成的 K 線），
+    # 下次更新一定重抓，今天之後或尚未開盤的日子也不會被誤記為已下載
+    last_bar = merged["date"].iloc[-1]
+    ledger = [(a, min(b, last_bar)) for a, b in _merge_ranges(list(covered) + list(requests)) if a < last_bar]
+    extra = {"ledger": [[a.strftime("%Y-%m-%d"), b.strftime("%Y-%m-%d")] for a, b in ledger]}
+
+    if covered and _is_unchanged(existing, merged):
+        # 尾端重抓沒有帶來新資料：只延伸帳本，不改寫 CSV 與資料庫版本，下游快取維持有效
+        get_store().update_meta(yf_symbol, extra)
+        if not path.exists():
+            _write_atomic_csv(existing, path)
+        return path
+
+    _write_atomic_csv(merged, path)
+    get_store().write(yf_symbol, merged, source_mtime=path.stat().st_mtime, extra=extra)
+    # 資料已更新：舊的回測結果不會再命中，直接刪除釋放空間
+    # （於此延遲載入，資料層在模組層級不依賴回測套件）
+    from src.backtest.result_cache import invalidate_backtest_cache
+
+    invalidate_backtest_cache(yf_symbol)
+    return path
+
+
+def load_cached(
+    symbol: str,
+    columns: Optional[Iterable[str]] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> pd.DataFrame:
+    """讀取本地日線。
+
+    優先從欄式資料庫讀取（可只取部分欄位與日期區間）；若資料庫沒有或 CSV 較新，
+    則讀 CSV 並寫回資料庫，下次即可快速載入。兩者皆無時拋出 FileNotFoundError。
+    """
+    yf_symbol = normalize_hk_symbol(symbol)
+    store = get_store()
+    path = _csv_path(yf_symbol)
+    csv_mtime = path.stat().st_mtime if path.exists() else None
+    if store.has(yf_symbol):
+        source_mtime = store.info(yf_symbol).get("source_mtime")
+        if csv_mtime is None or source_mtime is None or csv_mtime <= source_mtime:
+            return store.read(yf_symbol, columns=columns, start=start, end=end)
+    if csv_mtime is None:
+        raise FileNotFoundError(f"找不到本地資料：{path}，請先執行 fetch 下載")
+    df = pd.read_csv(path, parse_dates=["date"])
+    store.write(yf_symbol, df, source_mtime=csv_mtime)
+    return store.read(yf_symbol, columns=columns, start=start, end=end)
+
+
+__all__ = [
+    "fetch_hk_daily", "load_cached", "get_ledger",
+    "PriceProvider", "YahooProvider", "YahooChartProvider", "FrameProvider", "get_provider", "set_provider",
+]
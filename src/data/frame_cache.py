@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data.fetch_hk_data import _csv_path, load_cached
+from src.data.store import get_store
+from src.utils.symbols import normalize_hk_symbol
+
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+def data_version(symbol: str) -> Tuple[Any, Any]:
+    """標的資料的版本指紋：(資料庫版本, CSV 修改時間)，任一改變即代表資料已更新。"""
+    yf_symbol = normalize_hk_symbol(symbol)
+    store = get_store()
+    version = store.info(yf_symbol)["version"] if store.has(yf_symbol) else None
+    path = _csv_path(yf_symbol)
+    mtime = path.stat().st_mtime_ns if path.exists() else None
+    return version, mtime
+
+
+class FrameCache:
+    """行程內 LRU 快取：存放已載入的日線與由其衍生的指標/結果。
+
+    鍵為 (symbol, 資料版本, spec)；資料檔一更新版本就不同，舊項目自然失效並在
+    LRU 淘汰時回收。總大小超過 `max_bytes` 時由最久未使用的項目開始淘汰。
+    回傳的 DataFrame 為淺拷貝，呼叫端新增欄位不會污染快取。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = int(max_bytes)
+        self._items: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return True, self._items[key][0]
+            self.misses += 1
+            return False, None
+
+    def _put(self, key: Hashable, value: Any) -> None:
+        size = _nbytes(value)
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    @staticmethod
+    def _out(value: Any) -> Any:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.copy(deep=False)
+        return value
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        """取得日線（依日期排序）；命中時不需重新讀檔。"""
+        yf_symbol = normalize_hk_symbol(symbol)
+        key = (yf_symbol, data_version(yf_symbol), "frame")
+        hit, value = self._get(key)
+        if not hit:
+            value = load_cached(yf_symbol).sort_values("date").reset_index(drop=True)
+            self._put(key, value)
+        return self._out(value)
+
+    def get(self, symbol: str, spec: Hashable, compute: Callable[[pd.DataFrame], Any]) -> Any:
+        """取得由日線衍生的結果；`spec` 須能唯一描述計算內容（如 ("sma", 20)）。"""
+        yf_symbol = normalize_hk_symbol(symbol)
+        key = (yf_symbol, data_version(yf_symbol), spec)
+        hit, value = self._get(key)
+        if not hit:
+            value = compute(self.frame(yf_symbol))
+            self._put(key, value)
+        return self._out(value)
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """清除某檔（或全部）的快取項目。"""
+        with self._lock:
+            if symbol is None:
+                self._items.clear()
+                self._bytes = 0
+                return
+            yf_symbol = normalize_hk_symbol(symbol)
+            for key in [k for k in self._items if k[0] == yf_symbol]:
+                self._bytes -= self._items.pop(key)[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._items),
+                "bytes": self._bytes,
+            }
+
+
+_default_cache: Optional[FrameCache] = None
+_default_lock = threading.Lock()
+
+
+def get_frame_cache() -> FrameCache:
+    """行程內共用的快取（Streamlit 重新執行腳本時模組不會重載，因此可跨 rerun 共用）。"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = FrameCache()
+        return _default_cache
+
+
+__all__ = ["FrameCache", "get_frame_cache", "data_version"]
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import DATA_DIR
+from src.utils.locks import file_lock
+
+
+STORE_DIR = DATA_DIR / "store"
+
+# 欄位與型別固定（小端序），讀取時不需再推斷型別
+COLUMN_DTYPES: Dict[str, str] = {
+    "date": "<M8[ns]",
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "volume": "<f8",
+}
+
+
+class PriceStore:
+    """欄式日線資料庫：每檔每欄一個無表頭的二進位檔，另有一份 JSON 索引記錄列數與版本。
+
+    目錄結構：
+        store/index.json                 # {symbol: {rows, start, end, version, ...}}
+        store/<symbol>/v<version>/<col>.bin
+
+    寫入時先寫新版本目錄，再原子性替換索引；前一版本保留到下一次寫入才回收，已載入舊索引的
+    讀者（其他執行緒或行程）仍能讀完，若讀到已回收的版本則重新載入索引再讀一次。
+    索引的讀改寫以 store/index.lock 檔案鎖保護，CLI 與介面等多個行程同時寫入不會互相覆蓋。
+    讀取可只載入部分欄位；指定日期區間時先在 date 欄二分搜尋，其餘欄位只以
+    offset/count 讀取該區間的位元組。
+    """
+
+    def __init__(self, root: Path | None = None):
+        self.root = Path(root) if root is not None else STORE_DIR
+        self._index: Dict[str, Dict] = {}
+        self._index_mtime: Optional[float] = None
+        self._write_lock = threading.Lock()
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / "index.json"
+
+    def _load_index(self, fresh: bool = False) -> Dict[str, Dict]:
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except FileNotFoundError:
+            self._index, self._index_mtime = {}, None
+            return self._index
+        if fresh or mtime != self._index_mtime:
+            self._index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            self._index_mtime = mtime
+        return self._index
+
+    def _save_index(self, index: Dict[str, Dict]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_text(json.dumps(index, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+        self._index = index
+        self._index_mtime = self.index_path.stat().st_mtime
+
+    def symbols(self) -> List[str]:
+        return sorted(self._load_index())
+
+    def has(self, symbol: str) -> bool:
+        return symbol in self._load_index()
+
+    def info(self, symbol: str) -> Dict:
+        """回傳索引資訊（rows, start, end, version）；不存在時拋出 FileNotFoundError。"""
+        meta = self._load_index().get(symbol)
+        if meta is None:
+            raise FileNotFoundError(f"資料庫中沒有 {symbol}")
+        return meta
+
+    def _write_version(self, symbol: str, df: pd.DataFrame, version: int, source_mtime: float | None) -> Dict:
+        data = df.sort_values("date").reset_index(drop=True)
+        ver_dir = self.root / symbol / f"v{version}"
+        if ver_dir.exists():
+            shutil.rmtree(ver_dir)
+        ver_dir.mkdir(parents=True)
+        for col, dtype in COLUMN_DTYPES.items():
+            if col not in data.columns:
+                continue
+            if col == "date":
+                arr = pd.to_datetime(data[col]).to_numpy(dtype=dtype)
+            else:
+                arr = pd.to_numeric(data[col], errors="coerce").to_numpy(dtype=dtype)
+            arr.tofile(ver_dir / f"{col}.bin")
+        dates = pd.to_datetime(data["date"])
+        return {
+            "rows": int(len(data)),
+            "start": str(dates.iloc[0].date()) if len(data) else None,
+            "end": str(dates.iloc[-1].date()) if len(data) else None,
+            "version": version,
+            "columns": [c for c in COLUMN_DTYPES if c in data.columns],
+            "source_mtime": source_mtime,
+        }
+
+    def write_many(
+        self,
+        items: Iterable[Tuple[str, pd.DataFrame, Optional[float]]],
+        extras: Optional[Dict[str, Dict]] = None,
+    ) -> Dict[str, Dict]:
+        """批次寫入多檔 (symbol, df, source_mtime)，索引只替換一次。
+
+        `extras` 為各檔額外要寫入索引的欄位（例如下載區間帳本），與資料同一次生效；
+        未指定的額外欄位沿用索引中的舊值（CSV 重新匯入或遷移不會丟失帳本）。
+        """
+        # 執行緒鎖序列化同行程的寫入（如批次下載），檔案鎖序列化不同行程的索引讀改寫
+        with self._write_lock, file_lock(self.root / "index.lock"):
+            index = dict(self._load_index(fresh=True))
+            written: Dict[str, Dict] = {}
+            for symbol, df, source_mtime in items:
+                previous = index.get(symbol, {})
+                version = int(previous.get("version", 0)) + 1
+                meta = self._write_version(symbol, df, version, source_mtime)
+                meta.update({k: v for k, v in previous.items() if k not in meta})
+                meta.update((extras or {}).get(symbol, {}))
+                index[symbol] = written[symbol] = meta
+            if not written:
+                return written
+            self._save_index(index)
+        # 新索引生效後回收更早的版本，保留前一版給仍在讀舊索引的讀者
+        for symbol, meta in written.items():
+            keep = {f"v{meta['version']}", f"v{meta['version'] - 1}"}
+            for old in (self.root / symbol).glob("v*"):
+                if old.name not in keep:
+                    shutil.rmtree(old, ignore_errors=True)
+        return written
+
+    def write(
+        self,
+        symbol: str,
+        df: pd.DataFrame,
+        source_mtime: float | None = None,
+        extra: Optional[Dict] = None,
+    ) -> Dict:
+        """寫入（整檔覆蓋）一檔標的的日線，依日期排序並轉為固定型別。
+
+        `source_mtime` 記錄來源 CSV 的修改時間，供 `load_cached` 判斷資料庫是否過期。
+        """
+        extras = {symbol: extra} if extra else None
+        return self.write_many([(symbol, df, source_mtime)], extras=extras)[symbol]
+
+    def update_meta(self, symbol: str, extra: Dict) -> Dict:
+        """只更新索引中的額外欄位（例如下載區間帳本），資料與版本不變。"""
+        with self._write_lock, file_lock(self.root / "index.lock"):
+            index = dict(self._load_index(fresh=True))
+            if symbol not in index:
+                raise FileNotFoundError(f"資料庫中沒有 {symbol}")
+            index[symbol] = meta = {**index[symbol], **extra}
+            self._save_index(index)
+        return meta
+
+    def read(
+        self,
+        symbol: str,
+        columns: Optional[Iterable[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """讀取一檔標的；`columns` 只載入指定欄位（date 一定包含），`start`/`end` 為含端點的日期篩選。"""
+        meta = self.info(symbol)
+        try:
+            return self._read_version(symbol, meta, columns, start, end)
+        except FileNotFoundError:
+            # 手上的索引已過時、該版本已被其他寫入者回收：重新載入索引再讀一次
+            self._load_index(fresh=True)
+            return self._read_version(symbol, self.info(symbol), columns, start, end)
+
+    def _read_version(
+        self,
+        symbol: str,
+        meta: Dict,
+        columns: Optional[Iterable[str]],
+        start: Optional[str],
+        end: Optional[str],
+    ) -> pd.DataFrame:
+        ver_dir = os.path.join(self.root, symbol, f"v{meta['version']}")
+        available = meta.get("columns", list(COLUMN_DTYPES))
+        wanted = ["date"] + [c for c in (columns or available) if c != "date"]
+        missing = [c for c in wanted if c not in available]
+        if missing:
+            raise KeyError(f"{symbol} 缺少欄位：{missing}")
+
+        dates = np.fromfile(os.path.join(ver_dir, "date.bin"), dtype=COLUMN_DTYPES["date"])
+        lo, hi = 0, len(dates)
+        if start is not None:
+            lo = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), "ns"), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end), "ns"), side="right"))
+        out = {"date": dates[lo:hi]}
+        for col in wanted[1:]:
+            dtype = np.dtype(COLUMN_DTYPES[col])
+            out[col] = np.fromfile(
+                os.path.join(ver_dir, f"{col}.bin"), dtype=dtype,
+                count=max(0, hi - lo), offset=lo * dtype.itemsize,
+            )
+        return pd.DataFrame(out)
+
+    def delete(self, symbol: str) -> None:
+        with self._write_lock, file_lock(self.root / "index.lock"):
+            index = dict(self._load_index(fresh=True))
+            if index.pop(symbol, None) is not None:
+                self._save_index(index)
+        shutil.rmtree(self.root / symbol, ignore_errors=True)
+
+
+_default_store: Optional[PriceStore] = None
+
+
+def get_store() -> PriceStore:
+    """行程內共用的預設資料庫（位於 DATA_DIR/store）。"""
+    global _default_store
+    if _default_store is None:
+        _default_store = PriceStore()
+    return _default_store
+
+
+def migrate_csv_to_store(data_dir: Path | None = None, store: PriceStore | None = None) -> List[str]:
+    """一次性將 DATA_DIR 下所有 `<symbol>.csv` 匯入欄式資料庫，回傳匯入的代碼清單。"""
+    data_dir = Path(data_dir) if data_dir is not None else DATA_DIR
+    store = store or get_store()
+    items = []
+    for path in sorted(data_dir.glob("*.csv")):
+        df = pd.read_csv(path, parse_dates=["date"])
+        if df.empty:
+            continue
+        items.append((path.stem, df, path.stat().st_mtime))
+    return list(store.write_many(items))
+
+
+__all__ = ["PriceStore", "get_store", "migrate_csv_to_store", "COLUMN_DTYPES"]
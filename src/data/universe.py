@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.symbols import normalize_hk_symbol
+
+
+PRICE_FIELDS: Tuple[str, ...] = ("open", "high", "low", "close", "volume")
+
+
+class PriceUniverse:
+    """多標的日線面板：共用交易日曆，每個欄位一個（日期 x 標的）矩陣，缺日為 NaN 並有對應遮罩。
+
+    矩陣以 Fortran 順序儲存，單一標的的一欄在記憶體中連續：`view()` 取出的是零拷貝視圖，
+    `slice()` 依日期切片也只是視圖，不複製資料。需要 DataFrame 的舊介面可用 `frame()` / `frames()`。
+    """
+
+    def __init__(
+        self,
+        dates: pd.DatetimeIndex,
+        symbols: Sequence[str],
+        fields: Dict[str, np.ndarray],
+        mask: np.ndarray,
+    ):
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols: List[str] = list(symbols)
+        self._col = {s: j for j, s in enumerate(self.symbols)}
+        self._fields = fields
+        self.mask = mask
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: Dict[str, pd.DataFrame],
+        fields: Iterable[str] = PRICE_FIELDS,
+        dtype: np.dtype | type = np.float64,
+    ) -> "PriceUniverse":
+        """由 {代碼: 日線} 建立；日期取各檔聯集，同一檔重複的日期以最後一筆為準。"""
+        names = [f for f in fields]
+        stamps = []
+        for df in frames.values():
+            d = df["date"]
+            stamps.append((d if pd.api.types.is_datetime64_dtype(d) else pd.to_datetime(d)).to_numpy("datetime64[ns]"))
+        dates = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, "datetime64[ns]")
+        shape = (len(dates), len(stamps))
+        data = {f: np.full(shape, np.nan, dtype=dtype, order="F") for f in names}
+        mask = np.zeros(shape, dtype=bool, order="F")
+        for j, (df, stamp) in enumerate(zip(frames.values(), stamps)):
+            rows = np.searchsorted(dates, stamp)
+            mask[rows, j] = True
+            for f in names:
+                data[f][rows, j] = df[f].to_numpy(dtype=dtype)
+        return cls(pd.DatetimeIndex(dates), list(frames), data, mask)
+
+    @classmethod
+    def load(
+        cls,
+        symbols: Iterable[str],
+        fields: Iterable[str] = PRICE_FIELDS,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        dtype: np.dtype | type = np.float64,
+    ) -> "PriceUniverse":
+        """從本地資料庫讀取多檔（只讀需要的欄位與日期區間）；無本地資料的標的略過並提示。"""
+        from src.data.fetch_hk_data import load_cached
+
+        names = list(fields)
+        frames: Dict[str, pd.DataFrame] = {}
+        for raw in symbols:
+            symbol = normalize_hk_symbol(raw)
+            try:
+                frames[symbol] = load_cached(symbol, columns=names, start=start, end=end)
+            except FileNotFoundError:
+                print(f"略過 {symbol}：找不到本地資料，請先下載")
+        return cls.from_frames(frames, names, dtype=dtype)
+
+    # ---- 基本屬性 ----
+    @property
+    def fields(self) -> List[str]:
+        return list(self._fields)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.mask.shape
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._col
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """整個欄位的（日期 x 標的）矩陣。"""
+        return self._fields[field]
+
+    def column(self, symbol: str) -> int:
+        return self._col[symbol]
+
+    # ---- 單檔存取 ----
+    def view(self, symbol: str, field: str = "close") -> np.ndarray:
+        """單檔單欄在整個日曆上的零拷貝視圖（缺日為 NaN）。"""
+        return self._fields[field][:, self._col[symbol]]
+
+    def span(self, symbol: str) -> Tuple[int, int]:
+        """該檔第一根到最後一根的列範圍（半開區間）；沒有資料時為 (0, 0)。"""
+        rows = np.flatnonzero(self.mask[:, self._col[symbol]])
+        return (int(rows[0]), int(rows[-1]) + 1) if len(rows) else (0, 0)
+
+    def bar_rows(self, symbol: str) -> np.ndarray:
+        """該檔有資料的列索引。"""
+        return np.flatnonzero(self.mask[:, self._col[symbol]])
+
+    def bars(self, symbol: str, field: str = "close") -> np.ndarray:
+        """只含該檔交易日的序列；期間沒有停牌缺日時為零拷貝視圖。"""
+        j = self._col[symbol]
+        lo, hi = self.span(symbol)
+        if self.mask[lo:hi, j].all():
+            return self._fields[field][lo:hi, j]
+        return self._fields[field][self.mask[:, j], j]
+
+    def frame(self, symbol: str, fields: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """單檔的日線表（date + 欄位，只含交易日），供仍需 DataFrame 的介面使用。"""
+        j = self._col[symbol]
+        rows = self.mask[:, j]
+        out = {"date": self.dates[rows]}
+        for f in (fields or self._fields):
+            out[f] = self._fields[f][rows, j]
+        return pd.DataFrame(out)
+
+    def frames(self, fields: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+        return {s: self.frame(s, fields) for s in self.symbols}
+
+    # ---- 切片 ----
+    def slice(self, start: Optional[str] = None, end: Optional[str] = None) -> "PriceUniverse":
+        """依日期（含端點）切片；回傳的面板與原面板共用記憶體。"""
+        lo = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start), side="left"))
+        hi = len(self.dates) if end is None else int(self.dates.searchsorted(pd.Timestamp(end), side="right"))
+        return PriceUniverse(
+            self.dates[lo:hi], self.symbols,
+            {f: a[lo:hi] for f, a in self._fields.items()}, self.mask[lo:hi],
+        )
+
+    def select(self, symbols: Iterable[str]) -> "PriceUniverse":
+        """只保留部分標的（依給定順序，會複製資料）；之後只剩全缺的日期會移除。"""
+        cols = [self._col[s] for s in symbols]
+        mask = self.mask[:, cols]
+        keep = mask.any(axis=1)
+        return PriceUniverse(
+            self.dates[keep], [self.symbols[j] for j in cols],
+            {f: np.asfortranarray(a[np.ix_(keep, cols)]) for f, a in self._fields.items()},
+            np.asfortranarray(mask[keep]),
+        )
+
+
+__all__ = ["PriceUniverse", "PRICE_FIELDS"]
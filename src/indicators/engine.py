@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 指標請求以輸出欄名表示：ma20 / ema20 / std20 / boll20 / rsi14
+_REQUEST_RE = re.compile(r"^(ma|sma|ema|std|boll|rsi)(\d+)$")
+
+Node = Tuple[Hashable, ...]
+
+
+def _rolling_sum(x: np.ndarray, p: int) -> np.ndarray:
+    # pandas 的滾動和帶補償加法；rolling(p).sum() / p 與 rolling(p).mean() 逐位元相同
+    return pd.Series(x).rolling(p).sum().to_numpy()
+
+
+def _std_from_sums(s: np.ndarray, sq: np.ndarray, p: int) -> np.ndarray:
+    """由滾動和與平方和求樣本標準差（ddof=1）；與 pandas rolling std 的差異約 1e-10。"""
+    if p < 2:
+        return np.full_like(s, np.nan)
+    var = (sq - s * s / p) / (p - 1)
+    return np.sqrt(np.clip(var, 0.0, None))  # 抵銷誤差可能產生極小負值
+
+
+def _ema(x: np.ndarray, p: int) -> np.ndarray:
+    return pd.Series(x).ewm(span=p, adjust=False).mean().to_numpy()
+
+
+def _diff(x: np.ndarray) -> np.ndarray:
+    out = np.empty_like(x)
+    if len(x) == 0:
+        return out
+    out[0] = np.nan
+    np.subtract(x[1:], x[:-1], out=out[1:])
+    return out
+
+
+def _rsi(gain_mean: np.ndarray, loss_mean: np.ndarray) -> np.ndarray:
+    rs = gain_mean / np.where(loss_mean == 0, 1e-9, loss_mean)
+    return 100 - 100 / (1 + rs)
+
+
+# 運算子：名稱 -> 計算函式，參數依序為各相依節點的結果與節點參數
+_OPS: Dict[str, Callable[..., np.ndarray]] = {
+    "sq": lambda x: x * x,
+    "rsum": lambda x, p: _rolling_sum(x, p),
+    "mean": lambda s, p: s / p,
+    "std": lambda s, sq, p: _std_from_sums(s, sq, p),
+    "ema": lambda x, p: _ema(x, p),
+    "diff": lambda x: _diff(x),
+    "gain": lambda d: np.clip(d, 0, None),
+    "loss": lambda d: -np.clip(d, None, 0),
+    "rsi": lambda g, l: _rsi(g, l),
+    "upper": lambda m, s, k: m + k * s,
+    "lower": lambda m, s, k: m - k * s,
+}
+
+
+def parse_request(request: str) -> Tuple[str, int]:
+    """解析指標請求字串（如 "ma20"、"rsi14"），回傳 (種類, 週期)。"""
+    m = _REQUEST_RE.match(str(request).strip().lower())
+    if not m:
+        raise ValueError(f"不支援的指標：{request}（可用 ma/ema/std/boll/rsi + 週期，如 ma20）")
+    kind, period = m.group(1), int(m.group(2))
+    if period < 1:
+        raise ValueError(f"指標週期須為正整數：{request}")
+    return ("ma" if kind == "sma" else kind), period
+
+
+def output_columns(request: str) -> List[str]:
+    """請求會產生的欄名；boll 產生上下軌兩欄，其餘一欄。"""
+    kind, p = parse_request(request)
+    if kind == "boll":
+        return [f"boll{p}_upper", f"boll{p}_lower"]
+    return [f"{kind}{p}"]
+
+
+class IndicatorGraph:
+    """把多個指標請求合併成去重的計算圖，每個基本運算（滾動和、平方和、差分…）只算一次。
+
+    例如 ma20 與 boll20 共用同一個 rsum(close, 20)，std20 再共用 rsum(close², 20)；
+    多個 rsi 共用 close 的差分。節點以 (運算, 相依節點..., 參數) 為鍵，登記時先登記
+    相依節點，因此登記順序即為拓撲順序。計算時中間結果在最後一個使用者算完後即釋放。
+    """
+
+    def __init__(self):
+        self._nodes: Dict[Node, Tuple[str, Tuple[Node, ...], Tuple]] = {}
+        self.outputs: Dict[str, Node] = {}
+
+    def _node(self, op: str, deps: Tuple[Node, ...] = (), params: Tuple = ()) -> Node:
+        key: Node = (op, *deps, *params)
+        if key not in self._nodes:
+            self._nodes[key] = (op, deps, params)
+        return key
+
+    def _input(self) -> Node:
+        return self._node("input")
+
+    def _mean(self, x: Node, p: int) -> Node:
+        return self._node("mean", (self._node("rsum", (x,), (p,)),), (p,))
+
+    def _std(self, x: Node, p: int) -> Node:
+        s = self._node("rsum", (x,), (p,))
+        sq = self._node("rsum", (self._node("sq", (x,)),), (p,))
+        return self._node("std", (s, sq), (p,))
+
+    def add(self, request: str) -> List[str]:
+        """登記一個指標請求，回傳它會產生的欄名。"""
+        kind, p = parse_request(request)
+        x = self._input()
+        if kind == "ma":
+            cols = {f"ma{p}": self._mean(x, p)}
+        elif kind == "ema":
+            cols = {f"ema{p}": self._node("ema", (x,), (p,))}
+        elif kind == "std":
+            cols = {f"std{p}": self._std(x, p)}
+        elif kind == "boll":
+            mid, sd = self._mean(x, p), self._std(x, p)
+            cols = {
+                f"boll{p}_upper": self._node("upper", (mid, sd), (2.0,)),
+                f"boll{p}_lower": self._node("lower", (mid, sd), (2.0,)),
+            }
+        else:  # rsi
+            d = self._node("diff", (x,))
+            cols = {f"rsi{p}": self._node("rsi", (
+                self._mean(self._node("gain", (d,)), p),
+                self._mean(self._node("loss", (d,)), p),
+            ))}
+        self.outputs.update(cols)
+        return list(cols)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def evaluate(self, values: np.ndarray) -> Dict[str, np.ndarray]:
+        """對一條序列計算所有已登記的輸出，回傳 {欄名: ndarray}。"""
+        values = np.asarray(values, dtype="f8")
+        wanted = set(self.outputs.values())
+        refs: Dict[Node, int] = {k: 0 for k in self._nodes}
+        for _, deps, _ in self._nodes.values():
+            for d in deps:
+                refs[d] += 1
+        results: Dict[Node, np.ndarray] = {}
+        for key, (op, deps, params) in self._nodes.items():
+            if op == "input":
+                results[key] = values
+            else:
+                results[key] = _OPS[op](*(results[d] for d in deps), *params)
+            for d in deps:
+                refs[d] -= 1
+                if refs[d] == 0 and d not in wanted:
+                    del results[d]
+        return {name: results[key] for name, key in self.outputs.items()}
+
+
+def compute_indicators(df: pd.DataFrame, requests: Iterable[str], source: str = "close") -> pd.DataFrame:
+    """依請求清單一次算出所有指標，回傳與 `df` 同索引的欄式結果（欄名即請求名稱）。
+
+    `df` 需已依日期排序；重複或彼此共用基本運算的請求只會計算一次。
+    """
+    graph = IndicatorGraph()
+    for r in dict.fromkeys(requests):
+        graph.add(r)
+    if not graph.outputs:
+        return pd.DataFrame(index=df.index)
+    return pd.DataFrame(graph.evaluate(df[source].to_numpy()), index=df.index)
+
+
+__all__ = ["IndicatorGraph", "compute_indicators", "parse_request", "output_columns"]
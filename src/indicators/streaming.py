@@ -0,0 +1,488 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from src.data.store import PriceStore, get_store
+from src.utils.symbols import normalize_hk_symbol
+
+
+NAN = float("nan")
+STATE_FILE = "indicators.json"
+
+# 串流指標請求：ma20 / ema20 / std20 / rsi14 / cross10_30（SmaCrossStrategy 的交叉訊號）
+_REQUEST_RE = re.compile(r"^(?:(ma|sma|ema|std|rsi)(\d+)|cross(\d+)_(\d+))$")
+
+
+class _RollingWindow:
+    """固定長度視窗：保留最近 `period` 個值，供移除最舊值時使用（含 NaN 佔位）。"""
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.values: deque = deque()
+
+    def push(self, value: float) -> Optional[float]:
+        """加入新值，視窗已滿時回傳被擠出的舊值。"""
+        old = self.values.popleft() if len(self.values) == self.period else None
+        self.values.append(value)
+        return old
+
+
+class StreamingIndicator:
+    """串流指標基底：`update(x)` 以 O(1) 吸收一根新 K 線並回傳最新值，狀態為 O(週期)。
+
+    `state()` 回傳可 JSON 序列化的狀態，`from_state()` 還原；浮點數以 repr 往返，不失精度。
+    """
+
+    kind = ""
+
+    def update(self, value: float) -> float:
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, Any]:
+        return {"kind": self.kind, **{k: (list(v) if isinstance(v, deque) else v) for k, v in self._fields().items()}}
+
+    def _fields(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "StreamingIndicator":
+        sub = _KINDS[state["kind"]]
+        obj = sub.__new__(sub)
+        obj._restore(state)
+        return obj
+
+    def _restore(self, state: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class StreamingSMA(StreamingIndicator):
+    """逐位元等同 `Series.rolling(period).mean()`。
+
+    沿用 pandas 的滾動平均演算法：加入與移除各自帶 Kahan 補償的累加和、連續相同值
+    計數（相同值直接回傳該值）與負值計數（全非負時不回傳負數）。
+    """
+
+    kind = "sma"
+
+    def __init__(self, period: int):
+        self.window = _RollingWindow(period)
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.neg_ct = 0
+        self.same_ct = 0
+        self.prev_value = NAN
+        self.value = NAN
+
+    def _add(self, val: float) -> None:
+        if val != val:
+            return
+        self.nobs += 1
+        y = val - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct += 1
+        self.same_ct = self.same_ct + 1 if val == self.prev_value else 1
+        self.prev_value = val
+
+    def _remove(self, val: float) -> None:
+        if val != val:
+            return
+        self.nobs -= 1
+        y = -val - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct -= 1
+
+    def update(self, value: float) -> float:
+        value = float(value)
+        old = self.window.push(value)
+        if old is not None:
+            self._remove(old)
+        self._add(value)
+        if self.nobs >= self.window.period and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.same_ct >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+        else:
+            result = NAN
+        self.value = result
+        return result
+
+    def _fields(self) -> Dict[str, Any]:
+        return {
+            "period": self.window.period, "window": self.window.values, "nobs": self.nobs,
+            "sum_x": self.sum_x, "comp_add": self.comp_add, "comp_remove": self.comp_remove,
+            "neg_ct": self.neg_ct, "same_ct": self.same_ct, "prev_value": self.prev_value,
+            "value": self.value,
+        }
+
+    def _restore(self, state: Dict[str, Any]) -> None:
+        self.window = _RollingWindow(state["period"])
+        self.window.values.extend(state["window"])
+        for k in ("nobs", "sum_x", "comp_add", "comp_remove", "neg_ct", "same_ct", "prev_value", "value"):
+            setattr(self, k, state[k])
+
+
+class StreamingStd(StreamingIndicator):
+    """對應 `Series.rolling(period).std()`（ddof=1），沿用 pandas 的 Welford + Kahan 增量演算法。
+
+    多數情況逐位元相同。pandas 遇到大幅抵銷時會整窗重算（2.x 則把整窗相同值直接歸零），
+    本類別不重算，因此該位置之後的變異數約差 1e-16 × 價格²；平盤視窗開根號後可到 1e-6 量級，
+    pandas 可能回傳 0。
+    """
+
+    kind = "std"
+
+    def __init__(self, period: int):
+        self.window = _RollingWindow(period)
+        self.nobs = 0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.value = NAN
+
+    def _add(self, val: float) -> None:
+        if val != val:
+            return
+        self.nobs += 1
+        prev_mean = self.mean_x - self.comp_add
+        y = val - self.comp_add
+        t = y - self.mean_x
+        self.comp_add = t + self.mean_x - y
+        self.mean_x = self.mean_x + t / self.nobs
+        self.ssqdm_x = self.ssqdm_x + (val - prev_mean) * (val - self.mean_x)
+
+    def _remove(self, val: float) -> None:
+        if val != val:
+            return
+        self.nobs -= 1
+        if self.nobs:
+            prev_mean = self.mean_x - self.comp_remove
+            y = val - self.comp_remove
+            t = y - self.mean_x
+            self.comp_remove = t + self.mean_x - y
+            self.mean_x = self.mean_x - t / self.nobs
+            self.ssqdm_x = self.ssqdm_x - (val - prev_mean) * (val - self.mean_x)
+        else:
+            self.mean_x = 0.0
+            self.ssqdm_x = 0.0
+
+    def update(self, value: float) -> float:
+        value = float(value)
+        old = self.window.push(value)
+        if old is not None:
+            self._remove(old)
+        self._add(value)
+        if self.nobs >= self.window.period and self.nobs > 1:
+            var = self.ssqdm_x / (self.nobs - 1)
+            result = math.sqrt(var) if var >= 0 else 0.0
+        else:
+            result = NAN
+        self.value = result
+        return result
+
+    def _fields(self) -> Dict[str, Any]:
+        return {
+            "period": self.window.period, "window": self.window.values, "nobs": self.nobs,
+            "mean_x": self.mean_x, "ssqdm_x": self.ssqdm_x, "comp_add": self.comp_add,
+            "comp_remove": self.comp_remove, "value": self.value,
+        }
+
+    def _restore(self, state: Dict[str, Any]) -> None:
+        self.window = _RollingWindow(state["period"])
+        self.window.values.extend(state["window"])
+        for k in ("nobs", "mean_x", "ssqdm_x", "comp_add", "comp_remove", "value"):
+            setattr(self, k, state[k])
+
+
+class StreamingEMA(StreamingIndicator):
+    """逐位元等同 `Series.ewm(span=period, adjust=False).mean()`（含 NaN 的權重衰減）。"""
+
+    kind = "ema"
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.old_wt = 1.0
+        self.value = NAN
+
+    def update(self, value: float) -> float:
+        cur = float(value)
+        alpha = 1.0 / (1.0 + (self.period - 1) / 2.0)
+        weighted = self.value
+        if weighted == weighted:
+            # 遇到 NaN 時舊值權重照樣衰減，下一個有效值的比重因而變大
+            self.old_wt *= 1.0 - alpha
+            if cur == cur:
+                # pandas：值相同時不更新，避免常數序列累積誤差；權重和不一定恰為 1，需照樣相除
+                if weighted != cur:
+                    weighted = (self.old_wt * weighted + alpha * cur) / (self.old_wt + alpha)
+                self.old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+        self.value = weighted
+        return weighted
+
+    def _fields(self) -> Dict[str, Any]:
+        return {"period": self.period, "old_wt": self.old_wt, "value": self.value}
+
+    def _restore(self, state: Dict[str, Any]) -> None:
+        self.period = state["period"]
+        self.old_wt = state["old_wt"]
+        self.value = state["value"]
+
+
+class StreamingRSI(StreamingIndicator):
+    """等同圖表用的 RSI：收盤差分的漲/跌幅各取 `period` 日滾動平均，跌幅為 0 時以 1e-9 代替。"""
+
+    kind = "rsi"
+
+    def __init__(self, period: int = 14):
+        self.period = int(period)
+        self.prev_close = NAN
+        self.gain = StreamingSMA(period)
+        self.loss = StreamingSMA(period)
+        self.value = NAN
+
+    def update(self, value: float) -> float:
+        close = float(value)
+        delta = close - self.prev_close
+        self.prev_close = close
+        # 與 Series.clip 一致：NaN 保持 NaN，上漲日的跌幅為 -0.0（影響 pandas 的負值計數）
+        g = self.gain.update(max(delta, 0.0))
+        l = self.loss.update(-min(delta, 0.0))
+        rs = g / (1e-9 if l == 0 else l)
+        self.value = 100 - 100 / (1 + rs)
+        return self.value
+
+    def _fields(self) -> Dict[str, Any]:
+        return {
+            "period": self.period, "prev_close": self.prev_close,
+            "gain": self.gain.state(), "loss": self.loss.state(), "value": self.value,
+        }
+
+    def _restore(self, state: Dict[str, Any]) -> None:
+        self.period = state["period"]
+        self.prev_close = state["prev_close"]
+        self.gain = StreamingIndicator.from_state(state["gain"])
+        self.loss = StreamingIndicator.from_state(state["loss"])
+        self.value = state["value"]
+
+
+class _ExactSum:
+    """精確累加和（Shewchuk 部分和）：加減任意次後 `value()` 等於 `math.fsum(視窗)`。"""
+
+    def __init__(self, partials: Optional[List[float]] = None):
+        self.partials: List[float] = list(partials or [])
+
+    def add(self, x: float) -> None:
+        i = 0
+        for y in self.partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                self.partials[i] = lo
+                i += 1
+            x = hi
+        self.partials[i:] = [x]
+
+    def value(self) -> float:
+        return math.fsum(self.partials)
+
+
+class StreamingCrossOver(StreamingIndicator):
+    """等同 `sma_crossover` / SmaCrossStrategy 的 `CrossOver(SMA(fast), SMA(slow))`：上穿 +1、下穿 -1。
+
+    均線依 backtrader 以 fsum/period 計算（以精確累加和維持 O(1) 更新）；
+    方向以最後一個非零差值判斷，第 max(fast, slow) 根（0 起算）起才可能產生訊號。
+    """
+
+    kind = "cross"
+
+    def __init__(self, fast: int, slow: int):
+        self.fast = int(fast)
+        self.slow = int(slow)
+        self.windows = {"fast": _RollingWindow(fast), "slow": _RollingWindow(slow)}
+        self.sums = {"fast": _ExactSum(), "slow": _ExactSum()}
+        self.last_nonzero: Optional[float] = None
+        self.value = 0
+
+    def update(self, value: float) -> int:
+        close = float(value)
+        for key in ("fast", "slow"):
+            old = self.windows[key].push(close)
+            if old is not None:
+                self.sums[key].add(-old)
+            self.sums[key].add(close)
+        self.value = 0
+        if len(self.windows["slow"].values) < self.slow or len(self.windows["fast"].values) < self.fast:
+            return self.value
+        diff = self.sums["fast"].value() / self.fast - self.sums["slow"].value() / self.slow
+        if self.last_nonzero is None:
+            self.last_nonzero = diff
+            return self.value
+        if self.last_nonzero < 0 < diff:
+            self.value = 1
+        elif self.last_nonzero > 0 > diff:
+            self.value = -1
+        if diff != 0:
+            self.last_nonzero = diff
+        return self.value
+
+    def _fields(self) -> Dict[str, Any]:
+        return {
+            "fast": self.fast, "slow": self.slow,
+            "fast_window": self.windows["fast"].values, "slow_window": self.windows["slow"].values,
+            "fast_partials": self.sums["fast"].partials, "slow_partials": self.sums["slow"].partials,
+            "last_nonzero": self.last_nonzero, "value": self.value,
+        }
+
+    def _restore(self, state: Dict[str, Any]) -> None:
+        self.fast, self.slow = state["fast"], state["slow"]
+        self.windows = {"fast": _RollingWindow(self.fast), "slow": _RollingWindow(self.slow)}
+        self.windows["fast"].values.extend(state["fast_window"])
+        self.windows["slow"].values.extend(state["slow_window"])
+        self.sums = {"fast": _ExactSum(state["fast_partials"]), "slow": _ExactSum(state["slow_partials"])}
+        self.last_nonzero = state["last_nonzero"]
+        self.value = state["value"]
+
+
+_KINDS = {
+    "sma": StreamingSMA,
+    "std": StreamingStd,
+    "ema": StreamingEMA,
+    "rsi": StreamingRSI,
+    "cross": StreamingCrossOver,
+}
+
+
+def make_streaming(request: str) -> StreamingIndicator:
+    """依請求字串建立串流指標：ma20 / ema20 / std20 / rsi14 / cross10_30。"""
+    m = _REQUEST_RE.match(str(request).strip().lower())
+    if not m:
+        raise ValueError(f"不支援的串流指標：{request}（可用 ma/ema/std/rsi + 週期，或 cross<fast>_<slow>）")
+    kind, period, fast, slow = m.groups()
+    if kind is None:
+        return StreamingCrossOver(int(fast), int(slow))
+    if int(period) < 1:
+        raise ValueError(f"指標週期須為正整數：{request}")
+    return _KINDS["sma" if kind == "ma" else kind](int(period))
+
+
+def _state_path(store: PriceStore, symbol: str) -> Path:
+    return store.root / symbol / STATE_FILE
+
+
+def _save_state(path: Path, state: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _load_state(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def update_symbol_indicators(
+    symbol: str,
+    requests: Iterable[str],
+    store: Optional[PriceStore] = None,
+) -> Dict[str, Any]:
+    """把資料庫中尚未處理的新 K 線餵給該檔的串流指標，存回狀態並回傳各指標最新值。
+
+    狀態存於 `store/<symbol>/indicators.json`，記錄已處理到的日期與該日收盤價。
+    只讀取該日之後的列（資料庫以 offset 讀取），成本與新增根數成正比；若該日收盤價
+    已被改寫（例如全量重抓後的還原權調整）或請求清單改變，則從頭重建。
+    """
+    yf_symbol = normalize_hk_symbol(symbol)
+    store = store or get_store()
+    requests = list(dict.fromkeys(str(r).strip().lower() for r in requests))
+    path = _state_path(store, yf_symbol)
+    saved = _load_state(path)
+
+    indicators: Dict[str, StreamingIndicator] = {}
+    new_bars = None
+    if saved and saved.get("requests") == requests and saved.get("last_date"):
+        bars = store.read(yf_symbol, columns=["close"], start=saved["last_date"])
+        if len(bars) and str(bars["date"].iloc[0].date()) == saved["last_date"] \
+                and float(bars["close"].iloc[0]) == saved["last_close"]:
+            indicators = {r: StreamingIndicator.from_state(s) for r, s in saved["indicators"].items()}
+            new_bars = bars.iloc[1:]
+    if new_bars is None:
+        indicators = {r: make_streaming(r) for r in requests}
+        new_bars = store.read(yf_symbol, columns=["close"])
+        saved = None
+
+    for close in new_bars["close"].to_numpy():
+        for ind in indicators.values():
+            ind.update(close)
+
+    if len(new_bars):
+        last_date = str(new_bars["date"].iloc[-1].date())
+        last_close = float(new_bars["close"].iloc[-1])
+    else:
+        last_date = saved["last_date"] if saved else None
+        last_close = saved["last_close"] if saved else None
+    _save_state(path, {
+        "requests": requests,
+        "last_date": last_date,
+        "last_close": last_close,
+        "indicators": {r: ind.state() for r, ind in indicators.items()},
+    })
+    return {"symbol": yf_symbol, "date": last_date, "new_bars": int(len(new_bars)),
+            **{r: ind.value for r, ind in indicators.items()}}
+
+
+def update_universe_indicators(
+    symbols: Optional[Iterable[str]],
+    requests: Iterable[str],
+    store: Optional[PriceStore] = None,
+) -> pd.DataFrame:
+    """對多檔（預設為資料庫內全部）增量更新串流指標，回傳每檔一列的最新值表。"""
+    store = store or get_store()
+    codes = list(symbols) if symbols is not None else store.symbols()
+    requests = list(requests)
+    rows = []
+    for s in codes:
+        try:
+            rows.append(update_symbol_indicators(s, requests, store=store))
+        except FileNotFoundError:
+            continue
+    return pd.DataFrame(rows)
+
+
+__all__ = [
+    "StreamingIndicator",
+    "StreamingSMA",
+    "StreamingEMA",
+    "StreamingStd",
+    "StreamingRSI",
+    "StreamingCrossOver",
+    "make_streaming",
+    "update_symbol_indicators",
+    "update_universe_indicators",
+]
@@ -4,9 +4,14 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Tuple
 
+import numpy as np
 import pandas as pd
 import torch
 from pytorch_forecasting import TimeSeriesDataSet
+from pytorch_forecasting.data import GroupNormalizer
+
+from src.data.universe import PriceUniverse
+from src.risk.trading_calendar import calendar_time_idx
 
 
 @dataclass
@@ -22,19 +27,14 @@ def prepare_dataset(df: pd.DataFrame, symbol: str, config: RiskDataConfig | None
     if config is None:
         config = RiskDataConfig()
 
-    data = df.copy().sort_values("date").reset_index(drop=True)
+    # 資料集只用到收盤價衍生的報酬，只取需要的欄位，不複製整張日線表
+    data = df[["date", "close"]].sort_values("date").reset_index(drop=True)
     data[config.group_id] = 0  # 單一標的
     data[config.time_idx] = (data.index + 1).astype(int)
 
-    # 使用對數報酬（可避免價位尺度差異），加上 1e-9 防止 log(0)
+    # 目標為日報酬（可避免價位尺度差異）
     data[config.target] = (data["close"].pct_change().fillna(0.0)).astype("float32")
 
-    # 特徵：價格與成交量的標準化（簡化示例）
-    for col in ["open", "high", "low", "close", "volume"]:
-        mean = float(data[col].mean())
-        std = float(data[col].std() or 1.0)
-        data[f"{col}_norm"] = ((data[col] - mean) / std).astype("float32")
-
     training_cutoff = data[config.time_idx].max() - config.max_prediction_length
 
     training = TimeSeriesDataSet(
@@ -54,4 +54,106 @@ def prepare_dataset(df: pd.DataFrame, symbol: str, config: RiskDataConfig | None
     return training, validation, {symbol: 0}
 
 
-__all__ = ["RiskDataConfig", "prepare_dataset"]
+def _stack_universe(universe: PriceUniverse, config: RiskDataConfig) -> pd.DataFrame:
+    """由已對齊的面板直接組長表：面板的列號即共用交易日序號，不需再合併日期。"""
+    sym, row = np.nonzero(universe.mask.T)  # 依標的、再依日期排序
+    if not len(sym):
+        raise ValueError("沒有可用的標的資料")
+    close = universe["close"][row, sym]
+    ret = np.zeros(len(close), dtype=np.float64)
+    ret[1:] = np.where(sym[1:] == sym[:-1], close[1:] / close[:-1] - 1.0, 0.0)
+    ret[np.isnan(ret)] = 0.0
+    return pd.DataFrame({
+        "date": universe.dates[row],
+        config.group_id: pd.Series(np.asarray(universe.symbols, dtype=object)[sym]).astype("category"),
+        config.target: ret.astype("float32"),
+        config.time_idx: row.astype("int64") + 1,
+    })
+
+
+def training_calendar(frames: Dict[str, pd.DataFrame] | PriceUniverse) -> pd.DatetimeIndex:
+    """資料集使用的交易日曆（time_idx = 序號 + 1）：各檔日期的聯集；面板則為面板日曆。
+
+    單檔時即該檔自己的交易日，與 `prepare_dataset` 的列序編號相同。訓練時隨檢查點保存，
+    推論時以 `calendar_time_idx` 把新資料對回同一組序號。
+    """
+    if isinstance(frames, PriceUniverse):
+        return pd.DatetimeIndex(frames.dates)
+    dates = [pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[ns]") for df in frames.values()]
+    if not dates:
+        raise ValueError("沒有可用的標的資料")
+    return pd.DatetimeIndex(np.unique(np.concatenate(dates)))
+
+
+def stack_symbol_frames(
+    frames: Dict[str, pd.DataFrame] | PriceUniverse,
+    config: RiskDataConfig | None = None,
+    calendar: pd.DatetimeIndex | None = None,
+) -> pd.DataFrame:
+    """把多檔日線疊成一張長表：每檔一個 group_id（代碼字串），time_idx 為全體共用的交易日序號。
+
+    共用交易日曆讓各檔在同一個 time_idx 對齊，停牌造成的缺日以缺漏時間步處理。
+    `frames` 也可以是 `PriceUniverse`，此時直接沿用面板的日曆與遮罩。
+    推論時傳入訓練日曆 `calendar`，time_idx 依該日曆編號，不受同批其他標的影響。
+    """
+    if config is None:
+        config = RiskDataConfig()
+    if isinstance(frames, PriceUniverse):
+        return _stack_universe(frames, config)
+    parts = []
+    for symbol, df in frames.items():
+        data = df[["date", "close"]].sort_values("date").reset_index(drop=True)
+        data[config.target] = data["close"].pct_change().fillna(0.0).astype("float32")
+        data[config.group_id] = symbol
+        if calendar is not None:
+            idx, keep = calendar_time_idx(data["date"], calendar)
+            data[config.time_idx] = idx
+            data = data[keep]
+        parts.append(data.drop(columns="close"))
+    if not parts:
+        raise ValueError("沒有可用的標的資料")
+    stacked = pd.concat(parts, ignore_index=True)
+    if calendar is None:
+        calendar = training_calendar(frames)
+        stacked[config.time_idx] = calendar.get_indexer(stacked["date"]).astype("int64") + 1
+    stacked[config.group_id] = stacked[config.group_id].astype("category")
+    return stacked
+
+
+def prepare_multi_dataset(
+    frames: Dict[str, pd.DataFrame] | PriceUniverse,
+    config: RiskDataConfig | None = None,
+) -> Tuple[TimeSeriesDataSet, TimeSeriesDataSet, Dict[str, int]]:
+    """多標的共用一個 TimeSeriesDataSet，供訓練單一全域分位數模型。
+
+    - 每檔為獨立 group，代碼同時作為靜態類別特徵，讓模型學到各檔的差異
+    - 目標以 GroupNormalizer 按檔標準化，預測時自動還原為各檔的報酬尺度
+    - 驗證集為全體最後 `max_prediction_length` 個交易日
+    回傳 (training, validation, {symbol: 群組序號})。
+    """
+    if config is None:
+        config = RiskDataConfig()
+    data = stack_symbol_frames(frames, config)
+    training_cutoff = data[config.time_idx].max() - config.max_prediction_length
+
+    training = TimeSeriesDataSet(
+        data[lambda x: x[config.time_idx] <= training_cutoff],
+        time_idx=config.time_idx,
+        target=config.target,
+        group_ids=[config.group_id],
+        max_encoder_length=config.max_encoder_length,
+        max_prediction_length=config.max_prediction_length,
+        static_categoricals=[config.group_id],
+        time_varying_known_reals=[config.time_idx],
+        time_varying_unknown_reals=[config.target],
+        target_normalizer=GroupNormalizer(groups=[config.group_id]),
+        add_target_scales=True,
+        allow_missing_timesteps=True,
+    )
+
+    validation = TimeSeriesDataSet.from_dataset(training, data, min_prediction_idx=training_cutoff + 1)
+    mapping = {str(s): i for i, s in enumerate(data[config.group_id].cat.categories)}
+    return training, validation, mapping
+
+
+__all__ = ["RiskDataConfig", "prepare_dataset", "prepare_multi_dataset", "stack_symbol_frames", "training_calendar"]
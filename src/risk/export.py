@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import copy
+import json
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+from pytorch_forecasting import TimeSeriesDataSet
+
+from src.config import PROJECT_ROOT
+from src.risk.inference import RiskInferenceService
+from src.risk.slim import MODEL_FILE, SPEC_FILE, SlimRiskModel, build_inputs, slim_artifact_dir
+
+
+class _PredictionHead(torch.nn.Module):
+    """只輸出分位數張量的包裝，讓 TFT 可被 `torch.jit.trace`（原輸出為命名元組）。"""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x: Dict[str, torch.Tensor]) -> torch.Tensor:
+        return self.model(x)["prediction"]
+
+
+def _center_scale(scaler: Any) -> Tuple[float, float]:
+    """取出實數特徵縮放器的 (中心, 尺度)；只支援線性縮放（StandardScaler / TorchNormalizer）。"""
+    if scaler is None:
+        return 0.0, 1.0
+    if hasattr(scaler, "mean_") and hasattr(scaler, "scale_"):  # sklearn StandardScaler
+        return float(np.ravel(scaler.mean_)[0]), float(np.ravel(scaler.scale_)[0])
+    if hasattr(scaler, "center_") and hasattr(scaler, "scale_") and getattr(scaler, "transformation", None) in (None, "identity"):
+        return float(np.ravel(scaler.center_)[0]), float(np.ravel(scaler.scale_)[0])
+    raise NotImplementedError(f"不支援匯出的縮放器：{type(scaler).__name__}")
+
+
+def _spec_from_service(service: RiskInferenceService, frames: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    """由資料集參數整理出精簡推論器需要的前處理參數。"""
+    params, cfg = service.params, service.config
+    probe = TimeSeriesDataSet.from_parameters(params, service._tail_frame(frames), predict=True, stop_randomization=True)
+    normalizer = params["target_normalizer"]
+    if getattr(normalizer, "transformation", None) not in (None, "identity"):
+        raise NotImplementedError("目標轉換（log 等）不支援匯出")
+    if service.is_global:
+        norm = normalizer.norm_
+        target_scales = {str(g): [float(norm.loc[g, "center"]), float(norm.loc[g, "scale"])] for g in norm.index}
+        categories = {str(k): int(v) for k, v in params["categorical_encoders"][cfg.group_id].classes_.items()}
+    else:
+        target_scales = {"*": list(_center_scale(normalizer))}
+        categories = {}
+    scalers = {
+        name: list(_center_scale(scaler))
+        for name, scaler in (params.get("scalers") or {}).items()
+        if name != cfg.target
+    }
+    return {
+        "format": 1,
+        "quantiles": [float(q) for q in service.quantiles],
+        "max_encoder_length": cfg.max_encoder_length,
+        "max_prediction_length": cfg.max_prediction_length,
+        "target": cfg.target,
+        "time_idx": cfg.time_idx,
+        "group_id": cfg.group_id,
+        "is_global": service.is_global,
+        "reals": list(probe.reals),
+        "scalers": scalers,
+        "target_scales": target_scales,
+        "categories": categories,
+        # 訓練交易日曆：推論時 time_idx 依此編號（見 trading_calendar）
+        "calendar": [str(d.date()) for d in service.calendar] if service.calendar is not None else None,
+    }
+
+
+def export_slim_model(
+    ckpt_path: Path,
+    frames: Dict[str, pd.DataFrame],
+    out_dir: Path | None = None,
+    quantize: bool = True,
+) -> Path:
+    """把 Lightning 檢查點匯出成精簡推論產物：TorchScript 模型 + 前處理參數 JSON。
+
+    `quantize=True` 時先以動態 int8 量化所有 Linear 層（權重 int8、啟用值於執行時量化），
+    再以 `frames`（訓練用的日線即可）建立的輸入追蹤成 TorchScript。產物可由
+    `SlimRiskModel` 載入，不需 pytorch_forecasting 與 lightning。回傳產物資料夾。
+    """
+    service = RiskInferenceService(ckpt_path)
+    out_dir = Path(out_dir) if out_dir is not None else slim_artifact_dir(ckpt_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    spec = _spec_from_service(service, frames)
+    spec["quantized"] = quantize
+    (out_dir / SPEC_FILE).write_text(json.dumps(spec, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    model = copy.deepcopy(service.model).cpu().eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    head = _PredictionHead(model).eval()
+    # 以精簡推論器自己組出的輸入追蹤，確保載入後的輸入格式與追蹤時一致
+    _, example = build_inputs(spec, frames)
+    with torch.inference_mode():
+        traced = torch.jit.trace(head, (example,), strict=False, check_trace=False)
+    torch.jit.save(traced, (out_dir / MODEL_FILE).as_posix())
+    return out_dir
+
+
+_RSS_SNIPPET = """
+import pickle, resource, sys
+with open(sys.argv[3], "rb") as f:
+    frames = pickle.load(f)
+if sys.argv[1] == "slim":
+    from src.risk.slim import SlimRiskModel
+    SlimRiskModel(sys.argv[2]).predict(frames)
+else:
+    from src.risk.inference import RiskInferenceService
+    RiskInferenceService(sys.argv[2]).predict(frames)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "pytorch_forecasting" in sys.modules or "lightning" in sys.modules)
+"""
+
+
+def _child_rss(kind: str, path: Path, frames_file: Path) -> Tuple[float, bool]:
+    """在全新的子行程中載入並預測一次，回傳 (峰值 RSS MB, 是否載入了 pytorch_forecasting/lightning)。"""
+    out = subprocess.run(
+        [sys.executable, "-c", _RSS_SNIPPET, kind, Path(path).as_posix(), frames_file.as_posix()],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    rss_kb, heavy = out.stdout.split()[-2:]
+    return int(rss_kb) / 1024, heavy == "True"
+
+
+def _median_ms(fn, runs: int) -> float:
+    fn()  # 暖機
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def check_slim_parity(
+    ckpt_path: Path,
+    frames: Dict[str, pd.DataFrame],
+    artifact_dir: Path | None = None,
+    tolerance: float = 2e-3,
+    runs: int = 20,
+    measure_rss: bool = True,
+) -> Dict[str, Any]:
+    """比較完整檢查點與精簡產物：各分位數的最大絕對誤差、推論延遲與峰值 RSS。
+
+    誤差以報酬單位計（2e-3 即 0.2 個百分點）；RSS 各在獨立子行程中量測，
+    同時確認精簡推論器沒有載入 pytorch_forecasting / lightning。報告另存為產物旁的 parity.json。
+    """
+    artifact_dir = Path(artifact_dir) if artifact_dir is not None else slim_artifact_dir(ckpt_path)
+    full = RiskInferenceService(ckpt_path)
+    slim = SlimRiskModel(artifact_dir)
+    ref = full.predict(frames)
+    got = slim.predict(frames)
+    merged = ref.merge(got, on=["symbol", "quantile"], suffixes=("_full", "_slim"))
+    diff = (merged["prediction_full"] - merged["prediction_slim"]).abs()
+    per_q = diff.groupby(merged["quantile"]).max()
+    report: Dict[str, Any] = {
+        "symbols": int(merged["symbol"].nunique()),
+        "max_abs_diff": {str(q): float(v) for q, v in per_q.items()},
+        "tolerance": tolerance,
+        "ok": bool(len(merged) == len(ref) and (diff <= tolerance).all()),
+        "full_ms": _median_ms(lambda: full.predict(frames), runs),
+        "slim_ms": _median_ms(lambda: slim.predict(frames), runs),
+        "ckpt_mb": Path(ckpt_path).stat().st_size / 2**20,
+        "artifact_mb": (artifact_dir / MODEL_FILE).stat().st_size / 2**20,
+    }
+    if measure_rss:
+        with tempfile.TemporaryDirectory() as tmp:
+            frames_file = Path(tmp) / "frames.pkl"
+            with open(frames_file, "wb") as f:
+                pickle.dump(frames, f)
+            report["full_rss_mb"], _ = _child_rss("full", Path(ckpt_path), frames_file)
+            report["slim_rss_mb"], report["slim_loads_forecasting"] = _child_rss("slim", artifact_dir, frames_file)
+    (artifact_dir / "parity.json").write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    return report
+
+
+def format_parity_report(report: Dict[str, Any]) -> List[str]:
+    lines = [
+        f"分位數誤差（{report['symbols']} 檔，容許 {report['tolerance']:g}）："
+        + "、".join(f"q{q}={v:.2e}" for q, v in report["max_abs_diff"].items())
+        + ("  ✔" if report["ok"] else "  ✘ 超出容許誤差"),
+        f"延遲（中位數）：完整 {report['full_ms']:.1f} ms → 精簡 {report['slim_ms']:.1f} ms",
+        f"檔案大小：檢查點 {report['ckpt_mb']:.1f} MB → 精簡 {report['artifact_mb']:.1f} MB",
+    ]
+    if "slim_rss_mb" in report:
+        lines.append(
+            f"峰值 RSS：完整 {report['full_rss_mb']:.0f} MB → 精簡 {report['slim_rss_mb']:.0f} MB"
+            + ("（警告：精簡推論器載入了 pytorch_forecasting/lightning）" if report["slim_loads_forecasting"] else "")
+        )
+    return lines
+
+
+__all__ = ["export_slim_model", "check_slim_parity", "format_parity_report"]
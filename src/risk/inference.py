@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pandas as pd
+import torch
+from pytorch_forecasting import TimeSeriesDataSet
+from pytorch_forecasting.models.temporal_fusion_transformer import TemporalFusionTransformer
+
+from src.risk.dataset import RiskDataConfig, stack_symbol_frames
+from src.risk.trading_calendar import calendar_time_idx, load_calendar
+
+
+class RiskInferenceService:
+    """常駐的風險模型推論服務：檢查點只載入一次，之後每次預測只做一次前向傳播。
+
+    每檔只建構最後一個編碼窗（最後 max_encoder_length + max_prediction_length 列），
+    不再為整段歷史建立資料集；N 檔併成一批，以 `torch.inference_mode` 推論。
+    支援單檔模型（`prepare_dataset`，群組固定為 0）與全域模型（`prepare_multi_dataset`）。
+    time_idx 依檢查點旁保存的訓練日曆編號，同一檔的預測不受同批其他標的或輸入起始日影響；
+    沒有日曆的舊檢查點退回以輸入資料編號。
+    """
+
+    def __init__(self, ckpt_path: Path):
+        self.ckpt_path = Path(ckpt_path)
+        self.model = TemporalFusionTransformer.load_from_checkpoint(self.ckpt_path.as_posix())
+        self.model.cpu()
+        self.model.eval()
+        self.params = self.model.dataset_parameters
+        self.config = RiskDataConfig(
+            time_idx=self.params["time_idx"],
+            target=self.params["target"],
+            group_id=self.params["group_ids"][0],
+            max_encoder_length=self.params["max_encoder_length"],
+            max_prediction_length=self.params["max_prediction_length"],
+        )
+        # 全域模型以代碼作為靜態類別；單檔模型沒有
+        self.is_global = self.config.group_id in (self.params.get("static_categoricals") or [])
+        self.quantiles = list(getattr(self.model.loss, "quantiles", [0.05, 0.5, 0.95]))
+        self.calendar = load_calendar(self.ckpt_path)
+        self._lock = threading.Lock()
+
+    def _tail_frame(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """依模型的資料慣例計算 time_idx 與報酬後，只保留每檔最後一個完整窗口。"""
+        cfg = self.config
+        if self.is_global:
+            data = stack_symbol_frames(frames, cfg, calendar=self.calendar)
+        else:
+            parts = []
+            for symbol, df in frames.items():
+                part = df[["date", "close"]].sort_values("date").reset_index(drop=True)
+                part[cfg.target] = part["close"].pct_change().fillna(0.0).astype("float32")
+                if self.calendar is None:
+                    part[cfg.time_idx] = (part.index + 1).astype(int)
+                else:
+                    idx, keep = calendar_time_idx(part["date"], self.calendar)
+                    part[cfg.time_idx] = idx
+                    part = part[keep]
+                part[cfg.group_id] = 0
+                part["symbol"] = symbol
+                parts.append(part)
+            data = pd.concat(parts, ignore_index=True)
+        key = cfg.group_id if self.is_global else "symbol"
+        window = cfg.max_encoder_length + cfg.max_prediction_length
+        return data.groupby(key, sort=False, observed=True).tail(window).reset_index(drop=True)
+
+    def _forward(self, data: pd.DataFrame) -> Tuple[pd.DataFrame, List[List[float]]]:
+        dataset = TimeSeriesDataSet.from_parameters(self.params, data, predict=True, stop_randomization=True)
+        dl = dataset.to_dataloader(train=False, batch_size=max(1, len(dataset)), num_workers=0)
+        index_parts, preds = [], []
+        with self._lock, torch.inference_mode():
+            for x, _ in dl:
+                out = self.model(x)["prediction"].cpu().numpy()  # (batch, pred_len, n_quantiles)
+                index_parts.append(dataset.x_to_index(x))
+                preds.extend(out[:, -1, : len(self.quantiles)].tolist())
+        return pd.concat(index_parts, ignore_index=True), preds
+
+    def predict(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """一次預測多檔的隔日分位數，回傳長表格（symbol, quantile, prediction）。"""
+        data = self._tail_frame(frames)
+        rows = []
+        if self.is_global:
+            index, preds = self._forward(data)
+            symbols = index[self.config.group_id].astype(str).tolist()
+        else:
+            # 單檔模型的群組皆為 0，無法併批區分；逐檔推論，但模型與資料集參數共用
+            symbols, preds = [], []
+            for symbol, part in data.groupby("symbol", sort=False):
+                _, p = self._forward(part.drop(columns="symbol"))
+                symbols.append(symbol)
+                preds.extend(p)
+        for symbol, values in zip(symbols, preds):
+            for q, v in zip(self.quantiles, values):
+                rows.append({"symbol": symbol, "quantile": q, "prediction": v})
+        return pd.DataFrame(rows, columns=["symbol", "quantile", "prediction"])
+
+    def predict_one(self, symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+        """單檔預測，格式同 `predict_next_day_quantiles`（quantile, prediction）。"""
+        res = self.predict({symbol: df})
+        return res[["quantile", "prediction"]].reset_index(drop=True)
+
+
+# 已載入模型的 LRU：鍵為 (檢查點絕對路徑, mtime)，最多保留 MAX_LOADED_MODELS 個
+MAX_LOADED_MODELS = 4
+_services: "OrderedDict[Tuple[str, float], RiskInferenceService]" = OrderedDict()
+_services_lock = threading.Lock()
+
+
+def get_inference_service(ckpt_path: Path) -> RiskInferenceService:
+    """取得（必要時建立）常駐服務；檢查點檔案更新後會重新載入，超過上限時淘汰最久未用的模型。"""
+    path = Path(ckpt_path).resolve()
+    key = (path.as_posix(), path.stat().st_mtime)
+    with _services_lock:
+        service = _services.get(key)
+        if service is not None:
+            _services.move_to_end(key)
+            return service
+        for old in [k for k in _services if k[0] == key[0]]:
+            del _services[old]
+        service = _services[key] = RiskInferenceService(path)
+        while len(_services) > MAX_LOADED_MODELS:
+            _services.popitem(last=False)
+        return service
+
+
+def clear_inference_services() -> None:
+    """釋放所有已載入的模型。"""
+    with _services_lock:
+        _services.clear()
+
+
+__all__ = ["RiskInferenceService", "get_inference_service", "clear_inference_services", "MAX_LOADED_MODELS"]
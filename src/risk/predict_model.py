@@ -1,41 +1,33 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict
 
 import pandas as pd
-import torch
-from pytorch_forecasting import TimeSeriesDataSet
-from pytorch_forecasting.models.temporal_fusion_transformer import TemporalFusionTransformer
 
 from src.config import OUTPUTS_DIR
+from src.risk.inference import get_inference_service
 
 
-def predict_next_day_quantiles(dataset: TimeSeriesDataSet, ckpt_path: Path) -> pd.DataFrame:
-    model = TemporalFusionTransformer.load_from_checkpoint(ckpt_path.as_posix())
-    model.eval()
-
-    # 取 validation dataloader 的最後一批（含未來一步）
-    dl = dataset.to_dataloader(train=False, batch_size=64, num_workers=0)
-    model.cpu()
-    model.eval()
-    batch = list(dl)[-1]
-    x, y = batch
-    with torch.no_grad():
-        out = model(x)
-    # out 是一個包含 'prediction' 的 Output 物件
-    pred = out["prediction"]  # Tensor 或 ndarray-like
-    arr = pred.detach().cpu().numpy()
-    # 形狀可能為 (batch, pred_len, n_quantiles) 或 (batch, n_quantiles)
-    if arr.ndim == 3:
-        y_hat = arr[0, -1, :]
-    elif arr.ndim == 2:
-        y_hat = arr[0, :]
-    else:
-        y_hat = arr.reshape(-1)
-    quantiles = getattr(model.loss, "quantiles", [0.05, 0.5, 0.95])
-    result = pd.DataFrame({"quantile": quantiles, "prediction": y_hat[: len(quantiles)]})
-    return result
+def predict_next_day_quantiles(symbol: str, df: pd.DataFrame, ckpt_path: Path) -> pd.DataFrame:
+    """預測單檔的隔日分位數，回傳（quantile, prediction）表格。
+
+    交給常駐的 `RiskInferenceService`：檢查點只載入一次，只建構最後一個編碼窗，
+    time_idx 依檢查點旁的訓練日曆編號，與 `predict_quantiles_for_symbols` 的結果一致。
+    """
+    return get_inference_service(ckpt_path).predict_one(symbol, df)
+
+
+def predict_quantiles_for_symbols(
+    frames: Dict[str, pd.DataFrame],
+    ckpt_path: Path,
+) -> pd.DataFrame:
+    """以全域模型一次預測多檔的隔日分位數，回傳長表格（symbol, quantile, prediction）。
+
+    透過常駐的 `RiskInferenceService`：每檔只建構最後一個編碼窗，整批一次前向傳播；
+    標的須為訓練時出現過的代碼。
+    """
+    return get_inference_service(ckpt_path).predict(frames)
 
 
 def save_quantile_table(result: pd.DataFrame, symbol: str) -> Path:
@@ -75,4 +67,4 @@ def stop_loss_from_vol_and_quantile(ann_vol: float, q05: float | None) -> float:
     return sl
 
 
-__all__ = ["predict_next_day_quantiles", "save_quantile_table"]
+__all__ = ["predict_next_day_quantiles", "predict_quantiles_for_symbols", "save_quantile_table"]
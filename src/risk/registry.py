@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from src.config import MODELS_DIR
+from src.utils.locks import file_lock
+
+
+# 同一行程內所有 ModelRegistry 實例共用（train_with_registry 每次呼叫都會新建實例）
+_registry_lock = threading.Lock()
+
+
+def data_range(frames: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
+    """各檔資料區間摘要：列數、起訖日與日線欄位的雜湊（資料被修正時雜湊會改變）。"""
+    out: Dict[str, Dict[str, Any]] = {}
+    for symbol in sorted(frames):
+        df = frames[symbol].sort_values("date")
+        cols = [c for c in ("date", "open", "high", "low", "close", "volume") if c in df.columns]
+        digest = hashlib.sha256(
+            pd.util.hash_pandas_object(df[cols], index=False).to_numpy().tobytes()
+        ).hexdigest()
+        out[symbol] = {
+            "rows": int(len(df)),
+            "start": str(pd.Timestamp(df["date"].iloc[0]).date()) if len(df) else None,
+            "end": str(pd.Timestamp(df["date"].iloc[-1]).date()) if len(df) else None,
+            "sha256": digest,
+        }
+    return out
+
+
+def fingerprint(name: str, ranges: Dict[str, Dict[str, Any]], config: Any, hparams: Dict[str, Any]) -> str:
+    """模型指紋：名稱、資料區間雜湊、資料集設定與訓練超參數的 SHA-256。"""
+    payload = {
+        "name": name,
+        "data": ranges,
+        "config": asdict(config) if hasattr(config, "__dataclass_fields__") else config,
+        "hparams": hparams,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ModelRegistry:
+    """模型登錄表（MODELS_DIR/registry.json）：記錄每個檢查點由哪些資料、設定與超參數訓練而來。
+
+    索引以 tmp 檔 + os.replace 原子替換；讀改寫以模組層級的執行緒鎖與 registry.lock 檔案鎖
+    序列化，介面的訓練子行程與 CLI 同時登記也不會互相覆蓋。
+    """
+
+    def __init__(self, root: Path | None = None):
+        self.root = Path(root) if root is not None else MODELS_DIR
+
+    @property
+    def path(self) -> Path:
+        return self.root / "registry.json"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_text(json.dumps(entries, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def entries(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        items = list(self._load().values())
+        if name is not None:
+            items = [e for e in items if e["name"] == name]
+        return sorted(items, key=lambda e: e["created"])
+
+    def find(self, fp: str) -> Optional[Dict[str, Any]]:
+        """指紋相同且檢查點仍存在時回傳該筆紀錄。"""
+        entry = self._load().get(fp)
+        if entry is None or not Path(entry["ckpt"]).exists():
+            return None
+        return entry
+
+    def latest(self, name: str) -> Optional[Dict[str, Any]]:
+        """某模型名稱（代碼或 global）最新且檢查點仍存在的紀錄。"""
+        for entry in reversed(self.entries(name)):
+            if Path(entry["ckpt"]).exists():
+                return entry
+        return None
+
+    def checkpoint_dir(self, name: str, fp: str) -> Path:
+        return self.root / name / fp[:16]
+
+    def register(
+        self,
+        name: str,
+        fp: str,
+        ckpt: Path,
+        ranges: Dict[str, Dict[str, Any]],
+        config: Any,
+        hparams: Dict[str, Any],
+        val_loss: Optional[float],
+    ) -> Dict[str, Any]:
+        entry = {
+            "name": name,
+            "fingerprint": fp,
+            "ckpt": Path(ckpt).as_posix(),
+            "data": ranges,
+            "config": asdict(config) if hasattr(config, "__dataclass_fields__") else config,
+            "hparams": hparams,
+            "val_loss": val_loss,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+        with _registry_lock, file_lock(self.root / "registry.lock"):
+            entries = self._load()
+            entries[fp] = entry
+            self._save(entries)
+        return entry
+
+
+def latest_checkpoint(name: str, registry: ModelRegistry | None = None) -> Optional[Path]:
+    """回傳最新的檢查點；登錄表沒有紀錄時退回舊路徑 MODELS_DIR/<name>/tft_quantile.ckpt。"""
+    registry = registry or ModelRegistry()
+    entry = registry.latest(name)
+    if entry is not None:
+        return Path(entry["ckpt"])
+    legacy = registry.root / name / "tft_quantile.ckpt"
+    return legacy if legacy.exists() else None
+
+
+__all__ = ["ModelRegistry", "data_range", "fingerprint", "latest_checkpoint"]
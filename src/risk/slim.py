@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+
+from src.risk.trading_calendar import calendar_time_idx
+
+
+# 匯出產物：TorchScript 模型 + 前處理參數（只依賴 torch / numpy / pandas）
+MODEL_FILE = "risk_model.pt"
+SPEC_FILE = "risk_model.json"
+
+
+def _returns(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    data = df[["date", "close"]].sort_values("date")
+    ret = data["close"].pct_change().fillna(0.0).to_numpy(dtype=np.float32)
+    return data["date"].to_numpy(), ret
+
+
+def _windows(spec: Dict, frames: Dict[str, pd.DataFrame]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """每檔取最後 encoder + prediction 個時間步，回傳 (代碼, 報酬 (B, T), time_idx (B, T))。"""
+    window = spec["max_encoder_length"] + spec["max_prediction_length"]
+    series = {symbol: _returns(df) for symbol, df in frames.items()}
+    # 訓練日曆（匯出時寫入）；舊產物沒有時退回以輸入資料編號
+    calendar = pd.DatetimeIndex(spec["calendar"]) if spec.get("calendar") else None
+    batch_calendar = None
+    if spec["is_global"] and calendar is None:
+        batch_calendar = pd.Index(np.unique(np.concatenate([d for d, _ in series.values()])))
+    symbols, rets, idxs = [], [], []
+    for symbol, (dates, ret) in series.items():
+        if spec["is_global"] and symbol not in spec["categories"]:
+            continue  # 訓練時未出現的代碼
+        if calendar is not None:
+            t, keep = calendar_time_idx(dates, calendar)
+            t, ret = t[keep], ret[keep]
+        elif spec["is_global"]:
+            t = batch_calendar.get_indexer(dates) + 1
+        else:
+            t = np.arange(1, len(ret) + 1)
+        if not len(t):
+            continue
+        if spec["is_global"]:
+            steps = np.arange(t[-1] - window + 1, t[-1] + 1)
+            if steps[0] < t[0]:
+                continue
+            # 從該檔最早的觀測起補齊缺日再取窗口：窗口第一步停牌時沿用之前最後一筆觀測，
+            # 與 TimeSeriesDataSet 的前值補齊一致，不會把 NaN 送進模型
+            filled = pd.Series(ret, index=t).reindex(np.arange(t[0], t[-1] + 1)).ffill()
+            ret = filled.loc[steps].to_numpy(dtype=np.float32)
+            t = steps
+        else:
+            if len(ret) < window:
+                continue
+            t, ret = t[-window:], ret[-window:]
+        symbols.append(symbol)
+        rets.append(ret)
+        idxs.append(t)
+    if not symbols:
+        return [], np.empty((0, window), np.float32), np.empty((0, window), np.int64)
+    return symbols, np.stack(rets), np.stack(idxs).astype(np.int64)
+
+
+def build_inputs(spec: Dict, frames: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, torch.Tensor]]:
+    """依前處理參數把日線轉成模型輸入字典（鍵與形狀同 TimeSeriesDataSet 的批次）。"""
+    enc, dec = spec["max_encoder_length"], spec["max_prediction_length"]
+    symbols, ret, t = _windows(spec, frames)
+    n = len(symbols)
+    if spec["is_global"]:
+        codes = np.array([spec["categories"][s] for s in symbols], dtype=np.int64)
+        scales = np.array([spec["target_scales"][s] for s in symbols], dtype=np.float32).reshape(n, 2)
+        cat = np.repeat(codes[:, None, None], enc + dec, axis=1)
+    else:
+        codes = np.zeros(n, dtype=np.int64)
+        scales = np.tile(np.array(spec["target_scales"]["*"], dtype=np.float32), (n, 1))
+        cat = np.zeros((n, enc + dec, 0), dtype=np.int64)
+    center, scale = scales[:, 0:1], scales[:, 1:2]
+
+    target = spec["target"]
+    cols = []
+    for name in spec["reals"]:
+        m, s = spec["scalers"].get(name, (0.0, 1.0))
+        if name == target:
+            cols.append((ret - center) / scale)
+        elif name == spec["time_idx"]:
+            cols.append((t - m) / s)
+        elif name == f"{target}_center":
+            cols.append(np.broadcast_to((center - m) / s, ret.shape))
+        elif name == f"{target}_scale":
+            cols.append(np.broadcast_to((scale - m) / s, ret.shape))
+        else:
+            raise ValueError(f"不支援的實數特徵：{name}")
+    cont = np.stack(cols, axis=-1).astype(np.float32) if cols else np.zeros((n, enc + dec, 0), np.float32)
+
+    x = {
+        "encoder_cat": torch.from_numpy(np.ascontiguousarray(cat[:, :enc])),
+        "encoder_cont": torch.from_numpy(np.ascontiguousarray(cont[:, :enc])),
+        "encoder_target": torch.from_numpy(np.ascontiguousarray(ret[:, :enc])),
+        "encoder_lengths": torch.full((n,), enc, dtype=torch.long),
+        "decoder_cat": torch.from_numpy(np.ascontiguousarray(cat[:, enc:])),
+        "decoder_cont": torch.from_numpy(np.ascontiguousarray(cont[:, enc:])),
+        "decoder_target": torch.from_numpy(np.ascontiguousarray(ret[:, enc:])),
+        "decoder_lengths": torch.full((n,), dec, dtype=torch.long),
+        "decoder_time_idx": torch.from_numpy(np.ascontiguousarray(t[:, enc:])),
+        "groups": torch.from_numpy(codes[:, None]),
+        "target_scale": torch.from_numpy(np.ascontiguousarray(scales)),
+    }
+    return symbols, x
+
+
+class SlimRiskModel:
+    """不載入 pytorch_forecasting / lightning 的風險分位數推論器。
+
+    讀取 `export_slim_model` 產生的 TorchScript 模型與前處理參數，自行把日線轉成
+    模型輸入（時間索引與目標的標準化、類別編碼、編碼/解碼窗），與
+    `RiskInferenceService` 使用相同的資料慣例：time_idx 依匯出時寫入的訓練日曆編號
+    （全域模型的缺日以前值補齊）。
+    """
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        self.dir = path if path.is_dir() else path.parent
+        self.spec = json.loads((self.dir / SPEC_FILE).read_text(encoding="utf-8"))
+        self.model = torch.jit.load((self.dir / MODEL_FILE).as_posix(), map_location="cpu")
+        self.model.eval()
+        self.quantiles: List[float] = self.spec["quantiles"]
+        self.is_global: bool = self.spec["is_global"]
+        self._lock = threading.Lock()
+
+    def build_inputs(self, frames: Dict[str, pd.DataFrame]) -> Tuple[List[str], Dict[str, torch.Tensor]]:
+        return build_inputs(self.spec, frames)
+
+    def predict(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """一次預測多檔的隔日分位數，回傳長表格（symbol, quantile, prediction）。"""
+        symbols, x = self.build_inputs(frames)
+        if not symbols:
+            return pd.DataFrame(columns=["symbol", "quantile", "prediction"])
+        with self._lock, torch.inference_mode():
+            out = self.model(x).cpu().numpy()  # (batch, pred_len, n_quantiles)
+        values = out[:, -1, : len(self.quantiles)]
+        return pd.DataFrame({
+            "symbol": np.repeat(symbols, len(self.quantiles)),
+            "quantile": np.tile(self.quantiles, len(symbols)),
+            "prediction": values.reshape(-1).astype(float),
+        })
+
+    def predict_one(self, symbol: str, df: pd.DataFrame) -> pd.DataFrame:
+        """單檔預測，格式同 `predict_next_day_quantiles`（quantile, prediction）。"""
+        res = self.predict({symbol: df})
+        return res[["quantile", "prediction"]].reset_index(drop=True)
+
+
+def slim_artifact_dir(ckpt_path: Path) -> Path:
+    """檢查點對應的精簡模型資料夾（與檢查點同目錄下的 slim/）。"""
+    return Path(ckpt_path).parent / "slim"
+
+
+@lru_cache(maxsize=4)
+def _load(path: str, mtime: float) -> SlimRiskModel:
+    return SlimRiskModel(Path(path))
+
+
+def get_slim_model(artifact_dir: Path) -> SlimRiskModel | None:
+    """載入（並快取）精簡模型；資料夾內沒有匯出產物時回傳 None。"""
+    model_file = Path(artifact_dir) / MODEL_FILE
+    if not model_file.exists():
+        return None
+    return _load(Path(artifact_dir).resolve().as_posix(), model_file.stat().st_mtime)
+
+
+__all__ = ["SlimRiskModel", "build_inputs", "get_slim_model", "slim_artifact_dir", "MODEL_FILE", "SPEC_FILE"]
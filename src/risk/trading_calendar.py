@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 與檢查點同目錄的訓練日曆（time_idx 的對照表）；精簡推論器也會讀，因此本模組只依賴 numpy / pandas
+CALENDAR_FILE = "calendar.json"
+
+
+def calendar_time_idx(dates: Iterable, calendar: pd.DatetimeIndex) -> Tuple[np.ndarray, np.ndarray]:
+    """把一檔（已依日期排序）的日期對到訓練日曆，回傳 (time_idx, 是否保留)。
+
+    日曆上的日期為「序號 + 1」，與訓練時相同；日曆最後一天之後的日期依該檔自己的交易日
+    往後延續，早於日曆的日期往前遞減，因此結果只取決於該檔本身，與同批預測的其他標的無關。
+    落在日曆範圍內卻不在日曆上的日期（訓練時沒有這個交易日）無法對應，標記為不保留。
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    calendar = pd.DatetimeIndex(calendar)
+    pos = calendar.get_indexer(dates)
+    idx = pos.astype(np.int64) + 1
+    before = np.asarray(dates < calendar[0])
+    after = np.asarray(dates > calendar[-1])
+    idx[before] = np.arange(1 - int(before.sum()), 1)
+    idx[after] = len(calendar) + np.arange(1, int(after.sum()) + 1)
+    return idx, (pos >= 0) | before | after
+
+
+def save_calendar(calendar: Iterable, model_dir: Path) -> Path:
+    """把訓練日曆寫到檢查點資料夾（ISO 日期字串清單，原子替換）。"""
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    path = model_dir / CALENDAR_FILE
+    days = [str(d.date()) for d in pd.DatetimeIndex(calendar)]
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(days), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def load_calendar(ckpt_path: Path) -> Optional[pd.DatetimeIndex]:
+    """讀取檢查點旁的訓練日曆；舊檢查點沒有日曆時回傳 None（推論退回以輸入資料編號）。"""
+    path = Path(ckpt_path).parent / CALENDAR_FILE
+    if not path.exists():
+        return None
+    return pd.DatetimeIndex(json.loads(path.read_text(encoding="utf-8")))
+
+
+__all__ = ["calendar_time_idx", "save_calendar", "load_calendar", "CALENDAR_FILE"]
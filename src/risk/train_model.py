@@ -1,47 +1,285 @@
 from __future__ import annotations
 
+import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, List, Optional, Tuple
 
+import pandas as pd
 import torch
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
 from pytorch_forecasting import TimeSeriesDataSet
 from pytorch_forecasting.models.temporal_fusion_transformer import TemporalFusionTransformer
 from pytorch_forecasting.metrics import QuantileLoss
-from lightning.pytorch import Trainer
+from lightning.pytorch import Callback, Trainer
 
 from src.config import MODELS_DIR
+from src.risk.dataset import RiskDataConfig, prepare_dataset, prepare_multi_dataset, training_calendar
+from src.risk.registry import ModelRegistry, data_range, fingerprint
+from src.risk.trading_calendar import load_calendar, save_calendar
 
 
-def train_quantile_rnn(training: TimeSeriesDataSet, validation: TimeSeriesDataSet, symbol: str, max_epochs: int = 5) -> Path:
-    dataloaders = {
-        "train": training.to_dataloader(train=True, batch_size=64, num_workers=0),
-        "val": validation.to_dataloader(train=False, batch_size=64, num_workers=0),
-    }
+GLOBAL_MODEL_NAME = "global"
+
+# TFT 超參數預設值；會寫入模型登錄表並納入指紋
+DEFAULT_HPARAMS: Dict[str, Any] = {
+    "learning_rate": 1e-3,
+    "hidden_size": 64,
+    "attention_head_size": 2,
+    "dropout": 0.1,
+    "hidden_continuous_size": 16,
+}
 
-    model = TemporalFusionTransformer.from_dataset(
+
+def _build_tft(training: TimeSeriesDataSet, hparams: Optional[Dict[str, Any]] = None) -> TemporalFusionTransformer:
+    return TemporalFusionTransformer.from_dataset(
         training,
-        learning_rate=1e-3,
-        hidden_size=64,
-        attention_head_size=2,
-        dropout=0.1,
+        **{**DEFAULT_HPARAMS, **(hparams or {})},
         loss=QuantileLoss(quantiles=[0.05, 0.5, 0.95]),
-        hidden_continuous_size=16,
         output_size=3,  # 三個分位數
     )
 
+
+@dataclass
+class LoaderConfig:
+    """訓練資料載入設定；預設值即原本的 batch_size=64、單行程載入。
+
+    - num_workers / persistent_workers：DataLoader 子行程數，及是否跨 epoch 保留子行程
+    - torch_threads：`torch.set_num_threads`（矩陣運算的 intra-op 執行緒數），None 表示不更動
+    - precompute：先把資料集的全部樣本組成幾個大張量，各 epoch 重複使用，不再逐樣本切片
+    - precompute_max_samples：樣本數超過此值時不預先張量化（例如全域模型），改回逐批切片
+    - report：每個 epoch 結束時輸出樣本數/秒與耗時
+    """
+
+    batch_size: int = 64
+    num_workers: int = 0
+    persistent_workers: bool = False
+    torch_threads: int | None = None
+    precompute: bool = False
+    precompute_max_samples: int = 1_000_000
+    report: bool = False
+
+    @classmethod
+    def throughput(cls, batch_size: int = 512) -> "LoaderConfig":
+        """CPU 吞吐模式：樣本預先張量化，少量常駐子行程負責洗牌與組批，其餘核心給矩陣運算。"""
+        cores = os.cpu_count() or 1
+        workers = max(1, cores // 4)
+        return cls(
+            batch_size=batch_size,
+            num_workers=workers,
+            persistent_workers=True,
+            torch_threads=max(1, cores - workers),
+            precompute=True,
+            report=True,
+        )
+
+
+def _concat(parts: List[Any]) -> Any:
+    """沿批次維串接各批的同一欄位；時間維長度不同（各批只補齊到自己最長）時先在右側補零。"""
+    if parts[0] is None:
+        return None
+    if isinstance(parts[0], (list, tuple)):
+        return [_concat([p[i] for p in parts]) for i in range(len(parts[0]))]
+    if parts[0].dim() >= 2:
+        length = max(p.size(1) for p in parts)
+        parts = [torch.nn.functional.pad(p, (0, 0) * (p.dim() - 2) + (0, length - p.size(1))) for p in parts]
+    return torch.cat(parts)
+
+
+def _take(value: Any, idx: torch.Tensor, length: int | None) -> Any:
+    """取出一批樣本；`length` 不為 None 時把時間維裁到該批最長，與組批函式的補齊結果相同。"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [_take(v, idx, length) for v in value]
+    out = value[idx]
+    return out[:, :length] if length is not None and out.dim() >= 2 else out
+
+
+class _StackedSamples(Dataset):
+    """TimeSeriesDataSet 的全部樣本組成每個欄位一個大張量，每批以索引切出。
+
+    透過公開的 `to_dataloader` 依序取出全部樣本（沿用其組批函式）後串接；之後每個 epoch
+    只做索引，不再逐樣本切片與組批。資料是少數幾塊連續記憶體，DataLoader 子行程共用
+    同一份頁面，不會因上百萬個小物件的參考計數而逐頁複製。`__getitem__` 接收整批索引。
+    """
+
+    def __init__(self, dataset: TimeSeriesDataSet, chunk: int = 4096):
+        xs, ys, weights = [], [], []
+        for x, (y, weight) in dataset.to_dataloader(train=False, batch_size=chunk, num_workers=0):
+            xs.append(x)
+            ys.append(y)
+            weights.append(weight)
+        self.x = {key: _concat([x[key] for x in xs]) for key in xs[0]}
+        self.y = _concat(ys)
+        self.weight = _concat(weights)
+
+    def __len__(self) -> int:
+        return len(self.x["encoder_lengths"])
+
+    def __getitem__(self, indices: List[int]):
+        idx = torch.as_tensor(indices, dtype=torch.long)
+        enc = int(self.x["encoder_lengths"][idx].max())
+        dec = int(self.x["decoder_lengths"][idx].max())
+        x = {
+            key: _take(value, idx, enc if key.startswith("encoder_") else dec if key.startswith("decoder_") else None)
+            for key, value in self.x.items()
+        }
+        return x, (_take(self.y, idx, dec), _take(self.weight, idx, dec))
+
+
+def _make_loader(dataset: TimeSeriesDataSet, train: bool, loader: LoaderConfig) -> DataLoader:
+    workers = dict(
+        num_workers=loader.num_workers,
+        persistent_workers=loader.persistent_workers and loader.num_workers > 0,
+    )
+    if not loader.precompute or len(dataset) > loader.precompute_max_samples:
+        if loader.precompute:
+            print(f"樣本數 {len(dataset):,} 超過預先張量化上限 {loader.precompute_max_samples:,}，改為逐批切片")
+        return dataset.to_dataloader(train=train, batch_size=loader.batch_size, **workers)
+    samples = _StackedSamples(dataset)
+    # 與 `to_dataloader` 相同的洗牌 / 丟棄不足一批的規則；取樣器直接給出整批索引
+    sampler = RandomSampler(samples) if train else SequentialSampler(samples)
+    batches = BatchSampler(sampler, loader.batch_size, drop_last=train and len(samples) > loader.batch_size)
+    return DataLoader(samples, batch_size=None, sampler=batches, **workers)
+
+
+class ThroughputReport(Callback):
+    """每個訓練 epoch 結束時輸出樣本數、耗時與樣本數/秒，並保留於 `epochs`。"""
+
+    def __init__(self):
+        self.epochs: List[Dict[str, float]] = []
+        self._start = 0.0
+        self._samples = 0
+
+    def on_train_epoch_start(self, trainer, pl_module) -> None:
+        self._start = time.perf_counter()
+        self._samples = 0
+
+    def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx) -> None:
+        _, (target, _) = batch
+        self._samples += len(target[0] if isinstance(target, (list, tuple)) else target)
+
+    def on_train_epoch_end(self, trainer, pl_module) -> None:
+        seconds = time.perf_counter() - self._start
+        rate = self._samples / seconds if seconds > 0 else 0.0
+        self.epochs.append({"epoch": trainer.current_epoch, "samples": self._samples, "seconds": seconds, "samples_per_sec": rate})
+        print(f"epoch {trainer.current_epoch}：{self._samples} 樣本，{seconds:.1f}s，{rate:,.0f} 樣本/秒")
+
+
+def _fit_and_save(
+    training: TimeSeriesDataSet,
+    validation: TimeSeriesDataSet,
+    model_dir: Path,
+    max_epochs: int,
+    loader: LoaderConfig | None = None,
+    hparams: Optional[Dict[str, Any]] = None,
+) -> Tuple[Path, Optional[float]]:
+    """訓練並存檔，回傳 (檢查點路徑, 最後一個 epoch 的驗證損失)。"""
+    loader = loader or LoaderConfig()
+    if loader.torch_threads:
+        torch.set_num_threads(loader.torch_threads)
+    dataloaders = {
+        "train": _make_loader(training, True, loader),
+        "val": _make_loader(validation, False, loader),
+    }
+    model = _build_tft(training, hparams)
+
     trainer = Trainer(
         max_epochs=max_epochs,
         accelerator="cpu",
         log_every_n_steps=10,
         enable_progress_bar=True,
+        callbacks=[ThroughputReport()] if loader.report else None,
     )
     trainer.fit(model, train_dataloaders=dataloaders["train"], val_dataloaders=dataloaders["val"])
 
-    model_dir = MODELS_DIR / symbol
     model_dir.mkdir(parents=True, exist_ok=True)
     ckpt_path = model_dir / "tft_quantile.ckpt"
     trainer.save_checkpoint(ckpt_path.as_posix())
-    return ckpt_path
+    val_loss = trainer.callback_metrics.get("val_loss")
+    return ckpt_path, (float(val_loss) if val_loss is not None else None)
+
+
+def train_quantile_rnn(
+    training: TimeSeriesDataSet,
+    validation: TimeSeriesDataSet,
+    symbol: str,
+    max_epochs: int = 5,
+    loader: LoaderConfig | None = None,
+) -> Path:
+    return _fit_and_save(training, validation, MODELS_DIR / symbol, max_epochs=max_epochs, loader=loader)[0]
+
+
+def train_global_quantile_tft(
+    training: TimeSeriesDataSet,
+    validation: TimeSeriesDataSet,
+    max_epochs: int = 5,
+    batch_size: int = 256,
+    num_workers: int = 0,
+) -> Path:
+    """以 `prepare_multi_dataset` 的多標的資料集訓練單一全域模型，存於 MODELS_DIR/global。
+
+    所有標的共用一次 `Trainer.fit` 與一個檢查點；每個 epoch 的步數隨總樣本數成長，
+    但不需為每檔重建模型、重跑暖機與存檔，大批次也讓每步的矩陣運算更有效率。
+    """
+    return _fit_and_save(
+        training, validation, MODELS_DIR / GLOBAL_MODEL_NAME,
+        max_epochs=max_epochs, loader=LoaderConfig(batch_size=batch_size, num_workers=num_workers),
+    )[0]
+
+
+def train_with_registry(
+    name: str,
+    frames: Dict[str, pd.DataFrame],
+    config: RiskDataConfig | None = None,
+    hparams: Optional[Dict[str, Any]] = None,
+    max_epochs: int = 5,
+    loader: LoaderConfig | None = None,
+    force: bool = False,
+    registry: ModelRegistry | None = None,
+) -> Tuple[Path, bool]:
+    """依資料指紋訓練或沿用模型，回傳 (檢查點路徑, 是否實際訓練)。
+
+    `name` 為單檔代碼（`frames` 只含該檔）或 `GLOBAL_MODEL_NAME`（多檔全域模型）。
+    指紋涵蓋資料區間雜湊、`RiskDataConfig` 與超參數（含 epochs、批次大小；載入子行程數等不影響結果者不計）；
+    登錄表已有相同指紋且檢查點仍在時直接回傳，不再建立資料集與執行 `Trainer.fit`。
+    新檢查點存於 MODELS_DIR/<name>/<指紋前 16 碼>/，並記錄驗證損失；同資料夾另存訓練日曆
+    （calendar.json），推論時 time_idx 依此編號。
+    """
+    config = config or RiskDataConfig()
+    registry = registry or ModelRegistry()
+    loader = loader or LoaderConfig()
+    model_hparams = {**DEFAULT_HPARAMS, **(hparams or {})}
+    recorded = {**model_hparams, "max_epochs": max_epochs, "batch_size": loader.batch_size}
+    ranges = data_range(frames)
+    fp = fingerprint(name, ranges, config, recorded)
+    if not force:
+        entry = registry.find(fp)
+        if entry is not None:
+            ckpt = Path(entry["ckpt"])
+            if load_calendar(ckpt) is None:
+                # 早期的檢查點沒有日曆；指紋相同代表資料相同，可直接補寫
+                save_calendar(training_calendar(frames), ckpt.parent)
+            return ckpt, False
+
+    if name == GLOBAL_MODEL_NAME:
+        training, validation, _ = prepare_multi_dataset(frames, config)
+    else:
+        if len(frames) != 1:
+            raise ValueError("單檔模型的 frames 須只含一檔")
+        training, validation, _ = prepare_dataset(next(iter(frames.values())), name, config)
+    ckpt, val_loss = _fit_and_save(
+        training, validation, registry.checkpoint_dir(name, fp),
+        max_epochs=max_epochs, loader=loader, hparams=model_hparams,
+    )
+    save_calendar(training_calendar(frames), ckpt.parent)
+    registry.register(name, fp, ckpt, ranges, config, recorded, val_loss)
+    return ckpt, True
 
 
-__all__ = ["train_quantile_rnn"]
+__all__ = [
+    "train_quantile_rnn", "train_global_quantile_tft", "train_with_registry",
+    "LoaderConfig", "ThroughputReport", "GLOBAL_MODEL_NAME", "DEFAULT_HPARAMS",
+]
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+@dataclass
+class Job:
+    """一個背景工作：`key` 描述工作內容（相同 key 視為同一份工作）。"""
+
+    key: Hashable
+    label: str
+    future: Future
+    submitted: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        """running / done / failed / cancelled。"""
+        if not self.future.done():
+            return "running"
+        if self.future.cancelled():
+            return "cancelled"
+        return "failed" if self.future.exception() is not None else "done"
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        if not self.future.done() or self.future.cancelled():
+            return None
+        return self.future.exception()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.submitted
+
+    def result(self) -> Any:
+        return self.future.result()
+
+
+class JobRunner:
+    """背景工作執行器：I/O 或會釋放 GIL 的工作用執行緒池，純 CPU 工作可改送行程池。
+
+    - 相同 key 重複提交時直接回傳進行中或已完成的工作（失敗或取消的會重新提交）
+    - 完成的工作保留在執行器內，Streamlit 重跑腳本時可直接取回結果；
+      超過 `keep` 筆時從最早完成的開始清除
+    - 送往行程池的函式與參數須可 pickle（模組層級函式、DataFrame 等）；行程以 spawn 啟動，
+      避免從多執行緒的 Streamlit 伺服器 fork 時複製到被鎖住的鎖
+    """
+
+    def __init__(self, max_threads: int = 4, max_processes: Optional[int] = None, keep: int = 64):
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.keep = keep
+        self._jobs: "OrderedDict[Hashable, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self, process: bool):
+        if process:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.max_processes, mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="job")
+        return self._threads
+
+    def submit(
+        self,
+        key: Hashable,
+        fn: Callable[..., Any],
+        *args: Any,
+        label: str = "",
+        process: bool = False,
+        **kwargs: Any,
+    ) -> Job:
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status in ("running", "done"):
+                self._jobs.move_to_end(key)
+                return job
+            try:
+                future = self._pool(process).submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                # 子行程異常結束（例如記憶體不足被終止）後行程池不能再用，重建一次
+                self._processes = None
+                future = self._pool(process).submit(fn, *args, **kwargs)
+            job = Job(key=key, label=label or getattr(fn, "__name__", "job"), future=future)
+            future.add_done_callback(lambda _f, j=job: setattr(j, "finished", time.time()))
+            self._jobs[key] = job
+            self._prune()
+            return job
+
+    def _prune(self) -> None:
+        finished = [k for k, j in self._jobs.items() if j.future.done()]
+        for k in finished[: max(0, len(finished) - self.keep)]:
+            del self._jobs[k]
+
+    def get(self, key: Hashable) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, key: Hashable) -> bool:
+        """取消尚未開始的工作；已在執行中的無法中斷。"""
+        job = self.get(key)
+        return job.future.cancel() if job is not None else False
+
+    def forget(self, key: Hashable) -> None:
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        counts = {"running": 0, "done": 0, "failed": 0, "cancelled": 0}
+        for job in self.jobs():
+            counts[job.status] += 1
+        return counts
+
+    def shutdown(self) -> None:
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
+
+
+_default_runner: Optional[JobRunner] = None
+_default_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """行程內共用的執行器（Streamlit 重跑腳本時模組不會重載，工作與結果可跨 rerun 保留）。"""
+    global _default_runner
+    with _default_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner()
+        return _default_runner
+
+
+__all__ = ["Job", "JobRunner", "get_job_runner"]
@@ -1,15 +1,129 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 from typing import Iterable, List, Tuple, Optional
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from src.backtest.trades import annotate_trades, crossover_trades
 from src.config import OUTPUTS_DIR
+from src.indicators.engine import compute_indicators, output_columns
 
 
-def kline_with_mas(
+def chart_indicator_requests(ma_periods: Iterable[int], overlay_indicators: Iterable[str] | None = None) -> List[str]:
+    """`kline_with_mas` 需要的指標請求；呼叫端可先用同一份清單預算（或快取）指標欄位。"""
+    periods = [int(p) for p in ma_periods]
+    overlays = set(overlay_indicators or [])
+    requests = [f"ma{p}" for p in periods]
+    if "EMA" in overlays:
+        requests += [f"ema{p}" for p in periods]
+    if "BOLL" in overlays and periods:
+        requests.append(f"boll{min(periods)}")
+    if "RSI" in overlays:
+        requests.append("rsi14")
+    return requests
+
+
+# 高效能模式：K 線超過此根數時聚合為週 / 月 / 季線，折線最多保留約此點數
+FAST_MAX_BARS = 1500
+FAST_MAX_POINTS = 2000
+
+_OHLC_PERIODS = (("W", "週線"), ("M", "月線"), ("Q", "季線"), ("Y", "年線"))
+
+
+def minmax_decimate(y: np.ndarray, max_points: int = FAST_MAX_POINTS) -> np.ndarray:
+    """折線抽樣：把序列分成約 max_points/2 段，每段保留最低與最高點（加上首尾），回傳保留的索引。
+
+    與等距抽樣不同，尖峰與低谷不會被略過，縮到整段歷史時線形與原圖一致；全部以陣列運算完成。
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 2)
+    size = -(-n // buckets)
+    nan = np.isnan(y)
+    lo = np.pad(np.where(nan, np.inf, y), (0, buckets * size - n), constant_values=np.inf).reshape(buckets, size)
+    hi = np.pad(np.where(nan, -np.inf, y), (0, buckets * size - n), constant_values=-np.inf).reshape(buckets, size)
+    base = np.arange(buckets) * size
+    idx = np.concatenate([[0, n - 1], base + lo.argmin(axis=1), base + hi.argmax(axis=1)])
+    return np.unique(idx[idx < n])
+
+
+def aggregate_ohlc(df: pd.DataFrame, max_bars: int = FAST_MAX_BARS) -> Tuple[pd.DataFrame, str]:
+    """根數超過 max_bars 時把日線聚合為週 / 月 / 季 / 年線（取能放進上限的最細週期）。
+
+    回傳 (聚合後的 K 線, 週期名稱)；每根的日期為該期最後一個交易日。
+    """
+    if len(df) <= max_bars:
+        return df, "日線"
+    dates = pd.to_datetime(df["date"])
+    for freq, label in _OHLC_PERIODS:
+        key = dates.dt.to_period(freq)
+        if key.nunique() <= max_bars or freq == _OHLC_PERIODS[-1][0]:
+            break
+    agg = {"date": "last", "open": "first", "high": "max", "low": "min", "close": "last"}
+    if "volume" in df.columns:
+        agg["volume"] = "sum"
+    bars = df.assign(date=dates).groupby(key.to_numpy(), sort=True).agg(agg).reset_index(drop=True)
+    return bars, label
+
+
+def _trade_shading(fig: go.Figure, table: pd.DataFrame, fast: bool, label_y: str, drawdown: bool) -> None:
+    """交易區間陰影與盈虧 / 回撤標籤，`table` 為 `src.backtest.trades` 的交易表。
+
+    一般模式每筆交易一個 vrect 與數個 annotation；高效能模式改為少數幾條批次 trace：
+    盈 / 虧各一條以 None 分隔的填色矩形（畫在 0~1 的隱藏副軸上，等同整個高度），
+    盈虧與回撤標籤各一條純文字 trace，數百筆交易也只多出四條 trace。
+    """
+    if table.empty:
+        return
+    if not fast:
+        for row in table.itertuples(index=False):
+            pnl = row.pnl
+            fig.add_vrect(x0=row.entry_date, x1=row.exit_date,
+                          fillcolor="#C9F7CA" if pnl >= 0 else "#FAD4D4", opacity=0.12,
+                          line_width=0, layer="below")
+            fig.add_annotation(x=row.mid_date, y=float(getattr(row, label_y)), text=f"{pnl*100:.1f}%",
+                               showarrow=False, bgcolor="#ECFDF3" if pnl >= 0 else "#FDECEC",
+                               bordercolor="#2ECC71" if pnl >= 0 else "#E74C3C", borderwidth=1, opacity=0.9)
+            if drawdown:
+                fig.add_annotation(x=row.exit_date, y=float(row.min_price), text=f"DD {row.max_drawdown*100:.1f}%",
+                                   showarrow=False, bgcolor="#FFF7E6", bordercolor="#F5A623",
+                                   borderwidth=1, opacity=0.9)
+        return
+
+    pnl = table["pnl"].to_numpy(dtype=float)
+    for win, color in ((True, "#C9F7CA"), (False, "#FAD4D4")):
+        part = table[(pnl >= 0) == win]
+        if part.empty:
+            continue
+        x0, x1 = part["entry_date"].to_numpy(dtype=object), part["exit_date"].to_numpy(dtype=object)
+        gap = np.full(len(part), None, dtype=object)
+        xs = np.column_stack([x0, x0, x1, x1, x0, gap]).ravel()
+        ys = np.tile(np.array([0, 1, 1, 0, 0, None], dtype=object), len(part))
+        fig.add_trace(go.Scatter(
+            x=xs, y=ys, yaxis="y3", mode="lines", fill="toself", fillcolor=color, opacity=0.35,
+            line=dict(width=0), hoverinfo="skip", showlegend=False,
+        ))
+    fig.update_layout(yaxis3=dict(overlaying="y", range=[0, 1], visible=False, fixedrange=True))
+    fig.add_trace(go.Scattergl(
+        x=table["mid_date"], y=table[label_y], mode="text",
+        text=[f"{v*100:.1f}%" for v in pnl], textfont=dict(color=np.where(pnl >= 0, "#2ECC71", "#E74C3C").tolist()),
+        name="盈虧", hovertemplate="盈虧 %{text}<extra></extra>",
+    ))
+    if drawdown:
+        fig.add_trace(go.Scattergl(
+            x=table["exit_date"], y=table["min_price"], mode="text",
+            text=[f"DD {v*100:.1f}%" for v in table["max_drawdown"]], textfont=dict(color="#F5A623"),
+            name="區間回撤", hovertemplate="%{text}<extra></extra>",
+        ))
+
+
+def kline_figure(
     df: pd.DataFrame,
     symbol: str,
     ma_periods: Iterable[int] = (20, 60, 120),
@@ -18,47 +132,62 @@ def kline_with_mas(
     show_trade_pnl: bool = True,
     overlay_indicators: Iterable[str] | None = None,
     trades_df: Optional[pd.DataFrame] = None,
-) -> Path:
+    fast: bool = False,
+) -> go.Figure:
+    """建立 K 線 + 均線互動圖（不寫檔），參數同 `kline_with_mas`。
+
+    `fast=True` 為長歷史用的高效能模式：折線改用 WebGL（Scattergl）並以 `minmax_decimate` 抽樣，
+    K 線超過 `FAST_MAX_BARS` 根時聚合為週 / 月線，交易陰影與標籤改為批次 trace。
+    指標仍在完整日線上計算，聚合與抽樣只影響顯示。
+    """
     df = df.copy().sort_values("date")
-    for p in ma_periods:
-        df[f"ma{p}"] = df["close"].rolling(p).mean()
+    # 呼叫端可預先提供指標欄位（例如來自快取），此處僅以計算圖一次補算缺少的
+    ma_periods = [int(p) for p in ma_periods]
+    missing = [r for r in chart_indicator_requests(ma_periods, overlay_indicators)
+               if not all(c in df.columns for c in output_columns(r))]
+    if missing:
+        ind = compute_indicators(df, missing)
+        for col in ind.columns:
+            df[col] = ind[col]
+
+    Line = go.Scattergl if fast else go.Scatter
+
+    def line_xy(col: str) -> Tuple[pd.Series, pd.Series]:
+        if not fast:
+            return df["date"], df[col]
+        keep = minmax_decimate(df[col].to_numpy(dtype=float))
+        return df["date"].iloc[keep], df[col].iloc[keep]
 
     fig = go.Figure()
+    bars, unit = aggregate_ohlc(df) if fast else (df, "日線")
     fig.add_trace(
         go.Candlestick(
-            x=df["date"], open=df["open"], high=df["high"], low=df["low"], close=df["close"],
-            name="K線"
+            x=bars["date"], open=bars["open"], high=bars["high"], low=bars["low"], close=bars["close"],
+            name="K線" if unit == "日線" else f"K線（{unit}）"
         )
     )
     for p in ma_periods:
+        x, y = line_xy(f"ma{p}")
         fig.add_trace(
-            go.Scatter(x=df["date"], y=df[f"ma{p}"], name=f"MA{p}")
+            Line(x=x, y=y, name=f"MA{p}")
         )
 
     # 額外疊加指標
     overlays = set((overlay_indicators or []))
     if "EMA" in overlays:
-        import pandas as pd
         for p in ma_periods:
-            df[f"ema{p}"] = df["close"].ewm(span=p, adjust=False).mean()
-            fig.add_trace(go.Scatter(x=df["date"], y=df[f"ema{p}"], name=f"EMA{p}", line=dict(dash="dot")))
+            x, y = line_xy(f"ema{p}")
+            fig.add_trace(Line(x=x, y=y, name=f"EMA{p}", line=dict(dash="dot")))
     if "BOLL" in overlays:
-        import pandas as pd
-        p = min(list(ma_periods))
-        ma = df["close"].rolling(p).mean()
-        std = df["close"].rolling(p).std()
-        upper = ma + 2 * std
-        lower = ma - 2 * std
-        fig.add_trace(go.Scatter(x=df["date"], y=upper, name=f"BOLL上軌", line=dict(color="#888")))
-        fig.add_trace(go.Scatter(x=df["date"], y=lower, name=f"BOLL下軌", line=dict(color="#888")))
+        p = min(ma_periods)
+        x, upper = line_xy(f"boll{p}_upper")
+        fig.add_trace(Line(x=x, y=upper, name=f"BOLL上軌", line=dict(color="#888")))
+        x, lower = line_xy(f"boll{p}_lower")
+        fig.add_trace(Line(x=x, y=lower, name=f"BOLL下軌", line=dict(color="#888")))
     if "RSI" in overlays:
         # 在副圖用 RSI
-        delta = df["close"].diff()
-        gain = (delta.clip(lower=0)).rolling(14).mean()
-        loss = (-delta.clip(upper=0)).rolling(14).mean()
-        rs = gain / loss.replace(0, 1e-9)
-        rsi = 100 - 100 / (1 + rs)
-        fig.add_trace(go.Scatter(x=df["date"], y=rsi, name="RSI(14)", yaxis="y2"))
+        x, y = line_xy("rsi14")
+        fig.add_trace(Line(x=x, y=y, name="RSI(14)", yaxis="y2"))
         fig.update_layout(yaxis2=dict(overlaying="y", side="right", range=[0,100], showgrid=False, title="RSI"))
 
     # 交易標註：優先使用 CSV 交易日誌，否則回退為均線交叉
@@ -70,24 +199,16 @@ def kline_with_mas(
         dmin, dmax = df['date'].min(), df['date'].max()
         tdf = tdf[(tdf['entry_date'] >= dmin) & (tdf['entry_date'] <= dmax)]
         # 買賣點
-        fig.add_trace(go.Scatter(
+        fig.add_trace(Line(
             x=tdf['entry_date'], y=tdf['entry_price'], mode='markers+text',
             marker=dict(symbol='triangle-up', color='#2ecc71', size=12),
             text=['買' for _ in range(len(tdf))], textposition='top center', name='買進'))
-        fig.add_trace(go.Scatter(
+        fig.add_trace(Line(
             x=tdf['exit_date'], y=tdf['exit_price'], mode='markers+text',
             marker=dict(symbol='triangle-down', color='#e74c3c', size=12),
             text=['賣' for _ in range(len(tdf))], textposition='bottom center', name='賣出'))
         # 陰影與盈虧/回撤
-        for _, row in tdf.iterrows():
-            pnl = float(row.get('pnl', 0.0))
-            fig.add_vrect(x0=row['entry_date'], x1=row['exit_date'],
-                          fillcolor='#C9F7CA' if pnl >= 0 else '#FAD4D4', opacity=0.12,
-                          line_width=0, layer='below')
-            mid = row['entry_date'] + (row['exit_date'] - row['entry_date'])/2
-            fig.add_annotation(x=mid, y=float(row['exit_price']), text=f"{pnl*100:.1f}%",
-                               showarrow=False, bgcolor='#ECFDF3' if pnl>=0 else '#FDECEC',
-                               bordercolor='#2ECC71' if pnl>=0 else '#E74C3C', borderwidth=1, opacity=0.9)
+        _trade_shading(fig, annotate_trades(df, tdf), fast, label_y="exit_price", drawdown=False)
     elif len(list(ma_periods)) >= 2:
         mas = sorted(list(ma_periods))
         short, long = mas[0], mas[-1]
@@ -97,13 +218,13 @@ def kline_with_mas(
         cross_dn = (s.shift(1) >= l.shift(1)) & (s < l)
         up_points = df.loc[cross_up, ["date", f"ma{short}"]]
         dn_points = df.loc[cross_dn, ["date", f"ma{short}"]]
-        fig.add_trace(go.Scatter(
+        fig.add_trace(Line(
             x=up_points["date"], y=up_points[f"ma{short}"],
             mode="markers", marker=dict(color="green", size=8, symbol="triangle-up"),
             name="黃金交叉",
             hovertemplate="日期=%{x}<br>短均線上穿長均線：可能趨勢轉強<extra></extra>",
         ))
-        fig.add_trace(go.Scatter(
+        fig.add_trace(Line(
             x=dn_points["date"], y=dn_points[f"ma{short}"],
             mode="markers", marker=dict(color="red", size=8, symbol="triangle-down"),
             name="死亡交叉",
@@ -114,14 +235,14 @@ def kline_with_mas(
             # 在收盤價上標註買賣箭頭
             buy_pts = df.loc[cross_up, ["date", "close"]]
             sell_pts = df.loc[cross_dn, ["date", "close"]]
-            fig.add_trace(go.Scatter(
+            fig.add_trace(Line(
                 x=buy_pts["date"], y=buy_pts["close"], mode="markers+text",
                 marker=dict(symbol="triangle-up", color="#2ecc71", size=12),
                 text=["買" for _ in range(len(buy_pts))], textposition="top center",
                 name="買進",
                 hovertemplate="買進 @ %{y:.2f}<extra></extra>",
             ))
-            fig.add_trace(go.Scatter(
+            fig.add_trace(Line(
                 x=sell_pts["date"], y=sell_pts["close"], mode="markers+text",
                 marker=dict(symbol="triangle-down", color="#e74c3c", size=12),
                 text=["賣" for _ in range(len(sell_pts))], textposition="bottom center",
@@ -130,42 +251,9 @@ def kline_with_mas(
             ))
 
         if show_trade_pnl:
-            # 計算每筆多頭交易的盈虧，並在區間中點標註百分比
-            entry_idx = None
-            for i in range(len(df)):
-                if cross_up.iloc[i] and entry_idx is None:
-                    entry_idx = i
-                elif cross_dn.iloc[i] and entry_idx is not None:
-                    seg = df.iloc[entry_idx:i + 1]
-                    entry_price = float(seg.iloc[0]["close"])
-                    exit_price = float(seg.iloc[-1]["close"])
-                    pnl = (exit_price / max(1e-9, entry_price)) - 1.0
-                    mid = seg.iloc[len(seg) // 2]
-                    # 期間陰影帶
-                    fig.add_vrect(
-                        x0=seg.iloc[0]["date"], x1=seg.iloc[-1]["date"],
-                        fillcolor="#C9F7CA" if pnl >= 0 else "#FAD4D4",
-                        opacity=0.12, line_width=0, layer="below",
-                    )
-                    fig.add_annotation(
-                        x=mid["date"], y=float(seg["close"].median()),
-                        text=f"{pnl*100:.1f}%",
-                        showarrow=False,
-                        bgcolor="#ECFDF3" if pnl >= 0 else "#FDECEC",
-                        bordercolor="#2ECC71" if pnl >= 0 else "#E74C3C",
-                        borderwidth=1,
-                        opacity=0.9,
-                    )
-                    # 區間最大回撤
-                    cummax = seg["close"].cummax()
-                    dd = (seg["close"] / cummax - 1.0).min()
-                    fig.add_annotation(
-                        x=seg.iloc[-1]["date"], y=float(seg["close"].min()),
-                        text=f"DD {dd*100:.1f}%",
-                        showarrow=False, bgcolor="#FFF7E6", bordercolor="#F5A623",
-                        borderwidth=1, opacity=0.9,
-                    )
-                    entry_idx = None
+            # 每筆多頭交易的盈虧（區間中點標註百分比）與區間最大回撤，以陣列運算一次算完
+            table = crossover_trades(df, cross_up.to_numpy(), cross_dn.to_numpy())
+            _trade_shading(fig, table, fast, label_y="median_price", drawdown=True)
 
     fig.update_layout(
         title=f"{symbol} K線與均線",
@@ -199,9 +287,148 @@ def kline_with_mas(
             bgcolor="#F9F9F9", opacity=0.9,
         )
 
-    out_path = OUTPUTS_DIR / f"chart_{symbol}.html"
-    fig.write_html(out_path)
+    return fig
+
+
+def add_replay_frames(fig: go.Figure, df: pd.DataFrame, steps: int = 100, min_bars: int = 30, fps: int = 10) -> go.Figure:
+    """在圖上加入交易回放：`steps + 1` 個影格，第 k 格只顯示前 k/steps 的期間。
+
+    指標與交易標註已在整段歷史上算好（前綴的指標等於全段指標的前綴），影格只改變
+    x/y 軸範圍，不重送資料；播放與拖動滑桿都在瀏覽器端完成，可達每秒數十格。
+    """
+    data = df.sort_values("date")
+    dates = pd.to_datetime(data["date"]).to_numpy()
+    n = len(dates)
+    if n == 0:
+        return fig
+    # 累積最低/最高價：前綴視窗的 y 範圍只需查表
+    low = data["low"].astype(float).cummin().to_numpy()
+    high = data["high"].astype(float).cummax().to_numpy()
+    frames, slider_steps = [], []
+    for k in range(steps + 1):
+        cut = n if k == steps else min(n, max(min_bars, int(n * k / steps), 1))
+        lo, hi = low[cut - 1], high[cut - 1]
+        pad = (hi - lo) * 0.05 or abs(hi) * 0.01 or 1.0
+        name = str(k)
+        frames.append(go.Frame(name=name, layout=dict(
+            xaxis=dict(range=[dates[0], dates[cut - 1]]),
+            yaxis=dict(range=[lo - pad, hi + pad]),
+        )))
+        slider_steps.append(dict(
+            label=str(pd.Timestamp(dates[cut - 1]).date()), method="animate",
+            args=[[name], dict(mode="immediate", frame=dict(duration=0, redraw=False), transition=dict(duration=0))],
+        ))
+    fig.frames = frames
+    fig.update_layout(
+        sliders=[dict(active=steps, steps=slider_steps, currentvalue=dict(prefix="回放至："), pad=dict(t=50))],
+        updatemenus=[dict(
+            type="buttons", direction="left", showactive=False, x=0, y=0, xanchor="left", yanchor="top", pad=dict(t=50, r=10),
+            buttons=[
+                dict(label="▶ 播放", method="animate", args=[None, dict(
+                    frame=dict(duration=int(1000 / max(1, fps)), redraw=False), fromcurrent=True, transition=dict(duration=0),
+                )]),
+                dict(label="⏸ 暫停", method="animate", args=[[None], dict(
+                    mode="immediate", frame=dict(duration=0, redraw=False), transition=dict(duration=0),
+                )]),
+            ],
+        )],
+    )
+    return fig
+
+
+def replay_at(fig: go.Figure, position: int, fps: Optional[int] = None) -> dict:
+    """回傳停在第 `position` 格的圖（dict，可直接交給 st.plotly_chart）；不改動原圖、不重算。"""
+    spec = fig.to_dict()
+    frames = spec.get("frames") or []
+    if not frames:
+        return spec
+    k = max(0, min(int(position), len(frames) - 1))
+    layout = spec["layout"]
+    layout.setdefault("xaxis", {})["range"] = frames[k]["layout"]["xaxis"]["range"]
+    layout.setdefault("yaxis", {})["range"] = frames[k]["layout"]["yaxis"]["range"]
+    layout["sliders"][0]["active"] = k
+    if fps:
+        layout["updatemenus"][0]["buttons"][0]["args"][1]["frame"]["duration"] = int(1000 / max(1, fps))
+    return spec
+
+
+def plotlyjs_asset(out_dir: Path | None = None) -> str:
+    """確保 `out_dir/assets/plotly-<版本>.min.js` 存在（只寫一次），回傳 HTML 內引用的相對路徑。
+
+    檔名帶版本，升級 plotly 後舊圖仍引用舊檔、新圖引用新檔，不會混用。
+    """
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    rel = f"assets/plotly-{plotly.__version__}.min.js"
+    path = (out_dir or OUTPUTS_DIR) / rel
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_text(get_plotlyjs(), encoding="utf-8")
+        os.replace(tmp, path)  # 多個行程同時產圖時不會讀到寫一半的檔
+    return rel
+
+
+def write_chart(
+    fig: go.Figure,
+    symbol: str,
+    fmt: str = "html",
+    plotlyjs: str = "shared",
+    out_dir: Path | None = None,
+) -> Path:
+    """把圖寫到 `out_dir`（預設 OUTPUTS_DIR）的 `chart_<代碼>.html` 或 `.json`。
+
+    - fmt="html"：plotlyjs="shared"（預設）引用 `plotlyjs_asset` 的共用檔，每張圖只含圖表資料；
+      "embed" 把數 MB 的 plotly.js 內嵌進檔案（可單獨搬移）；"cdn" 從網路載入
+    - fmt="json"：只輸出圖表 JSON（`plotly.io.read_json` 或前端 Plotly.newPlot 可直接讀）
+    """
+    out_dir = out_dir or OUTPUTS_DIR
+    if fmt == "json":
+        out_path = out_dir / f"chart_{symbol}.json"
+        out_path.write_text(fig.to_json(), encoding="utf-8")
+        return out_path
+    if fmt != "html":
+        raise ValueError(f"未知的輸出格式：{fmt}（可用 html / json）")
+    modes = {"embed": True, "cdn": "cdn"}
+    if plotlyjs == "shared":
+        include = plotlyjs_asset(out_dir)
+    elif plotlyjs in modes:
+        include = modes[plotlyjs]
+    else:
+        raise ValueError(f"未知的 plotly.js 模式：{plotlyjs}（可用 shared / embed / cdn）")
+    out_path = out_dir / f"chart_{symbol}.html"
+    fig.write_html(out_path, include_plotlyjs=include)
     return out_path
 
 
-__all__ = ["kline_with_mas"]
+def kline_with_mas(
+    df: pd.DataFrame,
+    symbol: str,
+    ma_periods: Iterable[int] = (20, 60, 120),
+    explain: bool = False,
+    show_signals: bool = True,
+    show_trade_pnl: bool = True,
+    overlay_indicators: Iterable[str] | None = None,
+    trades_df: Optional[pd.DataFrame] = None,
+    replay: bool = False,
+    fast: bool = False,
+    fmt: str = "html",
+    plotlyjs: str = "shared",
+) -> Path:
+    """輸出 K 線 + 均線互動圖 HTML；`replay=True` 時附上瀏覽器端的交易回放影格與播放鈕，
+    `fast=True` 為長歷史用的高效能模式（見 `kline_figure`），`fmt` / `plotlyjs` 見 `write_chart`。"""
+    fig = kline_figure(
+        df, symbol, ma_periods=ma_periods, explain=explain, show_signals=show_signals,
+        show_trade_pnl=show_trade_pnl, overlay_indicators=overlay_indicators, trades_df=trades_df, fast=fast,
+    )
+    if replay:
+        add_replay_frames(fig, df)
+    return write_chart(fig, symbol, fmt=fmt, plotlyjs=plotlyjs)
+
+
+__all__ = [
+    "kline_with_mas", "kline_figure", "add_replay_frames", "replay_at", "write_chart", "plotlyjs_asset",
+    "chart_indicator_requests",
+    "minmax_decimate", "aggregate_ohlc", "FAST_MAX_BARS", "FAST_MAX_POINTS",
+]
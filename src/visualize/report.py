@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from tqdm import tqdm
+
+from src.backtest.run_backtest import run_backtest_from_dataframe
+from src.backtest.trades import annotate_trades, trade_summary
+from src.config import OUTPUTS_DIR, ensure_directories
+from src.data.fetch_hk_data import load_cached
+from src.utils.symbols import normalize_hk_symbol
+from src.visualize.plot import kline_with_mas, plotlyjs_asset
+
+
+REPORTS_DIR = OUTPUTS_DIR / "reports"
+
+
+@dataclass
+class ReportResult:
+    symbol: str
+    ok: bool
+    bars: int = 0
+    sharpe: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    ann_vol: Optional[float] = None
+    trades: int = 0
+    win_rate: Optional[float] = None
+    backtest_png: Optional[Path] = None
+    chart: Optional[Path] = None
+    error: str = ""
+    seconds: float = 0.0
+
+
+def _report_one(
+    symbol: str,
+    df: pd.DataFrame,
+    backtest: Dict[str, Any],
+    chart: Dict[str, Any],
+) -> ReportResult:
+    """子行程入口：單檔回測（含風險面板與資金曲線 PNG）後，以回測交易記錄畫互動圖。"""
+    t0 = time.perf_counter()
+    try:
+        png = run_backtest_from_dataframe(df, symbol, **backtest)
+        panel = pd.read_csv(OUTPUTS_DIR / f"risk_panel_{symbol}.csv").iloc[0]
+        trades_df = pd.read_csv(OUTPUTS_DIR / f"trades_{symbol}.csv")
+        stats = trade_summary(annotate_trades(df, trades_df)) or {}
+        out = kline_with_mas(df, symbol, trades_df=trades_df, **chart)
+        return ReportResult(
+            symbol, True, bars=len(df),
+            sharpe=float(panel["sharpe"]), max_drawdown=float(panel["max_drawdown"]), ann_vol=float(panel["ann_vol"]),
+            trades=int(stats.get("count", 0)), win_rate=stats.get("win_rate"),
+            backtest_png=png, chart=out, seconds=time.perf_counter() - t0,
+        )
+    except Exception as exc:
+        return ReportResult(symbol, False, bars=len(df), error=f"{type(exc).__name__}: {exc}",
+                            seconds=time.perf_counter() - t0)
+
+
+def write_report_index(results: List[ReportResult], run_dir: Path) -> Tuple[Path, Path]:
+    """輸出本次的索引：index.csv（每檔一列）與可點選連結的 index.html。"""
+    run_dir.mkdir(parents=True, exist_ok=True)
+    rows = []
+    for r in results:
+        row = asdict(r)
+        for key in ("backtest_png", "chart"):
+            row[key] = Path(os.path.relpath(row[key], run_dir)).as_posix() if row[key] is not None else ""
+        rows.append(row)
+    table = pd.DataFrame(rows)
+    csv_path = run_dir / "index.csv"
+    table.to_csv(csv_path, index=False)
+
+    html = table.copy()
+    for key, label in (("backtest_png", "資金曲線"), ("chart", "互動圖")):
+        html[key] = [f'<a href="{p}">{label}</a>' if p else "" for p in html[key]]
+    html_path = run_dir / "index.html"
+    html_path.write_text(
+        "<html><head><meta charset='utf-8'><title>回測報告索引</title></head><body>"
+        f"<h2>回測報告索引（{len(results)} 檔）</h2>"
+        + html.to_html(index=False, escape=False, float_format=lambda v: f"{v:.4f}")
+        + "</body></html>",
+        encoding="utf-8",
+    )
+    return csv_path, html_path
+
+
+def generate_reports(
+    symbols: Iterable[str],
+    workers: Optional[int] = None,
+    fast: int = 10,
+    slow: int = 30,
+    commission: float = 0.001,
+    slippage_bps: int = 0,
+    risk_pct: float = 0.1,
+    engine: str = "vectorized",
+    use_cache: bool = True,
+    ma_periods: Iterable[int] = (20, 60, 120),
+    fast_chart: bool = True,
+    run_dir: Optional[Path] = None,
+) -> Tuple[List[ReportResult], Path]:
+    """多檔報告：主行程一次讀入全部日線，再以行程池平行產生各檔的回測、風險面板、
+    資金曲線 PNG 與互動圖，最後寫出本次的索引（預設 OUTPUTS_DIR/reports/<時間>/index.html）。
+
+    各檔輸出沿用單檔指令的檔名（backtest_<代碼>.png、chart_<代碼>.html…），回測結果快取照常生效；
+    子行程只 import 一次繪圖與回測套件，之後每檔只付計算成本。單檔失敗（含找不到本地資料）不影響其他標的，也會列入索引；
+    `workers=1` 時於本行程依序執行，方便除錯。回傳 (依輸入順序的結果, index.html 路徑)。
+    """
+    ensure_directories()
+    frames: Dict[str, pd.DataFrame] = {}
+    results: Dict[str, ReportResult] = {}
+    order: List[str] = []
+    for raw in symbols:
+        symbol = normalize_hk_symbol(raw)
+        if symbol in order:
+            continue
+        order.append(symbol)
+        try:
+            frames[symbol] = load_cached(symbol)
+        except FileNotFoundError:
+            print(f"略過 {symbol}：找不到本地資料，請先下載")
+            results[symbol] = ReportResult(symbol, False, error="找不到本地資料")
+    plotlyjs_asset()  # 共用的 plotly.js 先寫好，子行程不必各自檢查
+    backtest = dict(fast=fast, slow=slow, commission=commission, slippage_bps=slippage_bps,
+                    risk_pct=risk_pct, engine=engine, use_cache=use_cache)
+    chart = dict(ma_periods=[int(p) for p in ma_periods], fast=fast_chart)
+
+    progress = tqdm(total=len(frames), desc="報告", unit="檔")
+    if workers == 1:
+        for symbol, df in frames.items():
+            results[symbol] = _report_one(symbol, df, backtest, chart)
+            progress.update(1)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_report_one, s, df, backtest, chart): s for s, df in frames.items()}
+            for fut in as_completed(futures):
+                results[futures[fut]] = fut.result()
+                progress.update(1)
+    progress.close()
+
+    ordered = [results[s] for s in order]
+    run_dir = run_dir or REPORTS_DIR / time.strftime("%Y%m%d-%H%M%S")
+    _, html_path = write_report_index(ordered, run_dir)
+    return ordered, html_path
+
+
+__all__ = ["generate_reports", "write_report_index", "ReportResult", "REPORTS_DIR"]
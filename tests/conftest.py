@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 專案未打包安裝：讓測試可直接 import src.*
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def isolated_data(tmp_path, monkeypatch):
+    """CSV 與欄式資料庫都寫到暫存目錄，回測快取失效也指向暫存目錄。"""
+    import src.backtest.result_cache as cache_mod
+    import src.data.fetch_bulk as bulk_mod
+    import src.data.fetch_hk_data as fetch_mod
+    import src.data.store as store_mod
+
+    monkeypatch.setattr(fetch_mod, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(fetch_mod, "ensure_directories", lambda: None)
+    monkeypatch.setattr(bulk_mod, "ensure_directories", lambda: None)
+    monkeypatch.setattr(store_mod, "_default_store", store_mod.PriceStore(tmp_path / "store"))
+    monkeypatch.setattr(cache_mod, "_default_cache", cache_mod.BacktestResultCache(tmp_path / "cache"))
+    return tmp_path
@@ -0,0 +1,121 @@
+"""批次下載：以本地 HTTP 替身伺服器模擬 Yahoo chart API，檢查重試、快速失敗與結果順序。"""
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from src.data.fetch_bulk import FetchResult, fetch_hk_daily_bulk
+from src.data.fetch_hk_data import YahooChartProvider, load_cached
+
+pytestmark = pytest.mark.usefixtures("isolated_data")
+
+# 暫時性錯誤：依序回傳這些狀態碼，用完之後回 200
+TRANSIENT = {"0001.HK": [429, 429], "0002.HK": [503]}
+# 持續性錯誤：每次都回同一個狀態碼（404 代碼不存在、500 伺服器一直故障）
+ALWAYS = {"0003.HK": 404, "0004.HK": 500}
+
+
+def _chart_payload(start: int, end: int) -> dict:
+    dates = pd.bdate_range(pd.Timestamp(start, unit="s"), pd.Timestamp(end, unit="s") - pd.Timedelta(days=1))
+    # 港股開盤 09:30（UTC+8），gmtoffset 還原後仍落在同一天
+    stamps = [int(d.timestamp()) + 90 * 60 for d in dates]
+    close = [100.0 + i for i in range(len(dates))]
+    return {"chart": {"result": [{
+        "meta": {"gmtoffset": 8 * 3600},
+        "timestamp": stamps,
+        "indicators": {
+            "quote": [{"open": close, "high": [c + 1 for c in close], "low": [c - 1 for c in close],
+                       "close": close, "volume": [1000.0] * len(close)}],
+            "adjclose": [{"adjclose": close}],
+        },
+    }], "error": None}}
+
+
+@pytest.fixture
+def chart_server():
+    hits: Counter = Counter()
+    pending = {k: list(v) for k, v in TRANSIENT.items()}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            symbol = url.path.rsplit("/", 1)[-1]
+            with lock:
+                hits[symbol] += 1
+                queue = pending.get(symbol)
+                status = ALWAYS.get(symbol) or (queue.pop(0) if queue else 200)
+            if status != 200:
+                self.send_error(status)
+                return
+            qs = parse_qs(url.query)
+            body = json.dumps(_chart_payload(int(qs["period1"][0]), int(qs["period2"][0]))).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", hits
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _bulk(base_url: str, symbols, retries: int = 3):
+    return fetch_hk_daily_bulk(
+        symbols, start="2024-01-01", end="2024-02-01", workers=4, rate=1000, retries=retries, backoff=0.001,
+        provider=YahooChartProvider(base_url=base_url),
+    )
+
+
+def test_results_keep_input_order(chart_server):
+    base_url, _ = chart_server
+    results = _bulk(base_url, ["5", "0004.HK", "1", "3", "0002.hk"], retries=2)
+    assert [r.symbol for r in results] == ["0005.HK", "0004.HK", "0001.HK", "0003.HK", "0002.HK"]
+    assert all(isinstance(r, FetchResult) and r.seconds >= 0 for r in results)
+
+
+def test_retryable_errors_are_retried(chart_server):
+    base_url, hits = chart_server
+    by_symbol = {r.symbol: r for r in _bulk(base_url, ["0001.HK", "0002.HK", "0005.HK"])}
+
+    assert by_symbol["0001.HK"].ok and by_symbol["0001.HK"].attempts == 3  # 429、429、200
+    assert by_symbol["0002.HK"].ok and by_symbol["0002.HK"].attempts == 2  # 503、200
+    assert by_symbol["0005.HK"].ok and by_symbol["0005.HK"].attempts == 1
+    assert hits == Counter({"0001.HK": 3, "0002.HK": 2, "0005.HK": 1})
+    for sym, res in by_symbol.items():
+        assert res.path is not None and res.path.exists() and not res.error
+        stored = load_cached(sym)
+        assert stored["date"].iloc[0] == pd.Timestamp("2024-01-01")
+        assert stored["date"].iloc[-1] == pd.Timestamp("2024-01-31")
+
+
+def test_client_error_fails_fast_and_persistent_5xx_gives_up(chart_server):
+    base_url, hits = chart_server
+    by_symbol = {r.symbol: r for r in _bulk(base_url, ["0003.HK", "0004.HK", "0005.HK"], retries=2)}
+
+    missing = by_symbol["0003.HK"]
+    assert not missing.ok and missing.path is None
+    assert missing.attempts == 1 and hits["0003.HK"] == 1
+    assert "HTTPError" in missing.error and "404" in missing.error
+
+    down = by_symbol["0004.HK"]
+    assert not down.ok and down.attempts == 3 and hits["0004.HK"] == 3  # 首次 + 重試 2 次
+    assert "500" in down.error
+
+    # 單檔失敗不影響其他標的
+    assert by_symbol["0005.HK"].ok
@@ -0,0 +1,108 @@
+"""增量下載：只請求缺少的區段、還原價修正時整段重抓、資料未變時不產生新版本、最後一根視為暫定。"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import src.data.store as store_mod
+from src.data.fetch_hk_data import FrameProvider, fetch_hk_daily, get_ledger, load_cached
+
+SYMBOL = "0005.HK"
+T = pd.Timestamp
+
+pytestmark = pytest.mark.usefixtures("isolated_data")
+
+
+def _frame(start: str = "2020-01-01", end: str = "2020-06-30", scale: float = 1.0) -> pd.DataFrame:
+    dates = pd.bdate_range(start, end)
+    close = (100 + np.arange(len(dates), dtype=float)) * scale
+    return pd.DataFrame({
+        "date": dates, "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1000.0,
+    })
+
+
+def _calls(provider: FrameProvider):
+    return [(a, b) for _, a, b in provider.calls]
+
+
+def test_first_fetch_requests_whole_range():
+    provider = FrameProvider({SYMBOL: _frame()})
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+    assert _calls(provider) == [(T("2020-01-01"), T("2020-04-01"))]
+    stored = load_cached(SYMBOL)
+    assert stored["date"].iloc[-1] == T("2020-03-31")
+    # 最後一根（3/31）不計入帳本
+    assert get_ledger(SYMBOL) == [(T("2020-01-01"), T("2020-03-31"))]
+
+
+def test_tail_only_request():
+    provider = FrameProvider({SYMBOL: _frame()})
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+    provider.calls.clear()
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-05-01", provider=provider)
+    # 只請求尾端，並往前延伸 lookback 天比對還原價
+    assert _calls(provider) == [(T("2020-03-21"), T("2020-05-01"))]
+    assert load_cached(SYMBOL)["date"].iloc[-1] == T("2020-04-30")
+
+
+def test_gap_only_request():
+    provider = FrameProvider({SYMBOL: _frame()})
+    fetch_hk_daily(SYMBOL, start="2020-03-01", end="2020-04-01", provider=provider)
+    provider.calls.clear()
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+    # 前段缺口 + 暫定的最後一根（含 lookback）；已下載的 3/1 ~ 3/21 不再請求
+    assert _calls(provider) == [(T("2020-01-01"), T("2020-03-01")), (T("2020-03-21"), T("2020-04-01"))]
+    stored = load_cached(SYMBOL)
+    expected = _frame(end="2020-03-31")
+    assert stored["date"].tolist() == expected["date"].tolist()
+    assert np.array_equal(stored["close"].to_numpy(), expected["close"].to_numpy())
+
+
+def test_restatement_triggers_full_refetch():
+    provider = FrameProvider({SYMBOL: _frame()})
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+    # 除權息：整段還原價下修
+    provider.frames[SYMBOL] = _frame(scale=0.9)
+    provider.calls.clear()
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-05-01", provider=provider)
+    assert _calls(provider) == [(T("2020-03-21"), T("2020-05-01")), (T("2020-01-01"), T("2020-05-01"))]
+    stored = load_cached(SYMBOL)
+    assert np.allclose(stored["close"].to_numpy(), _frame(end="2020-04-30", scale=0.9)["close"].to_numpy())
+
+
+def test_unchanged_refresh_keeps_store_version():
+    provider = FrameProvider({SYMBOL: _frame()})
+    path = fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+    store = store_mod.get_store()
+    version, mtime = store.info(SYMBOL)["version"], path.stat().st_mtime_ns
+    provider.calls.clear()
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+    assert len(provider.calls) == 1  # 仍會重抓暫定的最後一根
+    assert store.info(SYMBOL)["version"] == version
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_partial_bar_is_replaced_without_full_refetch():
+    final = _frame(end="2020-04-01")
+    intraday = final[final["date"] <= T("2020-03-31")].copy()
+    intraday.loc[intraday.index[-1], ["close", "high"]] = [150.0, 151.0]  # 3/31 盤中
+    provider = FrameProvider({SYMBOL: intraday})
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+
+    # 同一天再按一次：暫定的一根會重抓並更新
+    intraday.loc[intraday.index[-1], "close"] = 151.0
+    provider.frames[SYMBOL] = intraday
+    provider.calls.clear()
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-01", provider=provider)
+    assert len(provider.calls) == 1
+    assert load_cached(SYMBOL)["close"].iloc[-1] == 151.0
+
+    # 隔天：3/31 收盤值與盤中不同，但不視為還原價修正，不整段重抓
+    provider.frames[SYMBOL] = final
+    provider.calls.clear()
+    fetch_hk_daily(SYMBOL, start="2020-01-01", end="2020-04-02", provider=provider)
+    assert _calls(provider) == [(T("2020-03-21"), T("2020-04-02"))]
+    stored = load_cached(SYMBOL).set_index("date")["close"]
+    assert stored[T("2020-03-31")] == final.set_index("date")["close"][T("2020-03-31")]
+    assert stored.index[-1] == T("2020-04-01")
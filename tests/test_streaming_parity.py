@@ -0,0 +1,121 @@
+"""串流指標與批次計算的一致性：逐根更新的結果需與 pandas / 向量化引擎逐位元相同。"""
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest.vectorized import sma_crossover
+from src.indicators.engine import compute_indicators
+from src.indicators.streaming import StreamingIndicator, make_streaming
+
+
+def _close(seed: int, n: int = 600, tick: float | None = None, flat: tuple[int, int] | None = None) -> np.ndarray:
+    """隨機漫步收盤價；`tick` 四捨五入到最小跳動（製造相同值與平手），`flat` 區段價格不變。"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    if tick is not None:
+        close = np.round(close / tick) * tick
+    if flat is not None:
+        close[flat[0]:flat[1]] = close[flat[0]]
+    return close
+
+
+def _stream(request: str, close: np.ndarray) -> np.ndarray:
+    ind = make_streaming(request)
+    return np.array([ind.update(x) for x in close], dtype=float)
+
+
+def _assert_identical(expected: np.ndarray, actual: np.ndarray) -> None:
+    """逐位元相同（NaN 位置也需一致）。"""
+    expected, actual = np.asarray(expected, dtype=float), np.asarray(actual, dtype=float)
+    assert expected.shape == actual.shape
+    same = (expected == actual) | (np.isnan(expected) & np.isnan(actual))
+    assert same.all(), f"第 {np.flatnonzero(~same)[:5].tolist()} 根不同"
+
+
+CASES = [
+    pytest.param(dict(seed=1), id="seed1"),
+    pytest.param(dict(seed=7, n=900), id="seed7"),
+    # 粗跳動單位：漲跌幅經常為 0、視窗內常有相同值
+    pytest.param(dict(seed=3, tick=1.0), id="tick1"),
+    pytest.param(dict(seed=11, tick=0.5), id="tick0.5"),
+    # 一段價格完全不變：漲跌幅全為 0，RSI 的跌幅均值為 0
+    pytest.param(dict(seed=5, flat=(100, 180)), id="flat"),
+]
+PERIODS = [1, 5, 14, 20, 60]
+
+
+@pytest.mark.parametrize("frame", CASES)
+@pytest.mark.parametrize("period", PERIODS)
+def test_sma_ema_rsi_match_batch(frame, period):
+    close = _close(**frame)
+    series = pd.Series(close)
+    batch = compute_indicators(pd.DataFrame({"close": close}), [f"ma{period}", f"ema{period}", f"rsi{period}"])
+
+    _assert_identical(series.rolling(period).mean(), _stream(f"ma{period}", close))
+    _assert_identical(batch[f"ma{period}"], _stream(f"ma{period}", close))
+    _assert_identical(series.ewm(span=period, adjust=False).mean(), _stream(f"ema{period}", close))
+    _assert_identical(batch[f"ema{period}"], _stream(f"ema{period}", close))
+    _assert_identical(batch[f"rsi{period}"], _stream(f"rsi{period}", close))
+
+
+@pytest.mark.parametrize("frame", CASES)
+@pytest.mark.parametrize("fast,slow", [(5, 20), (10, 30), (3, 7), (20, 10)])
+def test_crossover_matches_sma_crossover(frame, fast, slow):
+    close = _close(**frame)
+    expected = sma_crossover(close, fast, slow)
+    assert (expected != 0).any()
+    _assert_identical(expected, _stream(f"cross{fast}_{slow}", close))
+
+
+@pytest.mark.parametrize("frame", CASES[:2])
+@pytest.mark.parametrize("period", [5, 20, 60])
+def test_std_matches_pandas_without_cancellation(frame, period):
+    # 價格連續、沒有相同值時 pandas 不會整窗重算，結果逐位元相同
+    close = _close(**frame)
+    _assert_identical(pd.Series(close).rolling(period).std(), _stream(f"std{period}", close))
+
+
+@pytest.mark.parametrize("frame", CASES)
+@pytest.mark.parametrize("period", [2, 5, 20, 60])
+def test_std_divergence_is_bounded(frame, period):
+    # pandas 遇到大幅抵銷會整窗重算，串流版不重算：之後的變異數差異約為 1e-16 × 價格²
+    close = _close(**frame)
+    series = pd.Series(close)
+    expected = series.rolling(period).std().to_numpy()
+    actual = _stream(f"std{period}", close)
+    assert np.array_equal(np.isnan(expected), np.isnan(actual))
+    ok = ~np.isnan(expected)
+    assert (actual[ok] >= 0).all()
+    scale = series.rolling(period).mean().to_numpy()[ok] ** 2
+    assert (np.abs(actual[ok] ** 2 - expected[ok] ** 2) <= 1e-13 * scale).all()
+
+
+def test_std_flat_window_leaves_only_rounding_residue():
+    close = _close(seed=5, flat=(100, 180))
+    actual = _stream("std20", close)
+    expected = pd.Series(close).rolling(20).std().to_numpy()
+    flat = slice(119, 180)  # 整窗都在平盤區段內
+    assert np.abs(expected[flat]).max() <= 1e-6 * close[100]
+    assert np.abs(actual[flat]).max() <= 1e-6 * close[100]
+    # 離開平盤後差異仍在上述界限內（見 test_std_divergence_is_bounded），且不會變成 NaN
+    assert not np.isnan(actual[180:]).any()
+
+
+@pytest.mark.parametrize("request_", ["ma20", "ema20", "std20", "rsi14", "cross10_30", "ma1", "std2"])
+@pytest.mark.parametrize("frame", [CASES[0], CASES[2], CASES[4]])
+def test_state_json_round_trip(request_, frame):
+    close = _close(**frame)
+    expected = _stream(request_, close)
+    for split in (0, 1, 15, 150, len(close) - 1):
+        ind = make_streaming(request_)
+        head = [ind.update(x) for x in close[:split]]
+        state = json.loads(json.dumps(ind.state()))
+        restored = StreamingIndicator.from_state(state)
+        assert type(restored) is type(ind)
+        assert json.dumps(restored.state()) == json.dumps(ind.state())
+        tail = [restored.update(x) for x in close[split:]]
+        _assert_identical(expected, np.array(head + tail, dtype=float))
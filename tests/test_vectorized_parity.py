@@ -0,0 +1,91 @@
+"""向量化引擎與 backtrader 的結果一致性：交易記錄、期末資產、Sharpe 與回撤。"""
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("backtrader")
+
+from src.backtest.result_cache import _plain
+from src.backtest.run_backtest import _run_backtrader
+from src.backtest.vectorized import run_sma_cross_vectorized
+
+REL_TOL = 1e-8
+ABS_TOL = 1e-8
+
+
+def _price_frame(seed: int, n: int = 600, tick: float | None = None, flat: tuple[int, int] | None = None) -> pd.DataFrame:
+    """隨機漫步日線；`tick` 把收盤價四捨五入到最小跳動（製造均線平手），`flat` 區段價格不變。"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    if tick is not None:
+        close = np.round(close / tick) * tick
+    if flat is not None:
+        close[flat[0]:flat[1]] = close[flat[0]]
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(close, open_) * (1 + np.abs(rng.normal(0, 0.005, n)))
+    low = np.minimum(close, open_) * (1 - np.abs(rng.normal(0, 0.005, n)))
+    return pd.DataFrame({
+        "date": pd.bdate_range("2015-01-01", periods=n),
+        "open": open_, "high": high, "low": low, "close": close, "volume": 1e6,
+    })
+
+
+def _assert_close(expected, actual, path: str = "") -> None:
+    """遞迴比對 analyzer 結果：數值以 rel_tol 比較，其餘需完全相同。"""
+    if isinstance(expected, dict):
+        assert set(expected) == set(actual), path
+        for key in expected:
+            _assert_close(expected[key], actual[key], f"{path}/{key}")
+    elif isinstance(expected, list):
+        assert len(expected) == len(actual), path
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            _assert_close(a, b, f"{path}[{i}]")
+    elif isinstance(expected, float) and isinstance(actual, (int, float)):
+        assert math.isclose(expected, actual, rel_tol=REL_TOL, abs_tol=ABS_TOL), f"{path}: {expected} != {actual}"
+    else:
+        assert expected == actual, f"{path}: {expected!r} != {actual!r}"
+
+
+CASES = [
+    pytest.param(dict(seed=1), id="seed1"),
+    pytest.param(dict(seed=7, n=900), id="seed7"),
+    pytest.param(dict(seed=42, n=300), id="seed42-short"),
+    # 粗跳動單位（相對於價格）：短長均線經常完全相等，考驗平手時的交叉判斷
+    pytest.param(dict(seed=3, tick=1.0), id="tick1"),
+    pytest.param(dict(seed=11, tick=2.0), id="tick2"),
+    pytest.param(dict(seed=11, tick=0.5), id="tick0.5"),
+    # 一段價格完全不變：兩條均線在區段內收斂為同一值
+    pytest.param(dict(seed=5, flat=(100, 180)), id="flat"),
+]
+PARAMS = [(5, 20, 0), (10, 30, 25), (3, 7, 100), (20, 10, 0)]
+
+
+@pytest.mark.parametrize("frame", CASES)
+@pytest.mark.parametrize("fast,slow,slippage_bps", PARAMS)
+def test_vectorized_matches_backtrader(frame, fast, slow, slippage_bps):
+    df = _price_frame(**frame)
+    expected = _run_backtrader(df, fast, slow, 0.001, slippage_bps, 0.1)
+    actual = run_sma_cross_vectorized(df, fast, slow, 0.001, slippage_bps, 0.1)
+
+    _assert_close(expected["trade_list"], actual["trade_list"], "trade_list")
+    _assert_close(_plain(expected["trades"]), _plain(actual["trades"]), "trades")
+    assert math.isclose(expected["final_value"], actual["final_value"], rel_tol=REL_TOL)
+    _assert_close(_plain(expected["sharpe"]), _plain(actual["sharpe"]), "sharpe")
+    _assert_close(_plain(expected["drawdown"]), _plain(actual["drawdown"]), "drawdown")
+
+
+def test_no_signal_keeps_starting_cash():
+    n = 50
+    df = pd.DataFrame({
+        "date": pd.bdate_range("2020-01-01", periods=n),
+        "open": 10.0, "high": 10.0, "low": 10.0, "close": 10.0, "volume": 1e6,
+    })
+    expected = _run_backtrader(df, 5, 20, 0.001, 0, 0.1)
+    actual = run_sma_cross_vectorized(df, 5, 20, 0.001, 0, 0.1)
+    assert actual["trade_list"] == expected["trade_list"] == []
+    assert math.isclose(expected["final_value"], actual["final_value"], rel_tol=REL_TOL)
+    _assert_close(_plain(expected["trades"]), _plain(actual["trades"]), "trades")
@@ -1,17 +1,28 @@
 from __future__ import annotations
 
+
 import streamlit as st
 import pandas as pd
+import plotly.graph_objects as go
 from pathlib import Path
 
 from src.config import ensure_directories, OUTPUTS_DIR
 from src.utils.symbols import normalize_hk_symbol
-from src.data.fetch_hk_data import fetch_hk_daily, load_cached
-from src.visualize.plot import kline_with_mas
+from src.data.fetch_hk_data import fetch_hk_daily
+from src.visualize.plot import kline_figure, add_replay_frames, replay_at, write_chart, chart_indicator_requests
 from src.backtest.run_backtest import run_backtest_from_dataframe
+from src.backtest.result_cache import get_backtest_cache
 from src.visualize.handdrawn_theme import HANDDRAWN_CSS
 from src.risk.predict_model import conservative_position_limit_from_quantiles, stop_loss_from_vol_and_quantile
+from src.risk.inference import get_inference_service
+from src.risk.slim import get_slim_model, slim_artifact_dir
+from src.risk.registry import latest_checkpoint
+from src.risk.train_model import GLOBAL_MODEL_NAME, train_with_registry
 from src.backtest.scan_params import scan_sma_grid
+from src.backtest.walk_forward import walk_forward_sma, save_walk_forward
+from src.data.frame_cache import get_frame_cache, data_version
+from src.utils.jobs import Job, get_job_runner
+from src.indicators.engine import compute_indicators
 
 
 def _init_session_state() -> None:
@@ -23,14 +34,43 @@ def _init_session_state() -> None:
         "guide_enabled": False,
         "guide_step": 1,
         "replay_value": 100,
-        "replay_playing": False,
-        "replay_step": 2,
+        "replay_fps": 20,
+        "jobs": {},             # 區塊名稱 -> 背景工作 key
+        "jobs_running": set(),  # 上次檢查時仍在執行的區塊
+        "wf_saved": None,
     }
     for k, v in defaults.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
 
+def _chart_frame(symbol: str, ma_periods: list[int], overlays: list[str]) -> pd.DataFrame:
+    """從快取取得日線並附上圖表所需指標欄位；重跑時直接命中，不需重新讀檔與滾動計算。"""
+    cache = get_frame_cache()
+    df = cache.frame(symbol)
+    requests = chart_indicator_requests(ma_periods, overlays)
+    ind = cache.get(symbol, ("indicators", tuple(requests)), lambda d: compute_indicators(d, requests))
+    for col in ind.columns:
+        df[col] = ind[col]
+    return df
+
+
+def _risk_quantiles(symbol: str) -> pd.DataFrame | None:
+    """取得隔日風險分位數：有模型檢查點時以常駐推論服務即時預測（毫秒級），否則讀取輸出的 CSV。"""
+    for ckpt in (latest_checkpoint(symbol), latest_checkpoint(GLOBAL_MODEL_NAME)):
+        if ckpt is None:
+            continue
+        try:
+            spec = ("risk_quantiles", ckpt.as_posix(), ckpt.stat().st_mtime)
+            # 有匯出的精簡模型（TorchScript）時優先使用，載入快、記憶體小
+            model = get_slim_model(slim_artifact_dir(ckpt)) or get_inference_service(ckpt)
+            return get_frame_cache().get(symbol, spec, lambda d: model.predict_one(symbol, d))
+        except Exception:
+            continue  # 例如全域模型未涵蓋此標的，改試下一個來源
+    q_path = OUTPUTS_DIR / f"risk_quantiles_{symbol}.csv"
+    return pd.read_csv(q_path) if q_path.exists() else None
+
+
 def _compute_insights(df: pd.DataFrame, ma_periods: list[int]) -> list[str]:
     tips: list[str] = []
     if df.empty:
@@ -38,8 +78,11 @@ def _compute_insights(df: pd.DataFrame, ma_periods: list[int]) -> list[str]:
     df = df.copy().sort_values("date")
     mas = sorted(ma_periods)
     short, long = mas[0], mas[-1]
-    df[f"ma{short}"] = df["close"].rolling(short).mean()
-    df[f"ma{long}"] = df["close"].rolling(long).mean()
+    missing = [f"ma{p}" for p in (short, long) if f"ma{p}" not in df]
+    if missing:
+        ind = compute_indicators(df, missing)
+        for col in missing:
+            df[col] = ind[col]
     last = df.iloc[-1]
     if last[f"ma{short}"] > last[f"ma{long}"]:
         tips.append("趨勢轉強：短均線在長均線之上，偏多格局（留意風險）")
@@ -54,10 +97,99 @@ def _compute_insights(df: pd.DataFrame, ma_periods: list[int]) -> list[str]:
     return tips
 
 
+def _parse_grid_text(text: str) -> list[int]:
+    """解析逗號分隔的網格，可混用單一整數與 start:stop[:step]（不含 stop）。"""
+    grid: list[int] = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part:
+            grid.extend(range(*[int(x) for x in part.split(":")]))
+        else:
+            grid.append(int(part))
+    return grid
+
+
+def _submit_job(slot: str, key, fn, *args, process: bool = False, **kwargs) -> Job:
+    """送出背景工作並記在本次工作階段；相同 key 的工作已在執行或已完成時直接沿用。"""
+    job = get_job_runner().submit(key, fn, *args, label=slot, process=process, **kwargs)
+    st.session_state.jobs[slot] = key
+    return job
+
+
+def _session_job(slot: str) -> Job | None:
+    key = st.session_state.jobs.get(slot)
+    return get_job_runner().get(key) if key is not None else None
+
+
+def _job_ready(job: Job, what: str) -> bool:
+    """顯示工作狀態；完成時回傳 True，執行中或失敗時顯示提示並回傳 False。"""
+    if job.status == "running":
+        st.info(f"{what}執行中…（已 {job.elapsed:.0f} 秒，可繼續操作其他區塊，完成後自動顯示）")
+        return False
+    if job.status != "done":
+        st.error(f"{what}失敗：{job.error}")
+        return False
+    return True
+
+
+def _running_slots() -> set:
+    runner = get_job_runner()
+    return {
+        slot for slot, key in st.session_state.jobs.items()
+        if (job := runner.get(key)) is not None and job.status == "running"
+    }
+
+
+def _job_monitor() -> None:
+    """側欄列出本工作階段的背景工作；有工作完成時整頁重跑以顯示結果。"""
+    runner = get_job_runner()
+    icons = {"running": "⏳", "done": "✅", "failed": "❌", "cancelled": "⏹"}
+    for slot, key in st.session_state.jobs.items():
+        job = runner.get(key)
+        if job is not None:
+            st.caption(f"{icons[job.status]} {slot}（{job.elapsed:.0f} 秒）")
+    running = _running_slots()
+    finished = st.session_state.jobs_running - running
+    st.session_state.jobs_running = running
+    if finished:
+        st.rerun()
+
+
+def _build_chart(symbol: str, ma: list[int], overlays: list[str],
+                 explain: bool, show_signals: bool, fast: bool = False) -> tuple[str, pd.DataFrame, go.Figure]:
+    """背景工作：在整段歷史上算一次指標與交易標註，建立含回放影格的圖。
+
+    回放位置只決定顯示的軸範圍（`replay_at`），拖動滑桿或播放都不需重建圖表。
+    圖直接交給 st.plotly_chart（只送圖表 JSON），不寫 HTML 也不再讀回；需要檔案時再按「另存 HTML」。
+    """
+    df = _chart_frame(symbol, ma, overlays)
+    # 若存在交易 CSV，供回放標註
+    trades_csv = OUTPUTS_DIR / f"trades_{symbol}.csv"
+    trades_df = pd.read_csv(trades_csv) if trades_csv.exists() else None
+    fig = kline_figure(
+        df, symbol,
+        ma_periods=ma, explain=explain,
+        show_signals=show_signals, show_trade_pnl=show_signals,
+        overlay_indicators=overlays, trades_df=trades_df, fast=fast,
+    )
+    add_replay_frames(fig, df)
+    return symbol, df, fig
+
+
+def _backtest_job(df: pd.DataFrame, symbol: str, **params) -> tuple[Path, bytes, str]:
+    """背景工作：回測並一併讀回資金曲線圖與摘要文字（共用檔名之後可能被其他參數或 CLI 的回測覆寫）。"""
+    out = run_backtest_from_dataframe(df, symbol, **params)
+    summ = OUTPUTS_DIR / f"backtest_{symbol}.txt"
+    return out, out.read_bytes(), summ.read_text(encoding="utf-8") if summ.exists() else ""
+
+
 def main():
     ensure_directories()
     st.set_page_config(page_title="金融科技系統（手繪風）", layout="wide")
     _init_session_state()
+    st.session_state.jobs_running = _running_slots()
     st.markdown(HANDDRAWN_CSS, unsafe_allow_html=True)
     st.markdown("<h2 class='sketch-title contrast'>一步一步了解：下載 ➜ 視覺化 ➜ 回測 ➜ 風險</h2>", unsafe_allow_html=True)
 
@@ -82,6 +214,16 @@ def main():
     st.sidebar.checkbox("③ 跑一次回測", key="chk_backtest", value=st.session_state.done_backtest, disabled=True)
     progress = sum([st.session_state.done_fetch, st.session_state.done_plot, st.session_state.done_backtest]) / 3
     st.sidebar.progress(progress)
+    cache_stats = get_frame_cache().stats()
+    st.sidebar.caption(
+        f"資料快取：命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}，"
+        f"{cache_stats['entries']} 項，{cache_stats['bytes'] / 1e6:.1f} MB"
+    )
+    bt_stats = get_backtest_cache().stats()
+    st.sidebar.caption(
+        f"回測快取：命中 {bt_stats['hits']} / 未命中 {bt_stats['misses']}，"
+        f"{bt_stats['entries']} 筆，{bt_stats['bytes'] / 1e6:.1f} MB"
+    )
     # 導覽「下一步」按鈕：依任務狀態切換 section
     if st.sidebar.button("下一步 →"):
         if not st.session_state.done_fetch:
@@ -105,6 +247,7 @@ def main():
         if st.button("下載/更新資料", type="primary"):
             try:
                 path = fetch_hk_daily(symbol_in, start=start or None, end=end or None)
+                get_frame_cache().invalidate(symbol_in)
                 st.success(f"已下載：{path}")
                 st.session_state.done_fetch = True
                 st.session_state.last_symbol = normalize_hk_symbol(symbol_in)
@@ -120,47 +263,32 @@ def main():
             explain = st.toggle("顯示新手註解", value=True)
             show_cards = st.toggle("顯示『建議解讀』小卡", value=True)
             show_signals = st.toggle("圖上標註買/賣與盈虧區間", value=True)
-            replay_until = st.slider("交易回放：顯示至某日期", min_value=0, max_value=100, value=st.session_state.replay_value, help="向左拖動只顯示較早期間的交易標註，便於逐日回看")
+            fast_render = st.toggle("高效能模式（長歷史）", value=False, help="WebGL 折線並抽樣，K 線過多時聚合為週/月線，交易陰影批次繪製")
+            replay_until = st.slider("交易回放：顯示至某日期", min_value=0, max_value=100, value=st.session_state.replay_value, help="向左拖動只顯示較早期間的交易標註，便於逐日回看；也可用圖下方的播放鈕與滑桿")
             st.session_state.replay_value = replay_until
-            # 自動播放控制
-            play, pause, fast = st.columns(3)
-            if play.button("▶ 播放"):
-                st.session_state.replay_playing = True
-            if pause.button("⏸ 暫停"):
-                st.session_state.replay_playing = False
-            if fast.button("⏭ 快轉"):
-                st.session_state.replay_value = min(100, st.session_state.replay_value + 10)
-            st.slider("播放速度：每秒前進(%)", 1, 10, key="replay_step")
-            # 若正在播放，每次刷新自動前進並重繪
-            if st.session_state.replay_playing:
-                import time
-                st.session_state.replay_value = min(100, st.session_state.replay_value + int(st.session_state.replay_step))
-                time.sleep(1)
-                if st.session_state.replay_value < 100:
-                    st.experimental_rerun()
-                else:
-                    st.session_state.replay_playing = False
+            st.slider("播放速度（每秒影格）", 5, 60, key="replay_fps", help="圖下方 ▶ 播放在瀏覽器端執行，不需重跑頁面")
             overlays = st.multiselect("疊加指標 (可複選)", options=["EMA","BOLL","RSI"], default=["EMA","BOLL"]) 
             if st.button("生成圖表", key="btn_draw_chart"):
+                symbol = normalize_hk_symbol(st.session_state.get("last_symbol", "700"))
+                trades_csv = OUTPUTS_DIR / f"trades_{symbol}.csv"
+                ma_periods = [int(x) for x in ma]
+                # 回放位置不在 key 內：同一張圖換位置只改軸範圍
+                key = (
+                    "chart", symbol, data_version(symbol), tuple(ma_periods), tuple(overlays),
+                    explain, show_signals, fast_render, trades_csv.stat().st_mtime if trades_csv.exists() else None,
+                )
+                _submit_job("圖表", key, _build_chart, symbol, ma_periods, overlays, explain, show_signals, fast_render)
+            job = _session_job("圖表")
+            if job is not None and _job_ready(job, "圖表"):
                 try:
-                    symbol = normalize_hk_symbol(st.session_state.get("last_symbol", "700"))
-                    df = load_cached(symbol)
-                    # 依回放滑桿裁切資料
+                    symbol, df, fig = job.result()
+                    st.success(f"{symbol}：{len(df)} 根日線，耗時 {job.elapsed:.1f} 秒")
+                    st.plotly_chart(replay_at(fig, replay_until, fps=st.session_state.replay_fps), use_container_width=True)
+                    if st.button("另存 HTML", key="btn_save_chart"):
+                        out = write_chart(fig, symbol)
+                        st.info(f"已輸出：{out}（{out.stat().st_size / 1024:.0f} KB，plotly.js 共用 outputs/assets）")
                     if replay_until < 100:
-                        cut_idx = int(len(df) * replay_until / 100)
-                        df = df.iloc[: max(30, cut_idx)]
-                    # 若存在交易 CSV，供回放標註
-                    import pandas as pd, os
-                    trades_csv = OUTPUTS_DIR / f"trades_{symbol}.csv"
-                    trades_df = pd.read_csv(trades_csv) if trades_csv.exists() else None
-                    out = kline_with_mas(
-                        df, symbol,
-                        ma_periods=ma, explain=explain,
-                        show_signals=show_signals, show_trade_pnl=show_signals,
-                        overlay_indicators=overlays, trades_df=trades_df,
-                    )
-                    st.success(f"輸出：{out}")
-                    st.components.v1.html(Path(out).read_text(encoding="utf-8"), height=600, scrolling=True)
+                        df = df.iloc[: max(30, int(len(df) * replay_until / 100))]  # 建議解讀只看回放位置之前
                     st.session_state.done_plot = True
                     if show_cards:
                         tips = _compute_insights(df, [int(x) for x in ma])
@@ -178,21 +306,19 @@ def main():
                             st.info("盤整環境：耐心等待突破後再行動，避免過度進出")
 
                         # 動態風控（讀取 risk_panel 與分位數）
-                        import os, pandas as pd
                         panel_path = OUTPUTS_DIR / f"risk_panel_{symbol}.csv"
-                        q_path = OUTPUTS_DIR / f"risk_quantiles_{symbol}.csv"
+                        qs = _risk_quantiles(symbol)
                         ann_vol = None
                         q05 = None
                         if panel_path.exists():
                             panel = pd.read_csv(panel_path)
                             if not panel.empty:
                                 ann_vol = float(panel.iloc[0].get('ann_vol', None))
-                        if q_path.exists():
-                            qs = pd.read_csv(q_path)
+                        if qs is not None:
                             qmap = {float(q): float(v) for q, v in zip(qs['quantile'], qs['prediction'])}
                             q05 = qmap.get(0.05) or qmap.get(0.1)
                         if ann_vol is not None or q05 is not None:
-                            cap = conservative_position_limit_from_quantiles(qs) if q_path.exists() else 0.1
+                            cap = conservative_position_limit_from_quantiles(qs) if qs is not None else 0.1
                             sl = stop_loss_from_vol_and_quantile(ann_vol or 0.2, q05)
                             st.markdown(f"建議倉位上限：約 {int(cap*100)}% | 建議止損：{int(sl*100)}% （依據年化波動與分位數）")
                 except Exception as e:
@@ -210,27 +336,59 @@ def main():
                 slow_range = st.text_input("slow 範圍（逗號分隔）", value="30,60,120")
             apply_params = st.button("套用到主圖")
             if st.button("生成熱力圖"):
+                try:
+                    symbol = normalize_hk_symbol(st.session_state.get("last_symbol", "700"))
+                    fast_grid = _parse_grid_text(fast_range)
+                    slow_grid = _parse_grid_text(slow_range)
+                    # 網格掃描為純 CPU 計算，送往行程池，不佔用介面的執行緒
+                    key = ("scan", symbol, data_version(symbol), tuple(fast_grid), tuple(slow_grid))
+                    _submit_job("熱力圖", key, scan_sma_grid, get_frame_cache().frame(symbol), fast_grid, slow_grid, process=True)
+                except Exception as e:
+                    st.error(str(e))
+            job = _session_job("熱力圖")
+            if job is not None and _job_ready(job, "參數掃描"):
                 import plotly.express as px
+                res = job.result()
+                if res.empty:
+                    st.warning("結果為空，請調整範圍（確保 fast < slow）")
+                else:
+                    p1 = px.density_heatmap(res, x="fast", y="slow", z="sharpe", color_continuous_scale="Viridis", title="Sharpe 熱力圖")
+                    p2 = px.density_heatmap(res, x="fast", y="slow", z="max_dd", color_continuous_scale="RdBu", title="Max Drawdown 熱力圖")
+                    st.plotly_chart(p1, use_container_width=True)
+                    st.plotly_chart(p2, use_container_width=True)
+                    if apply_params:
+                        best = res.sort_values("sharpe", ascending=False).iloc[0]
+                        st.session_state["best_fast"] = int(best["fast"])
+                        st.session_state["best_slow"] = int(best["slow"])
+                        st.info(f"已套用最佳參數：fast={int(best['fast'])}, slow={int(best['slow'])}；請回到上方主圖重新生成。")
+            wf_anchored = st.toggle("Walk-forward 使用擴張訓練窗（anchored）", value=False)
+            if st.button("Walk-forward 樣本外驗證", help="每 2 年訓練挑參數、下半年樣本外測試，逐窗滾動"):
                 try:
-                    symbol = st.session_state.get("last_symbol", "700")
-                    df = load_cached(symbol)
-                    fast_grid = [int(x) for x in fast_range.split(',') if x.strip()]
-                    slow_grid = [int(x) for x in slow_range.split(',') if x.strip()]
-                    res = scan_sma_grid(df, fast_grid, slow_grid)
-                    if res.empty:
-                        st.warning("結果為空，請調整範圍（確保 fast < slow）")
-                    else:
-                        p1 = px.density_heatmap(res, x="fast", y="slow", z="sharpe", color_continuous_scale="Viridis", title="Sharpe 熱力圖")
-                        p2 = px.density_heatmap(res, x="fast", y="slow", z="max_dd", color_continuous_scale="RdBu", title="Max Drawdown 熱力圖")
-                        st.plotly_chart(p1, use_container_width=True)
-                        st.plotly_chart(p2, use_container_width=True)
-                        if apply_params and not res.empty:
-                            best = res.sort_values("sharpe", ascending=False).iloc[0]
-                            st.session_state["best_fast"] = int(best["fast"])
-                            st.session_state["best_slow"] = int(best["slow"])
-                            st.info(f"已套用最佳參數：fast={int(best['fast'])}, slow={int(best['slow'])}；請回到上方主圖重新生成。")
+                    symbol = normalize_hk_symbol(st.session_state.get("last_symbol", "700"))
+                    fast_grid = _parse_grid_text(fast_range)
+                    slow_grid = _parse_grid_text(slow_range)
+                    key = ("walk_forward", symbol, data_version(symbol), tuple(fast_grid), tuple(slow_grid), wf_anchored)
+                    _submit_job(
+                        "Walk-forward", key, walk_forward_sma, get_frame_cache().frame(symbol), fast_grid, slow_grid,
+                        anchored=wf_anchored, workers=1, process=True,
+                    )
                 except Exception as e:
                     st.error(str(e))
+            job = _session_job("Walk-forward")
+            if job is not None and _job_ready(job, "Walk-forward"):
+                windows, oos = job.result()
+                if windows.empty:
+                    st.warning("資料長度不足一個訓練窗，或網格為空")
+                else:
+                    if st.session_state.wf_saved != job.key:  # 每份結果只寫檔一次
+                        save_walk_forward(job.key[1], windows, oos, anchored=job.key[-1])
+                        st.session_state.wf_saved = job.key
+                    st.dataframe(windows, use_container_width=True)
+                    st.line_chart(oos.set_index("date")["equity"])
+                    latest = windows.iloc[-1]
+                    st.session_state["best_fast"] = int(latest["fast"])
+                    st.session_state["best_slow"] = int(latest["slow"])
+                    st.info(f"已套用最新一窗參數：fast={int(latest['fast'])}, slow={int(latest['slow'])}；請回到上方主圖重新生成。")
             st.markdown("</div>", unsafe_allow_html=True)
 
     if section in ("全部", "回測"):
@@ -252,18 +410,31 @@ def main():
             if st.button("執行回測"):
                 try:
                     symbol = normalize_hk_symbol(st.session_state.get("last_symbol", "700"))
-                    df = load_cached(symbol)
-                    out = run_backtest_from_dataframe(df, symbol, fast=int(fast), slow=int(slow),
-                                                      commission=float(commission), slippage_bps=int(slippage_bps),
-                                                      risk_pct=float(risk_pct)/100.0)
-                    st.success(f"回測圖：{out}")
-                    st.image(str(out))
-                    summ = OUTPUTS_DIR / f"backtest_{symbol}.txt"
-                    if summ.exists():
-                        st.text(summ.read_text(encoding="utf-8"))
-                    st.session_state.done_backtest = True
+                    params = dict(fast=int(fast), slow=int(slow), commission=float(commission),
+                                  slippage_bps=int(slippage_bps), risk_pct=float(risk_pct)/100.0)
+                    key = ("backtest", symbol, data_version(symbol), tuple(sorted(params.items())))
+                    _submit_job("回測", key, _backtest_job, get_frame_cache().frame(symbol), symbol, **params)
                 except Exception as e:
                     st.error(str(e))
+            job = _session_job("回測")
+            if job is not None and _job_ready(job, "回測"):
+                out, png, summary = job.result()
+                st.success(f"回測圖：{out}")
+                st.image(png)
+                if summary:
+                    st.text(summary)
+                st.session_state.done_backtest = True
+            if st.button("背景訓練風險模型", help="以目前標的訓練分位數模型；資料與設定未變時直接沿用既有模型"):
+                try:
+                    symbol = normalize_hk_symbol(st.session_state.get("last_symbol", "700"))
+                    key = ("train", symbol, data_version(symbol))
+                    _submit_job("風險模型訓練", key, train_with_registry, symbol, {symbol: get_frame_cache().frame(symbol)}, process=True)
+                except Exception as e:
+                    st.error(str(e))
+            job = _session_job("風險模型訓練")
+            if job is not None and _job_ready(job, "風險模型訓練"):
+                ckpt, trained = job.result()
+                st.success(f"{'已訓練新模型' if trained else '資料與設定未變，沿用既有模型'}：{ckpt}")
             st.markdown("</div>", unsafe_allow_html=True)
 
         # 逐步高亮導覽：高亮與貼紙提示
@@ -298,6 +469,11 @@ def main():
 
     st.markdown("<p class='small tip'>提示：手繪風格僅做視覺親和，核心仍以清晰可讀、互動簡潔為先。</p>", unsafe_allow_html=True)
 
+    # 背景工作狀態放在最後：本次重跑剛送出的工作也會納入輪詢
+    with st.sidebar:
+        st.markdown("**背景工作**")
+        st.fragment(run_every=1.0 if _running_slots() else None)(_job_monitor)()
+
 
 if __name__ == "__main__":
     main()